@@ -47,6 +47,7 @@ def initialize_extensions(app: DifyApp):
         ext_database,
         ext_hosting_provider,
         ext_import_modules,
+        ext_local_tokenizer,
         ext_logging,
         ext_login,
         ext_mail,
@@ -77,6 +78,7 @@ def initialize_extensions(app: DifyApp):
         ext_login,
         ext_mail,
         ext_hosting_provider,
+        ext_local_tokenizer,
         ext_sentry,
         ext_proxy_fix,
         ext_blueprints,
@@ -10,6 +10,8 @@ from werkzeug.exceptions import NotFound
 
 from configs import dify_config
 from constants.languages import languages
+from core.helper.model_provider_cache import ProviderConfigurationsCache
+from core.rag.datasource.keyword.jieba.jieba import Jieba
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.models.document import Document
@@ -20,7 +22,7 @@ from libs.helper import email as email_validate
 from libs.password import hash_password, password_pattern, valid_password
 from libs.rsa import generate_key_pair
 from models import Tenant
-from models.dataset import Dataset, DatasetCollectionBinding, DocumentSegment
+from models.dataset import Dataset, DatasetCollectionBinding, DatasetKeywordTable, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from models.model import Account, App, AppAnnotationSetting, AppMode, Conversation, MessageAnnotation
 from models.provider import Provider, ProviderModel
@@ -130,6 +132,7 @@ def reset_encrypt_key_pair():
         db.session.query(Provider).filter(Provider.provider_type == "custom", Provider.tenant_id == tenant.id).delete()
         db.session.query(ProviderModel).filter(ProviderModel.tenant_id == tenant.id).delete()
         db.session.commit()
+        ProviderConfigurationsCache(tenant_id=tenant.id).invalidate()
 
         click.echo(
             click.style(
@@ -653,6 +656,47 @@ where sites.id is null limit 1000"""
     click.echo(click.style("Fix for missing app-related sites completed successfully!", fg="green"))
 
 
+@click.command("migrate-keyword-tables", help="Move legacy keyword tables into keyword posting rows.")
+def migrate_keyword_tables():
+    """
+    Move the keyword tables of datasets indexed before the keyword posting table into posting rows, keyword
+    searches only read the posting rows.
+    """
+    click.echo(click.style("Starting keyword table migration.", fg="green"))
+
+    migrated_count = 0
+    failed_dataset_ids: list[str] = []
+    while True:
+        dataset_ids = [
+            str(dataset_id)
+            for dataset_id in db.session.query(DatasetKeywordTable.dataset_id)
+            .filter(DatasetKeywordTable.dataset_id.notin_(failed_dataset_ids))
+            .limit(100)
+        ]
+        if not dataset_ids:
+            break
+
+        for dataset_id in dataset_ids:
+            try:
+                dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+                if not dataset:
+                    raise NotFound(f"Dataset {dataset_id} not found")
+                Jieba(dataset).migrate_legacy_keyword_table()
+                migrated_count += 1
+            except Exception:
+                db.session.rollback()
+                failed_dataset_ids.append(dataset_id)
+                click.echo(click.style(f"Failed to migrate keyword table of dataset {dataset_id}", fg="red"))
+                logging.exception(f"Failed to migrate keyword table, dataset_id: {dataset_id}")
+
+    click.echo(
+        click.style(
+            f"Keyword table migration completed, {migrated_count} migrated, {len(failed_dataset_ids)} failed.",
+            fg="green",
+        )
+    )
+
+
 @click.command("migrate-data-for-plugin", help="Migrate data for plugin.")
 def migrate_data_for_plugin():
     """
@@ -166,6 +166,23 @@ class PluginConfig(BaseSettings):
         default=15728640,
     )
 
+    PLUGIN_DAEMON_POOL_MAX_SIZE: PositiveInt = Field(
+        description="Maximum number of keep-alive connections kept open to the plugin daemon",
+        default=100,
+    )
+
+    PLUGIN_MODEL_CACHE_TTL: NonNegativeInt = Field(
+        description="Seconds the model providers and model schemas declared by plugins are reused across requests,"
+        " 0 to disable. Installing, upgrading or uninstalling a plugin refreshes them,"
+        " remote debugging plugins show up or go away once they expire.",
+        default=300,
+    )
+
+    PLUGIN_MODEL_SCHEMA_CACHE_CAPACITY: PositiveInt = Field(
+        description="Maximum number of model schemas of plugins cached in process",
+        default=10000,
+    )
+
     PLUGIN_MAX_BUNDLE_SIZE: PositiveInt = Field(
         description="Maximum allowed size for plugin bundles in bytes",
         default=15728640 * 12,
@@ -372,6 +389,26 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections kept by each SSRF proxy client",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: NonNegativeInt = Field(
+        description="Maximum number of idle keep-alive connections kept by each SSRF proxy client",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Seconds an idle keep-alive connection of the SSRF proxy clients is kept open",
+        default=5.0,
+    )
+
+    SSRF_POOL_HTTP2_ENABLED: bool = Field(
+        description="Enable HTTP/2 for SSRF proxy clients, requires the h2 package",
+        default=False,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable handling of X-Forwarded-For, X-Forwarded-Proto, and X-Forwarded-Port headers"
         " when the app is behind a single trusted reverse proxy.",
@@ -447,6 +484,23 @@ class ModelLoadBalanceConfig(BaseSettings):
     )
 
 
+class ModelProviderCacheConfig(BaseSettings):
+    """
+    Configuration for caching model provider configurations in process
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: NonNegativeInt = Field(
+        description="Seconds the model provider configurations of a workspace are reused across requests,"
+        " 0 to disable. Changes to providers and credentials are picked up immediately.",
+        default=60,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_CAPACITY: PositiveInt = Field(
+        description="Maximum number of workspaces whose model provider configurations are cached in process",
+        default=1000,
+    )
+
+
 class BillingConfig(BaseSettings):
     """
     Configuration for platform billing features
@@ -510,6 +564,16 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         default=100,
     )
 
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Interval in seconds at which queued workflow node execution records are written to the database",
+        default=0.5,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of queued workflow node execution records that triggers an immediate write",
+        default=100,
+    )
+
 
 class AuthConfig(BaseSettings):
     """
@@ -656,12 +720,6 @@ class RagEtlConfig(BaseSettings):
         default="dify",
     )
 
-    KEYWORD_DATA_SOURCE_TYPE: str = Field(
-        description="Data source type for keyword extraction"
-        " ('database' or other supported types), default to 'database'",
-        default="database",
-    )
-
     UNSTRUCTURED_API_URL: Optional[str] = Field(
         description="API URL for Unstructured.io service",
         default=None,
@@ -713,6 +771,21 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    DATASET_RETRIEVAL_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of threads shared by the process to retrieve from several datasets at once",
+        default=32,
+    )
+
+    DATASET_RETRIEVAL_MAX_WORKERS_PER_REQUEST: PositiveInt = Field(
+        description="Maximum number of the shared threads a single multiple retrieval may take",
+        default=4,
+    )
+
+    DATASET_RETRIEVAL_TIMEOUT: PositiveFloat = Field(
+        description="Seconds to wait for the datasets of a multiple retrieval, slower datasets are left out",
+        default=30,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -740,6 +813,24 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    EMBEDDING_CACHE_LOCAL_CAPACITY: NonNegativeInt = Field(
+        description="Maximum number of document embeddings kept in the in-process cache in front of the"
+        " embeddings table, 0 to disable",
+        default=0,
+    )
+
+    EMBEDDING_MAX_CONCURRENCY: PositiveInt = Field(
+        description="Maximum number of concurrent embedding requests of a workspace to a model provider,"
+        " the actual concurrency adapts to the latency and rate limits of the provider",
+        default=8,
+    )
+
+    EMBEDDING_MAX_RETRIES: NonNegativeInt = Field(
+        description="Number of times a batch of documents is retried after a rate limit or connection error"
+        " when embedding",
+        default=3,
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -863,6 +954,7 @@ class FeatureConfig(
     LoggingConfig,
     MailConfig,
     ModelLoadBalanceConfig,
+    ModelProviderCacheConfig,
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
@@ -80,6 +80,11 @@ class VectorStoreConfig(BaseSettings):
         default=False,
     )
 
+    VECTOR_STORE_CLIENT_IDLE_TIMEOUT: PositiveFloat = Field(
+        description="Seconds a vector store client shared across requests is kept open after its last use.",
+        default=600,
+    )
+
 
 class KeywordStoreConfig(BaseSettings):
     KEYWORD_STORE: str = Field(
@@ -40,6 +40,7 @@ class PGVectorConfig(BaseSettings):
     )
 
     PGVECTOR_MAX_CONNECTION: PositiveInt = Field(
-        description="Max connection of the PostgreSQL database",
-        default=5,
+        description="Max connections of the pool shared by every pgvector caller of the process,"
+        " callers wait up to 30 seconds for a free connection once all of them are in use",
+        default=20,
     )
@@ -1,9 +1,10 @@
-import json
 from collections.abc import Generator, Mapping, Sequence
 from typing import TYPE_CHECKING, Any, Optional, Union
 
 from core.app.app_config.entities import VariableEntityType
+from core.app.entities.task_entities import StreamEvent
 from core.file import File, FileUploadConfig
+from core.helper import json_codec
 from factories import file_factory
 
 if TYPE_CHECKING:
@@ -150,10 +151,82 @@ class BaseAppGenerator:
         else:
 
             def gen():
+                renderer = _ChunkEventRenderer()
                 for message in generator:
                     if isinstance(message, (Mapping, dict)):
-                        yield f"data: {json.dumps(message)}\n\n"
+                        yield renderer.render(message)
                     else:
                         yield f"event: {message}\n\n"
 
             return gen()
+
+
+# events streamed once per token, with the path of the only field that changes from one to the next
+CHUNK_EVENT_FIELDS: dict[str, tuple[str, ...]] = {
+    StreamEvent.MESSAGE.value: ("answer",),
+    StreamEvent.AGENT_MESSAGE.value: ("answer",),
+    StreamEvent.TEXT_CHUNK.value: ("data", "text"),
+}
+
+_CHUNK_PLACEHOLDER = "\x00chunk\x00"
+
+
+def _render_event(message: Mapping) -> str:
+    return f"data: {json_codec.dumps(message)}\n\n"
+
+
+class _ChunkEventRenderer:
+    """
+    Render server-sent events of one stream, chunk events sharing the envelope of the previous one
+    are rendered from its serialized form and only their text is serialized.
+    """
+
+    def __init__(self) -> None:
+        self._envelope: Optional[dict] = None
+        self._template: Optional[tuple[str, str]] = None
+
+    def render(self, message: Mapping) -> str:
+        path = CHUNK_EVENT_FIELDS.get(message.get("event"))  # type: ignore[arg-type]
+        if path is None:
+            return _render_event(message)
+
+        envelope, text = self._split(message, path)
+        if envelope is None or not isinstance(text, str):
+            return _render_event(message)
+
+        if envelope != self._envelope:
+            self._envelope = envelope
+            self._template = self._build_template(envelope)
+        if self._template is None:
+            return _render_event(message)
+
+        prefix, suffix = self._template
+        return prefix + json_codec.dumps(text) + suffix
+
+    @staticmethod
+    def _split(message: Mapping, path: tuple[str, ...]) -> tuple[Optional[dict], Any]:
+        """
+        Copy the message with its chunk text replaced by a placeholder.
+        """
+        envelope = dict(message)
+        parent = envelope
+        for key in path[:-1]:
+            child = parent.get(key)
+            if not isinstance(child, Mapping):
+                return None, None
+            child = dict(child)
+            parent[key] = child
+            parent = child
+        text = parent.get(path[-1])
+        parent[path[-1]] = _CHUNK_PLACEHOLDER
+        return envelope, text
+
+    @staticmethod
+    def _build_template(envelope: dict) -> Optional[tuple[str, str]]:
+        rendered = _render_event(envelope)
+        placeholder = json_codec.dumps(_CHUNK_PLACEHOLDER)
+        if rendered.count(placeholder) != 1:
+            # the placeholder also shows up in another field, render these events in full
+            return None
+        prefix, suffix = rendered.split(placeholder)
+        return prefix, suffix
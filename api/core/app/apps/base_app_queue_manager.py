@@ -1,5 +1,6 @@
 import queue
 import time
+import weakref
 from abc import abstractmethod
 from enum import Enum
 from typing import Any, Optional
@@ -7,17 +8,29 @@ from typing import Any, Optional
 from sqlalchemy.orm import DeclarativeMeta
 
 from configs import dify_config
+from core.app.apps.task_stop_listener import STOP_CHANNEL, TaskStopListener
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.app.entities.queue_entities import (
     AppQueueEvent,
     MessageQueueMessage,
+    QueueAgentMessageEvent,
     QueueErrorEvent,
+    QueueLLMChunkEvent,
     QueuePingEvent,
     QueueStopEvent,
+    QueueTextChunkEvent,
     WorkflowQueueMessage,
 )
 from extensions.ext_redis import redis_client
 
+# published once per token and made of typed fields only, so they can't carry SQLAlchemy models
+_CHUNK_EVENTS = (QueueLLMChunkEvent, QueueAgentMessageEvent, QueueTextChunkEvent)
+
+# upper bound of chunks merged into one message when the listener falls behind
+MAX_COALESCED_CHUNKS = 64
+
+_NOTHING_PENDING = object()
+
 
 class PublishFrom(Enum):
     APPLICATION_MANAGER = 1
@@ -41,6 +54,8 @@ class AppQueueManager:
         q: queue.Queue[WorkflowQueueMessage | MessageQueueMessage | None] = queue.Queue()
 
         self._q = q
+        self._stop_event = _stop_listener.register(self._task_id)
+        weakref.finalize(self, _stop_listener.unregister, self._task_id)
 
     def listen(self):
         """
@@ -51,12 +66,19 @@ class AppQueueManager:
         listen_timeout = dify_config.APP_MAX_EXECUTION_TIME
         start_time = time.time()
         last_ping_time: int | float = 0
+        pending: Any = _NOTHING_PENDING
         while True:
             try:
-                message = self._q.get(timeout=1)
+                if pending is not _NOTHING_PENDING:
+                    message, pending = pending, _NOTHING_PENDING
+                else:
+                    message = self._q.get(timeout=1)
                 if message is None:
                     break
 
+                if isinstance(message.event, _CHUNK_EVENTS):
+                    message, pending = self._coalesce_chunks(message)
+
                 yield message
             except queue.Empty:
                 continue
@@ -96,7 +118,8 @@ class AppQueueManager:
         :param pub_from:
         :return:
         """
-        self._check_for_sqlalchemy_models(event.model_dump())
+        if not isinstance(event, _CHUNK_EVENTS):
+            self._check_for_sqlalchemy_models(event.model_dump())
         self._publish(event, pub_from)
 
     @abstractmethod
@@ -125,15 +148,23 @@ class AppQueueManager:
 
         stopped_cache_key = cls._generate_stopped_cache_key(task_id)
         redis_client.setex(stopped_cache_key, 600, 1)
+        # the flag is kept for tasks whose node is not subscribed at the moment
+        redis_client.publish(STOP_CHANNEL, task_id)
 
     def _is_stopped(self) -> bool:
         """
         Check if task is stopped
         :return:
         """
+        if self._stop_event.is_set():
+            return True
+        if _stop_listener.is_listening():
+            return False
+
         stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
         result = redis_client.get(stopped_cache_key)
         if result is not None:
+            self._stop_event.set()
             return True
 
         return False
@@ -156,6 +187,25 @@ class AppQueueManager:
         """
         return f"generate_task_stopped:{task_id}"
 
+    def _coalesce_chunks(self, message: Any) -> tuple[Any, Any]:
+        """
+        Merge the chunk messages already waiting in the queue into the given one.
+        Nothing is waited for, chunks only pile up when the consumer is slower than the model.
+        :return: the merged message and the first queued message that could not be merged
+        """
+        for _ in range(MAX_COALESCED_CHUNKS):
+            try:
+                next_message = self._q.get_nowait()
+            except queue.Empty:
+                return message, _NOTHING_PENDING
+            if next_message is None:
+                return message, next_message
+            merged_event = _merge_chunk_events(message.event, next_message.event)
+            if merged_event is None:
+                return message, next_message
+            message = next_message.model_copy(update={"event": merged_event})
+        return message, _NOTHING_PENDING
+
     def _check_for_sqlalchemy_models(self, data: Any):
         # from entity to dict or list
         if isinstance(data, dict):
@@ -171,5 +221,42 @@ class AppQueueManager:
                 )
 
 
+def _merge_chunk_events(first: AppQueueEvent, second: AppQueueEvent) -> Optional[AppQueueEvent]:
+    """
+    Concatenate two consecutive chunk events, None when they can't be streamed as one.
+    """
+    if isinstance(first, QueueTextChunkEvent) and isinstance(second, QueueTextChunkEvent):
+        if (
+            first.from_variable_selector != second.from_variable_selector
+            or first.in_iteration_id != second.in_iteration_id
+        ):
+            return None
+        return second.model_copy(update={"text": first.text + second.text})
+
+    if (
+        type(first) is type(second)
+        and isinstance(first, QueueLLMChunkEvent | QueueAgentMessageEvent)
+        and isinstance(second, QueueLLMChunkEvent | QueueAgentMessageEvent)
+    ):
+        first_message = first.chunk.delta.message
+        second_message = second.chunk.delta.message
+        if (
+            not isinstance(first_message.content, str)
+            or not isinstance(second_message.content, str)
+            or first_message.tool_calls
+            or second_message.tool_calls
+        ):
+            return None
+        # the last delta keeps its usage and finish reason
+        message = second_message.model_copy(update={"content": first_message.content + second_message.content})
+        delta = second.chunk.delta.model_copy(update={"message": message})
+        return second.model_copy(update={"chunk": second.chunk.model_copy(update={"delta": delta})})
+
+    return None
+
+
+_stop_listener = TaskStopListener(AppQueueManager._generate_stopped_cache_key)
+
+
 class GenerateTaskStoppedError(Exception):
     pass
@@ -0,0 +1,95 @@
+"""
+Process-wide delivery of task stop requests over Redis pub/sub.
+
+A single subscriber per process receives every stop request and flags the local tasks it concerns, so running
+tasks don't need to poll Redis to find out they have been stopped. While the subscription is down they fall back
+to reading the stop flag set by `AppQueueManager.set_stop_flag`.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+STOP_CHANNEL = "generate_task_stopped"
+
+# seconds to wait before subscribing again after the connection was lost
+RECONNECT_DELAY = 1.0
+
+
+class TaskStopListener:
+    def __init__(self, stopped_cache_key: Callable[[str], str]) -> None:
+        self._stopped_cache_key = stopped_cache_key
+        self._events: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._listening = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register(self, task_id: str) -> threading.Event:
+        """
+        Start receiving stop requests for a task of this process.
+        :return: event set once the task is requested to stop
+        """
+        with self._lock:
+            event = self._events.setdefault(task_id, threading.Event())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task-stop-listener", daemon=True)
+                self._thread.start()
+        # a stop requested right before registering was published while nobody listened for the task
+        if self.is_listening() and redis_client.get(self._stopped_cache_key(task_id)) is not None:
+            event.set()
+        return event
+
+    def unregister(self, task_id: str) -> None:
+        with self._lock:
+            self._events.pop(task_id, None)
+
+    def is_listening(self) -> bool:
+        """
+        Whether stop requests are being received, otherwise the stop flag has to be read from Redis.
+        """
+        return self._listening.is_set()
+
+    def _run(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(STOP_CHANNEL)
+                # requests published before the subscription was active are only recorded in the stop flags
+                self._sync_stop_flags()
+                self._listening.set()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._on_stop(message["data"])
+            except Exception:
+                logger.exception("Task stop listener lost its subscription, falling back to polling")
+            finally:
+                self._listening.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(RECONNECT_DELAY)
+
+    def _on_stop(self, data: bytes | str) -> None:
+        task_id = data.decode("utf-8") if isinstance(data, bytes) else data
+        with self._lock:
+            event = self._events.get(task_id)
+        if event is not None:
+            event.set()
+
+    def _sync_stop_flags(self) -> None:
+        with self._lock:
+            task_ids = list(self._events)
+        if not task_ids:
+            return
+        for task_id in task_ids:
+            if redis_client.get(self._stopped_cache_key(task_id)) is not None:
+                self._on_stop(task_id)
@@ -96,6 +96,16 @@ class MessageStreamResponse(StreamResponse):
     answer: str
     from_variable_selector: Optional[list[str]] = None
 
+    def to_dict(self):
+        # sent once per token, build the dict directly instead of walking the model with jsonable_encoder
+        return {
+            "event": self.event.value,
+            "task_id": self.task_id,
+            "id": self.id,
+            "answer": self.answer,
+            "from_variable_selector": self.from_variable_selector,
+        }
+
 
 class MessageAudioStreamResponse(StreamResponse):
     """
@@ -172,6 +182,9 @@ class AgentMessageStreamResponse(StreamResponse):
     id: str
     answer: str
 
+    def to_dict(self):
+        return {"event": self.event.value, "task_id": self.task_id, "id": self.id, "answer": self.answer}
+
 
 class WorkflowStartStreamResponse(StreamResponse):
     """
@@ -564,6 +577,13 @@ class TextChunkStreamResponse(StreamResponse):
     event: StreamEvent = StreamEvent.TEXT_CHUNK
     data: Data
 
+    def to_dict(self):
+        return {
+            "event": self.event.value,
+            "task_id": self.task_id,
+            "data": {"text": self.data.text, "from_variable_selector": self.data.from_variable_selector},
+        }
+
 
 class TextReplaceStreamResponse(StreamResponse):
     """
@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+import weakref
+from typing import Any
+
+from flask import current_app
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from configs import dify_config
+from extensions.ext_database import db
+from models.workflow import WorkflowNodeExecution
+
+logger = logging.getLogger(__name__)
+
+# a batch that keeps failing is dropped after this many attempts instead of being retried forever
+MAX_FLUSH_ATTEMPTS = 3
+
+_writers: "weakref.WeakSet[WorkflowNodeExecutionWriter]" = weakref.WeakSet()
+
+
+class WorkflowNodeExecutionWriterMetrics(BaseModel):
+    queue_depth: int
+    flushed_rows: int
+    flush_count: int
+    dropped_rows: int
+
+
+class WorkflowNodeExecutionWriter:
+    """
+    Write-behind persistence of workflow node executions for one workflow run.
+
+    Snapshots are coalesced per execution, so a node that starts and finishes between two flushes is written once.
+    A background thread flushes them on an interval or once a batch is full, `flush` writes everything synchronously.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL,
+        batch_size: int = dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE,
+    ) -> None:
+        # the background thread has no app context of its own, `db.engine` needs the one of the run
+        self._flask_app = current_app._get_current_object()  # type: ignore
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._attempts: dict[str, int] = {}
+        self._condition = threading.Condition()
+        # held while a batch is written so that `flush` never races the background thread
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._last_save = 0.0
+        self._in_flight = 0
+        self._flushed_rows = 0
+        self._flush_count = 0
+        self._dropped_rows = 0
+        _writers.add(self)
+
+    def save(self, workflow_node_execution: WorkflowNodeExecution) -> None:
+        """
+        Queue the current state of a workflow node execution, replacing any state of it that is not written yet.
+        """
+        row = _snapshot(workflow_node_execution)
+        with self._condition:
+            self._pending[row["id"]] = row
+            self._last_save = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="workflow-node-execution-writer", daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self._batch_size:
+                self._condition.notify()
+
+    def flush(self) -> None:
+        """
+        Write all queued states before returning, errors are raised to the caller.
+        """
+        with self._write_lock:
+            rows = self._take()
+            try:
+                self._write(rows)
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._pending) + self._in_flight
+
+    def get_metrics(self) -> WorkflowNodeExecutionWriterMetrics:
+        return WorkflowNodeExecutionWriterMetrics(
+            queue_depth=self.queue_depth,
+            flushed_rows=self._flushed_rows,
+            flush_count=self._flush_count,
+            dropped_rows=self._dropped_rows,
+        )
+
+    def _take(self) -> list[dict[str, Any]]:
+        with self._condition:
+            rows = list(self._pending.values())
+            self._pending.clear()
+            self._in_flight = len(rows)
+            return rows
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if len(self._pending) < self._batch_size:
+                    self._condition.wait(self._flush_interval)
+                # stop once the run has gone quiet, the next save starts a new thread
+                if not self._pending and time.monotonic() - self._last_save > self._flush_interval:
+                    self._thread = None
+                    return
+
+            with self._write_lock:
+                rows = self._take()
+                try:
+                    with self._flask_app.app_context():
+                        self._write(rows)
+                except Exception:
+                    logger.exception("Failed to write workflow node executions")
+                    self._requeue(rows)
+                finally:
+                    with self._condition:
+                        self._in_flight = 0
+
+    def _requeue(self, rows: list[dict[str, Any]]) -> None:
+        with self._condition:
+            for row in rows:
+                attempts = self._attempts.get(row["id"], 0) + 1
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    self._attempts.pop(row["id"], None)
+                    self._dropped_rows += 1
+                    continue
+                self._attempts[row["id"]] = attempts
+                # a newer state queued in the meantime wins
+                self._pending.setdefault(row["id"], row)
+
+    def _write(self, rows: list[dict[str, Any]]) -> None:
+        if not rows:
+            return
+
+        # multi-row inserts need the same columns on every row, a started node has fewer columns than a finished one
+        rows_by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in rows:
+            rows_by_columns.setdefault(tuple(sorted(row)), []).append(row)
+
+        with Session(db.engine) as session:
+            for columns, column_rows in rows_by_columns.items():
+                for i in range(0, len(column_rows), self._batch_size):
+                    stmt = insert(WorkflowNodeExecution).values(column_rows[i : i + self._batch_size])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=["id"],
+                        set_={column: stmt.excluded[column] for column in columns if column != "id"},
+                    )
+                    session.execute(stmt)
+            session.commit()
+
+        with self._condition:
+            for row in rows:
+                self._attempts.pop(row["id"], None)
+            self._flushed_rows += len(rows)
+            self._flush_count += 1
+
+
+def _snapshot(workflow_node_execution: WorkflowNodeExecution) -> dict[str, Any]:
+    """
+    Copy the column values assigned on a workflow node execution, columns never assigned keep their server defaults.
+    """
+    state = inspect(workflow_node_execution)
+    return {
+        column_attr.columns[0].name: state.dict[column_attr.key]
+        for column_attr in state.mapper.column_attrs
+        if column_attr.key in state.dict
+    }
+
+
+def get_workflow_node_execution_writer_metrics() -> WorkflowNodeExecutionWriterMetrics:
+    """
+    Metrics summed over the writers of all workflow runs of this process.
+    """
+    writers = list(_writers)
+    metrics = [writer.get_metrics() for writer in writers]
+    return WorkflowNodeExecutionWriterMetrics(
+        queue_depth=sum(m.queue_depth for m in metrics),
+        flushed_rows=sum(m.flushed_rows for m in metrics),
+        flush_count=sum(m.flush_count for m in metrics),
+        dropped_rows=sum(m.dropped_rows for m in metrics),
+    )
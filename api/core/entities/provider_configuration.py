@@ -18,7 +18,11 @@ from core.entities.provider_entities import (
     SystemConfigurationStatus,
 )
 from core.helper import encrypter
-from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.model_provider_cache import (
+    ProviderConfigurationsCache,
+    ProviderCredentialsCache,
+    ProviderCredentialsCacheType,
+)
 from core.model_runtime.entities.model_entities import AIModelEntity, FetchFrom, ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -76,7 +80,12 @@ class ProviderConfiguration(BaseModel):
                 )
                 and ConfigurateMethod.PREDEFINED_MODEL not in self.provider.configurate_methods
             ):
-                self.provider.configurate_methods.append(ConfigurateMethod.PREDEFINED_MODEL)
+                # the provider schema is shared by every configuration, extend a copy of it
+                self.provider = self.provider.model_copy(
+                    update={
+                        "configurate_methods": [*self.provider.configurate_methods, ConfigurateMethod.PREDEFINED_MODEL]
+                    }
+                )
 
     def get_current_credentials(self, model_type: ModelType, model: str) -> Optional[dict]:
         """
@@ -125,7 +134,8 @@ class ProviderConfiguration(BaseModel):
             if not credentials and self.custom_configuration.provider:
                 credentials = self.custom_configuration.provider.credentials
 
-            return credentials
+            # provider configurations are shared across requests, callers get their own copy
+            return credentials.copy() if credentials else credentials
 
     def get_system_configuration_status(self) -> Optional[SystemConfigurationStatus]:
         """
@@ -254,6 +264,7 @@ class ProviderConfiguration(BaseModel):
             provider_record.is_valid = True
             provider_record.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
         else:
             provider_record = Provider()
             provider_record.tenant_id = self.tenant_id
@@ -264,6 +275,7 @@ class ProviderConfiguration(BaseModel):
 
             db.session.add(provider_record)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
         provider_model_credentials_cache = ProviderCredentialsCache(
             tenant_id=self.tenant_id, identity_id=provider_record.id, cache_type=ProviderCredentialsCacheType.PROVIDER
@@ -298,6 +310,7 @@ class ProviderConfiguration(BaseModel):
 
             db.session.delete(provider_record)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
             provider_model_credentials_cache = ProviderCredentialsCache(
                 tenant_id=self.tenant_id,
@@ -412,6 +425,7 @@ class ProviderConfiguration(BaseModel):
             provider_model_record.is_valid = True
             provider_model_record.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
         else:
             provider_model_record = ProviderModel()
             provider_model_record.tenant_id = self.tenant_id
@@ -422,6 +436,7 @@ class ProviderConfiguration(BaseModel):
             provider_model_record.is_valid = True
             db.session.add(provider_model_record)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
         provider_model_credentials_cache = ProviderCredentialsCache(
             tenant_id=self.tenant_id,
@@ -454,6 +469,7 @@ class ProviderConfiguration(BaseModel):
         if provider_model_record:
             db.session.delete(provider_model_record)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
             provider_model_credentials_cache = ProviderCredentialsCache(
                 tenant_id=self.tenant_id,
@@ -485,6 +501,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = True
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -494,6 +511,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = True
             db.session.add(model_setting)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
         return model_setting
 
@@ -519,6 +537,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = False
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -528,6 +547,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = False
             db.session.add(model_setting)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
         return model_setting
 
@@ -585,6 +605,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = True
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -594,6 +615,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = True
             db.session.add(model_setting)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
         return model_setting
 
@@ -619,6 +641,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = False
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -628,6 +651,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = False
             db.session.add(model_setting)
             db.session.commit()
+            ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
         return model_setting
 
@@ -684,6 +708,7 @@ class ProviderConfiguration(BaseModel):
             db.session.add(preferred_model_provider)
 
         db.session.commit()
+        ProviderConfigurationsCache(tenant_id=self.tenant_id).invalidate()
 
     def extract_secret_variables(self, credential_form_schemas: list[CredentialFormSchema]) -> list[str]:
         """
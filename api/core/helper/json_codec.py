@@ -0,0 +1,89 @@
+"""
+JSON serialization shared by workflow persistence, streaming responses and ops traces.
+
+orjson serializes dicts, lists, datetimes, UUIDs and enums natively and falls back to `_default` for everything
+else. For values orjson refuses (e.g. integers over 64 bits), the standard library encoder is used with the same
+fallback.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+from core.model_runtime.utils.encoders import jsonable_encoder
+from core.variables import Segment
+
+
+def _default(obj: Any) -> Any:
+    """
+    Convert a value the backend can't serialize natively into one it can.
+    """
+    if isinstance(obj, Segment):
+        return obj.to_object()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return jsonable_encoder(obj)
+
+
+class JSONBackend(ABC):
+    name: str
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class StdlibJSONBackend(JSONBackend):
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False).encode("utf-8")
+
+
+class OrjsonBackend(JSONBackend):
+    name = "orjson"
+
+    def __init__(self) -> None:
+        # enum keys such as NodeRunMetadataKey are common in execution metadata
+        self._option = orjson.OPT_NON_STR_KEYS
+        self._fallback = StdlibJSONBackend()
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_default, option=self._option)
+        except orjson.JSONEncodeError:
+            # orjson is stricter than the standard library, e.g. about big integers
+            return self._fallback.dumps(obj)
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+_backend: JSONBackend = OrjsonBackend()
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    Serialize to UTF-8 encoded JSON. Pydantic models, segments, datetimes and UUIDs are handled natively.
+    """
+    if isinstance(obj, BaseModel) and not isinstance(obj, Segment):
+        # pydantic serializes its own models faster than any generic walk
+        return obj.model_dump_json().encode("utf-8")
+    return _backend.dumps(obj)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize to a JSON string, non-ASCII characters are kept as-is.
+    """
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    return _backend.loads(data)
@@ -50,3 +50,56 @@ class ProviderCredentialsCache:
         :return:
         """
         redis_client.delete(self.cache_key)
+
+
+class ProviderConfigurationsCache:
+    """
+    Version of the provider configurations of a workspace, bumped whenever one of its provider, provider model,
+    preferred provider, model setting or load balancing records changes.
+    Provider configurations built before the version changed are no longer used.
+    """
+
+    def __init__(self, tenant_id: str):
+        self.cache_key = f"provider_configurations_version:tenant_id:{tenant_id}"
+
+    def get_version(self) -> int:
+        version = redis_client.get(self.cache_key)
+        return int(version) if version else 0
+
+    def invalidate(self) -> None:
+        redis_client.incr(self.cache_key)
+        # outlives every cached configuration, a reset version can't match one of them
+        redis_client.expire(self.cache_key, 86400)
+
+
+class PluginModelProvidersCache:
+    """
+    Version of the model providers and model schemas the plugins of a workspace declare, bumped whenever a plugin of
+    the workspace is installed, upgraded or uninstalled.
+
+    Remote debugging plugins connect to and disconnect from the plugin daemon without going through the API,
+    their model providers show up or go away once the cached ones expire after `PLUGIN_MODEL_CACHE_TTL` seconds.
+    """
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.cache_key = f"plugin_model_providers_version:tenant_id:{tenant_id}"
+
+    def get_version(self) -> int:
+        version = redis_client.get(self.cache_key)
+        return int(version) if version else 0
+
+    def invalidate(self) -> None:
+        redis_client.incr(self.cache_key)
+        redis_client.expire(self.cache_key, 86400)
+        # provider configurations are built from the declared providers
+        ProviderConfigurationsCache(self.tenant_id).invalidate()
+
+    def invalidate_once(self, event_id: str) -> None:
+        """
+        Invalidate for an event seen several times, e.g. an installation task polled after it succeeded,
+        only the first call bumps the version.
+        """
+        event_key = f"plugin_model_providers_invalidated:tenant_id:{self.tenant_id}:event:{event_id}"
+        if redis_client.set(event_key, 1, nx=True, ex=86400):
+            self.invalidate()
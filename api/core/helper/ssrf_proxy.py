@@ -2,8 +2,14 @@
 Proxy requests to avoid SSRF
 """
 
+import asyncio
+import importlib.util
 import logging
+import threading
 import time
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Optional
 
 import httpx
 
@@ -21,7 +27,96 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
-def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+def _proxy_key() -> tuple[Optional[str], Optional[str], Optional[str]]:
+    return dify_config.SSRF_PROXY_ALL_URL, dify_config.SSRF_PROXY_HTTP_URL, dify_config.SSRF_PROXY_HTTPS_URL
+
+
+def _client_kwargs() -> dict[str, Any]:
+    http2 = dify_config.SSRF_POOL_HTTP2_ENABLED
+    if http2 and importlib.util.find_spec("h2") is None:
+        logging.warning("SSRF_POOL_HTTP2_ENABLED is set but the h2 package is not installed, falling back to HTTP/1.1")
+        http2 = False
+    return {
+        "limits": httpx.Limits(
+            max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+        ),
+        "http2": http2,
+        # the clients are shared between users, cookies set by one response must never leak into another request
+        "cookies": CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+    }
+
+
+def _build_client() -> httpx.Client:
+    all_url, http_url, https_url = _proxy_key()
+    kwargs = _client_kwargs()
+    if all_url:
+        return httpx.Client(proxy=all_url, **kwargs)
+    elif http_url and https_url:
+        transport_kwargs = {"limits": kwargs["limits"], "http2": kwargs["http2"]}
+        proxy_mounts = {
+            "http://": httpx.HTTPTransport(proxy=http_url, **transport_kwargs),
+            "https://": httpx.HTTPTransport(proxy=https_url, **transport_kwargs),
+        }
+        return httpx.Client(mounts=proxy_mounts, **kwargs)
+    else:
+        return httpx.Client(**kwargs)
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    all_url, http_url, https_url = _proxy_key()
+    kwargs = _client_kwargs()
+    if all_url:
+        return httpx.AsyncClient(proxy=all_url, **kwargs)
+    elif http_url and https_url:
+        transport_kwargs = {"limits": kwargs["limits"], "http2": kwargs["http2"]}
+        proxy_mounts = {
+            "http://": httpx.AsyncHTTPTransport(proxy=http_url, **transport_kwargs),
+            "https://": httpx.AsyncHTTPTransport(proxy=https_url, **transport_kwargs),
+        }
+        return httpx.AsyncClient(mounts=proxy_mounts, **kwargs)
+    else:
+        return httpx.AsyncClient(**kwargs)
+
+
+_clients: dict[tuple[Optional[str], Optional[str], Optional[str]], httpx.Client] = {}
+_clients_lock = threading.Lock()
+# async clients are bound to the event loop they were first used on
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_client() -> httpx.Client:
+    """
+    Get the long-lived client for the current proxy configuration, connections are kept alive across requests.
+    """
+    key = _proxy_key()
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _build_client()
+                _clients[key] = client
+    return client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the long-lived async client for the current proxy configuration and running event loop.
+    """
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = _proxy_key()
+    client = loop_clients.get(key)
+    if client is None:
+        client = _build_async_client()
+        loop_clients[key] = client
+    return client
+
+
+def _prepare_kwargs(kwargs: dict[str, Any]) -> dict[str, Any]:
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
         if "follow_redirects" not in kwargs:
@@ -34,23 +129,16 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
             read=dify_config.SSRF_DEFAULT_READ_TIME_OUT,
             write=dify_config.SSRF_DEFAULT_WRITE_TIME_OUT,
         )
+    return kwargs
+
+
+def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+    kwargs = _prepare_kwargs(kwargs)
 
     retries = 0
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL),
-                }
-                with httpx.Client(mounts=proxy_mounts) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            else:
-                with httpx.Client() as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            response = get_client().request(method=method, url=url, **kwargs)
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
@@ -68,6 +156,30 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     raise MaxRetriesExceededError(f"Reached maximum retries ({max_retries}) for URL {url}")
 
 
+async def make_request_async(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+    kwargs = _prepare_kwargs(kwargs)
+
+    retries = 0
+    while retries <= max_retries:
+        try:
+            response = await get_async_client().request(method=method, url=url, **kwargs)
+
+            if response.status_code not in STATUS_FORCELIST:
+                return response
+            else:
+                logging.warning(f"Received status code {response.status_code} for URL {url} which is in the force list")
+
+        except httpx.RequestError as e:
+            logging.warning(f"Request to URL {url} failed on attempt {retries + 1}: {e}")
+            if max_retries == 0:
+                raise
+
+        retries += 1
+        if retries <= max_retries:
+            await asyncio.sleep(BACKOFF_FACTOR * (2 ** (retries - 1)))
+    raise MaxRetriesExceededError(f"Reached maximum retries ({max_retries}) for URL {url}")
+
+
 def get(url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     return make_request("GET", url, max_retries=max_retries, **kwargs)
 
@@ -2,6 +2,7 @@ import concurrent.futures
 import datetime
 import json
 import logging
+import queue
 import re
 import threading
 import time
@@ -19,6 +20,7 @@ from core.model_manager import ModelInstance, ModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.docstore.dataset_docstore import DatasetDocumentStore
 from core.rag.extractor.entity.extract_setting import ExtractSetting
 from core.rag.index_processor.constant.index_type import IndexType
@@ -40,6 +42,39 @@ from models.dataset import Document as DatasetDocument
 from models.model import UploadFile
 from services.feature_service import FeatureService
 
+# documents to embed per batch of the indexing pipeline, CacheEmbedding splits a batch further by the
+# max chunks of the embedding model
+INDEXING_BATCH_SIZE = 64
+# batches waiting between two stages of the indexing pipeline
+INDEXING_QUEUE_SIZE = 4
+INDEXING_EMBEDDING_WORKERS = 4
+INDEXING_WRITE_WORKERS = 2
+
+
+def _put_batch(q: queue.Queue, item: Any, failed: threading.Event) -> bool:
+    """
+    Put an item on a pipeline queue, giving up once another stage failed.
+    """
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get_batch(q: queue.Queue, failed: threading.Event) -> Any:
+    """
+    Get an item from a pipeline queue, None once the queue is closed or another stage failed.
+    """
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
 
 class IndexingRunner:
     def __init__(self):
@@ -518,15 +553,6 @@ class IndexingRunner:
         insert index and update document/segment status to completed
         """
 
-        embedding_model_instance = None
-        if dataset.indexing_technique == "high_quality":
-            embedding_model_instance = self.model_manager.get_model_instance(
-                tenant_id=dataset.tenant_id,
-                provider=dataset.embedding_model_provider,
-                model_type=ModelType.TEXT_EMBEDDING,
-                model=dataset.embedding_model,
-            )
-
         # chunk nodes by chunk size
         indexing_start_at = time.perf_counter()
         tokens = 0
@@ -538,36 +564,14 @@ class IndexingRunner:
             )
             create_keyword_thread.start()
 
-        max_workers = 10
         if dataset.indexing_technique == "high_quality":
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-
-                # Distribute documents into multiple groups based on the hash values of page_content
-                # This is done to prevent multiple threads from processing the same document,
-                # Thereby avoiding potential database insertion deadlocks
-                document_groups: list[list[Document]] = [[] for _ in range(max_workers)]
-                for document in documents:
-                    hash = helper.generate_text_hash(document.page_content)
-                    group_index = int(hash, 16) % max_workers
-                    document_groups[group_index].append(document)
-                for chunk_documents in document_groups:
-                    if len(chunk_documents) == 0:
-                        continue
-                    futures.append(
-                        executor.submit(
-                            self._process_chunk,
-                            current_app._get_current_object(),  # type: ignore
-                            index_processor,
-                            chunk_documents,
-                            dataset,
-                            dataset_document,
-                            embedding_model_instance,
-                        )
-                    )
-
-                for future in futures:
-                    tokens += future.result()
+            tokens = self._run_indexing_pipeline(
+                current_app._get_current_object(),  # type: ignore
+                index_processor,
+                dataset,
+                dataset_document,
+                documents,
+            )
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX:
             create_keyword_thread.join()
         indexing_end_at = time.perf_counter()
@@ -609,38 +613,115 @@ class IndexingRunner:
 
                 db.session.commit()
 
-    def _process_chunk(
-        self, flask_app, index_processor, chunk_documents, dataset, dataset_document, embedding_model_instance
-    ):
-        with flask_app.app_context():
-            # check document is paused
-            self._check_document_paused_status(dataset_document.id)
-
-            tokens = 0
-            if embedding_model_instance:
-                page_content_list = [document.page_content for document in chunk_documents]
-                tokens += sum(embedding_model_instance.get_text_embedding_num_tokens(page_content_list))
-
-            # load index
-            index_processor.load(dataset, chunk_documents, with_keywords=False)
-
-            document_ids = [document.metadata["doc_id"] for document in chunk_documents]
-            db.session.query(DocumentSegment).filter(
-                DocumentSegment.document_id == dataset_document.id,
-                DocumentSegment.dataset_id == dataset.id,
-                DocumentSegment.index_node_id.in_(document_ids),
-                DocumentSegment.status == "indexing",
-            ).update(
-                {
-                    DocumentSegment.status: "completed",
-                    DocumentSegment.enabled: True,
-                    DocumentSegment.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-                }
-            )
+    def _run_indexing_pipeline(
+        self,
+        flask_app,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        documents: list[Document],
+    ) -> int:
+        """
+        Embed the documents, write them to the vector store and complete their segments batch by batch.
+        Stages are connected by bounded queues, so the next batches are embedded while the previous ones are written.
+        :return: tokens used by the embedding model
+        """
+        embed_queue: queue.Queue[Optional[list[Document]]] = queue.Queue(maxsize=INDEXING_QUEUE_SIZE)
+        write_queue: queue.Queue[Optional[tuple[list[Document], list[Document], list[list[float]]]]] = queue.Queue(
+            maxsize=INDEXING_QUEUE_SIZE
+        )
+        # set when a stage fails, the other stages stop instead of waiting on their queues
+        failed = threading.Event()
+        tokens = 0
+        tokens_lock = threading.Lock()
 
-            db.session.commit()
+        def embed():
+            nonlocal tokens
+            try:
+                with flask_app.app_context():
+                    vector = Vector(dataset)
+                    while (batch := _get_batch(embed_queue, failed)) is not None:
+                        vector_documents = index_processor.get_vector_documents(batch)
+                        embeddings, batch_tokens = vector.embed_documents(vector_documents)
+                        with tokens_lock:
+                            tokens += batch_tokens
+                        if not _put_batch(write_queue, (batch, vector_documents, embeddings), failed):
+                            return
+            except Exception:
+                failed.set()
+                raise
+
+        def write():
+            try:
+                with flask_app.app_context():
+                    vector = Vector(dataset)
+                    while (item := _get_batch(write_queue, failed)) is not None:
+                        batch, vector_documents, embeddings = item
+                        self._check_document_paused_status(dataset_document.id)
+                        vector.create_with_embeddings(vector_documents, embeddings)
+                        self._complete_segments(dataset, dataset_document, batch)
+            except Exception:
+                failed.set()
+                raise
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=INDEXING_EMBEDDING_WORKERS + INDEXING_WRITE_WORKERS
+        ) as executor:
+            embed_futures = [executor.submit(embed) for _ in range(INDEXING_EMBEDDING_WORKERS)]
+            write_futures = [executor.submit(write) for _ in range(INDEXING_WRITE_WORKERS)]
+            try:
+                for batch in self._iter_indexing_batches(index_processor, documents):
+                    self._check_document_paused_status(dataset_document.id)
+                    if not _put_batch(embed_queue, batch, failed):
+                        break
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                for _ in embed_futures:
+                    _put_batch(embed_queue, None, failed)
+
+            concurrent.futures.wait(embed_futures)
+            for _ in write_futures:
+                _put_batch(write_queue, None, failed)
+            for future in embed_futures + write_futures:
+                future.result()
+
+        return tokens
 
-            return tokens
+    @staticmethod
+    def _iter_indexing_batches(index_processor: BaseIndexProcessor, documents: list[Document]):
+        """
+        Group documents into batches of about INDEXING_BATCH_SIZE documents to embed.
+        """
+        batch: list[Document] = []
+        batch_size = 0
+        for document in documents:
+            batch.append(document)
+            batch_size += len(index_processor.get_vector_documents([document]))
+            if batch_size >= INDEXING_BATCH_SIZE:
+                yield batch
+                batch = []
+                batch_size = 0
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _complete_segments(dataset: Dataset, dataset_document: DatasetDocument, documents: list[Document]) -> None:
+        document_ids = [document.metadata["doc_id"] for document in documents if document.metadata]
+        db.session.query(DocumentSegment).filter(
+            DocumentSegment.document_id == dataset_document.id,
+            DocumentSegment.dataset_id == dataset.id,
+            DocumentSegment.index_node_id.in_(document_ids),
+            DocumentSegment.status == "indexing",
+        ).update(
+            {
+                DocumentSegment.status: "completed",
+                DocumentSegment.enabled: True,
+                DocumentSegment.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+            }
+        )
+        db.session.commit()
 
     @staticmethod
     def _check_document_paused_status(document_id: str):
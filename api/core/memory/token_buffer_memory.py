@@ -1,8 +1,9 @@
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from functools import cached_property
 from typing import Optional
 
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
-from core.file import file_manager
+from core.file import FileUploadConfig, file_manager
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -13,17 +14,25 @@ from core.model_runtime.entities import (
     TextPromptMessageContent,
     UserPromptMessage,
 )
-from core.prompt.utils.extract_thread_messages import extract_thread_messages
+from core.prompt.utils.extract_thread_messages import iter_thread_messages
 from extensions.ext_database import db
 from factories import file_factory
-from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.model import App, AppMode, Conversation, Message, MessageFile
+from models.workflow import Workflow, WorkflowRun
+
+# history messages fetched per query, most conversations fit the token budget within the first page
+HISTORY_MESSAGE_PAGE_SIZE = 50
 
 
 class TokenBufferMemory:
     def __init__(self, conversation: Conversation, model_instance: ModelInstance) -> None:
         self.conversation = conversation
         self.model_instance = model_instance
+        # filled page by page while history messages are read
+        self._message_files: dict[str, list[MessageFile]] = {}
+        self._workflow_ids: dict[str, str] = {}
+        # file upload config per workflow, keyed by None for apps configured through the model config
+        self._file_upload_configs: dict[Optional[str], Optional[FileUploadConfig]] = {}
 
     def get_history_prompt_messages(
         self, max_token_limit: int = 2000, message_limit: Optional[int] = None
@@ -33,9 +42,56 @@ class TokenBufferMemory:
         :param max_token_limit: max token limit
         :param message_limit: message limit
         """
-        app_record = self.conversation.app
+        if message_limit and message_limit > 0:
+            message_limit = min(message_limit, 500)
+        else:
+            message_limit = 500
 
-        # fetch limited messages, and return reversed
+        # walk the thread of the last message from newest to oldest. the whole window is counted in one call, as
+        # the model counts it in the prompt, once per page of messages so that reading stops as soon as older
+        # messages cannot fit anymore.
+        history: list[PromptMessage] = []
+        counted_messages = 0
+        curr_message_tokens = 0
+        thread_messages = iter_thread_messages(self._iter_messages(message_limit))
+        for index, message in enumerate(thread_messages):
+            # for newly created message, its answer is temporarily empty, we don't need to add it to memory
+            if index == 0 and not message.answer:
+                continue
+
+            history.extend(reversed(self._build_prompt_messages(message)))
+            if (index + 1) % HISTORY_MESSAGE_PAGE_SIZE == 0:
+                counted_messages = len(history)
+                curr_message_tokens = self.model_instance.get_llm_num_tokens(history[::-1])
+                if curr_message_tokens > max_token_limit:
+                    break
+
+        if not history:
+            return []
+
+        prompt_messages = history[::-1]
+        if counted_messages != len(prompt_messages):
+            curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        if curr_message_tokens <= max_token_limit:
+            return prompt_messages
+
+        # prune the oldest messages until the rest fits, keeping at least the latest one. the token count only
+        # grows with every older message kept, so the cut is found by bisecting instead of recounting per message.
+        low, high = 1, len(prompt_messages) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.model_instance.get_llm_num_tokens(prompt_messages[middle:]) <= max_token_limit:
+                high = middle
+            else:
+                low = middle + 1
+
+        return prompt_messages[low:]
+
+    def _iter_messages(self, message_limit: int) -> Iterator[Message]:
+        """
+        Yield at most message_limit messages of the conversation newest first, fetched page by page
+        so that the caller can stop once it has enough history.
+        """
         query = (
             db.session.query(
                 Message.id,
@@ -51,83 +107,96 @@ class TokenBufferMemory:
             .order_by(Message.created_at.desc())
         )
 
-        if message_limit and message_limit > 0:
-            message_limit = min(message_limit, 500)
-        else:
-            message_limit = 500
+        for offset in range(0, message_limit, HISTORY_MESSAGE_PAGE_SIZE):
+            page_size = min(HISTORY_MESSAGE_PAGE_SIZE, message_limit - offset)
+            messages = query.offset(offset).limit(page_size).all()
+            self._prefetch_message_files(messages)
+            yield from messages
+            if len(messages) < page_size:
+                return
 
-        messages = query.limit(message_limit).all()
-
-        # instead of all messages from the conversation, we only need to extract messages
-        # that belong to the thread of last message
-        thread_messages = extract_thread_messages(messages)
-
-        # for newly created message, its answer is temporarily empty, we don't need to add it to memory
-        if thread_messages and not thread_messages[0].answer:
-            thread_messages.pop(0)
-
-        messages = list(reversed(thread_messages))
-
-        prompt_messages: list[PromptMessage] = []
-        for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
-            if files:
-                file_extra_config = None
-                if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
-                else:
-                    if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
-
-                detail = ImagePromptMessageContent.DETAIL.LOW
-                if file_extra_config and app_record:
-                    file_objs = file_factory.build_from_message_files(
-                        message_files=files, tenant_id=app_record.tenant_id, config=file_extra_config
-                    )
-                    if file_extra_config.image_config and file_extra_config.image_config.detail:
-                        detail = file_extra_config.image_config.detail
-                else:
-                    file_objs = []
-
-                if not file_objs:
-                    prompt_messages.append(UserPromptMessage(content=message.query))
-                else:
-                    prompt_message_contents: list[PromptMessageContent] = []
-                    prompt_message_contents.append(TextPromptMessageContent(data=message.query))
-                    for file in file_objs:
-                        prompt_message = file_manager.to_prompt_message_content(
-                            file,
-                            image_detail_config=detail,
-                        )
-                        prompt_message_contents.append(prompt_message)
-
-                    prompt_messages.append(UserPromptMessage(content=prompt_message_contents))
+    @cached_property
+    def _app_record(self) -> Optional[App]:
+        return self.conversation.app
 
-            else:
-                prompt_messages.append(UserPromptMessage(content=message.query))
+    def _prefetch_message_files(self, messages: Sequence[Message]) -> None:
+        """
+        Load the files of a page of messages, and the workflows of the runs that produced them, in one query each.
+        """
+        if not messages:
+            return
+        files = db.session.query(MessageFile).filter(MessageFile.message_id.in_([m.id for m in messages])).all()
+        for file in files:
+            self._message_files.setdefault(file.message_id, []).append(file)
+
+        if self.conversation.mode in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            workflow_run_ids = [
+                m.workflow_run_id for m in messages if m.workflow_run_id and m.id in self._message_files
+            ]
+            if workflow_run_ids:
+                workflow_runs = (
+                    db.session.query(WorkflowRun.id, WorkflowRun.workflow_id)
+                    .filter(WorkflowRun.id.in_(workflow_run_ids))
+                    .all()
+                )
+                self._workflow_ids.update({run.id: run.workflow_id for run in workflow_runs})
+
+    def _get_file_upload_config(self, message: Message) -> Optional[FileUploadConfig]:
+        """
+        Resolve the file upload config of a message, once per conversation or once per workflow version.
+        """
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            if None not in self._file_upload_configs:
+                self._file_upload_configs[None] = FileUploadConfigManager.convert(self.conversation.model_config)
+            return self._file_upload_configs[None]
+
+        workflow_id = self._workflow_ids.get(message.workflow_run_id) if message.workflow_run_id else None
+        if not workflow_id:
+            return None
+        if workflow_id not in self._file_upload_configs:
+            workflow = db.session.query(Workflow).filter(Workflow.id == workflow_id).first()
+            self._file_upload_configs[workflow_id] = (
+                FileUploadConfigManager.convert(workflow.features_dict, is_vision=False) if workflow else None
+            )
+        return self._file_upload_configs[workflow_id]
 
-            prompt_messages.append(AssistantPromptMessage(content=message.answer))
+    def _build_prompt_messages(self, message: Message) -> list[PromptMessage]:
+        """
+        Build the user and assistant prompt messages of a history message.
+        """
+        files = self._message_files.get(message.id)
+        if files:
+            app_record = self._app_record
+            file_extra_config = self._get_file_upload_config(message)
+
+            detail = ImagePromptMessageContent.DETAIL.LOW
+            if file_extra_config and app_record:
+                file_objs = file_factory.build_from_message_files(
+                    message_files=files, tenant_id=app_record.tenant_id, config=file_extra_config
+                )
+                if file_extra_config.image_config and file_extra_config.image_config.detail:
+                    detail = file_extra_config.image_config.detail
+            else:
+                file_objs = []
 
-        if not prompt_messages:
-            return []
+            if not file_objs:
+                user_prompt_message = UserPromptMessage(content=message.query)
+            else:
+                prompt_message_contents: list[PromptMessageContent] = []
+                prompt_message_contents.append(TextPromptMessageContent(data=message.query))
+                for file in file_objs:
+                    prompt_message = file_manager.to_prompt_message_content(
+                        file,
+                        image_detail_config=detail,
+                    )
+                    prompt_message_contents.append(prompt_message)
 
-        # prune the chat message if it exceeds the max token limit
-        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+                user_prompt_message = UserPromptMessage(content=prompt_message_contents)
 
-        if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        else:
+            user_prompt_message = UserPromptMessage(content=message.query)
 
-        return prompt_messages
+        return [user_prompt_message, AssistantPromptMessage(content=message.answer)]
 
     def get_history_prompt_text(
         self,
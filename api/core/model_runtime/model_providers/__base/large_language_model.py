@@ -1,3 +1,4 @@
+import json
 import logging
 import time
 from collections.abc import Generator, Sequence
@@ -19,7 +20,12 @@ from core.model_runtime.entities.model_entities import (
     PriceType,
 )
 from core.model_runtime.model_providers.__base.ai_model import AIModel
+from core.model_runtime.model_providers.__base.tokenizers.local_tokenizer import (
+    LocalTokenizer,
+    get_cached_token_count,
+)
 from core.plugin.manager.model import PluginModelManager
+from libs.helper import generate_text_hash
 
 logger = logging.getLogger(__name__)
 
@@ -295,17 +301,37 @@ class LargeLanguageModel(AIModel):
         :param tools: tools for tool calling
         :return:
         """
-        plugin_model_manager = PluginModelManager()
-        return plugin_model_manager.get_llm_num_tokens(
-            tenant_id=self.tenant_id,
-            user_id="unknown",
-            plugin_id=self.plugin_id,
-            provider=self.provider_name,
-            model_type=self.model_type.value,
-            model=model,
-            credentials=credentials,
-            prompt_messages=prompt_messages,
-            tools=tools,
+        num_tokens = LocalTokenizer.get_num_tokens_for_messages(
+            f"{self.plugin_id}/{self.provider_name}", model, prompt_messages, tools
+        )
+        if num_tokens is not None:
+            return num_tokens
+
+        def get_remote_num_tokens() -> int:
+            plugin_model_manager = PluginModelManager()
+            return plugin_model_manager.get_llm_num_tokens(
+                tenant_id=self.tenant_id,
+                user_id="unknown",
+                plugin_id=self.plugin_id,
+                provider=self.provider_name,
+                model_type=self.model_type.value,
+                model=model,
+                credentials=credentials,
+                prompt_messages=prompt_messages,
+                tools=tools,
+            )
+
+        content = json.dumps(
+            {
+                "prompt_messages": [
+                    prompt_message.model_dump(mode="json", serialize_as_any=True) for prompt_message in prompt_messages
+                ],
+                "tools": [tool.model_dump(mode="json") for tool in tools or []],
+            },
+            sort_keys=True,
+        )
+        return get_cached_token_count(
+            (self.plugin_id, self.provider_name, model, generate_text_hash(content)), get_remote_num_tokens
         )
 
     def _calc_response_usage(
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, cast
 
 from pydantic import ConfigDict
 
@@ -6,7 +6,13 @@ from core.entities.embedding_type import EmbeddingInputType
 from core.model_runtime.entities.model_entities import ModelPropertyKey, ModelType
 from core.model_runtime.entities.text_embedding_entities import TextEmbeddingResult
 from core.model_runtime.model_providers.__base.ai_model import AIModel
+from core.model_runtime.model_providers.__base.tokenizers.local_tokenizer import (
+    LocalTokenizer,
+    get_cached_token_counts,
+    put_cached_token_counts,
+)
 from core.plugin.manager.model import PluginModelManager
+from libs.helper import generate_text_hash
 
 
 class TextEmbeddingModel(AIModel):
@@ -61,16 +67,29 @@ class TextEmbeddingModel(AIModel):
         :param texts: texts to embed
         :return:
         """
-        plugin_model_manager = PluginModelManager()
-        return plugin_model_manager.get_text_embedding_num_tokens(
-            tenant_id=self.tenant_id,
-            user_id="unknown",
-            plugin_id=self.plugin_id,
-            provider=self.provider_name,
-            model=model,
-            credentials=credentials,
-            texts=texts,
-        )
+        num_tokens = LocalTokenizer.get_num_tokens(f"{self.plugin_id}/{self.provider_name}", model, texts)
+        if num_tokens is not None:
+            return num_tokens
+
+        # only texts that were never counted for this model go to the plugin daemon
+        cache_keys = [(self.plugin_id, self.provider_name, model, generate_text_hash(text)) for text in texts]
+        cached_num_tokens = get_cached_token_counts(cache_keys)
+        missing_indices = [i for i, count in enumerate(cached_num_tokens) if count is None]
+        if missing_indices:
+            plugin_model_manager = PluginModelManager()
+            remote_num_tokens = plugin_model_manager.get_text_embedding_num_tokens(
+                tenant_id=self.tenant_id,
+                user_id="unknown",
+                plugin_id=self.plugin_id,
+                provider=self.provider_name,
+                model=model,
+                credentials=credentials,
+                texts=[texts[i] for i in missing_indices],
+            )
+            for i, count in zip(missing_indices, remote_num_tokens):
+                cached_num_tokens[i] = count
+            put_cached_token_counts({cache_keys[i]: cached_num_tokens[i] for i in missing_indices})
+        return cast(list[int], cached_num_tokens)
 
     def _get_context_size(self, model: str, credentials: dict) -> int:
         """
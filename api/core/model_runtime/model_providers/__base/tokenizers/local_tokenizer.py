@@ -0,0 +1,243 @@
+import json
+import logging
+from collections.abc import Callable, Sequence
+from threading import Lock
+from typing import Optional
+
+from core.helper.lru_cache import LRUCache
+from core.model_runtime.entities.message_entities import (
+    AssistantPromptMessage,
+    PromptMessage,
+    PromptMessageTool,
+    TextPromptMessageContent,
+)
+from core.plugin.entities.plugin import ModelProviderID
+from libs.helper import generate_text_hash
+
+logger = logging.getLogger(__name__)
+
+# token counts kept in memory, keyed by tokenizer (or remote model) and content hash
+TOKEN_COUNT_CACHE_SIZE = 10000
+
+# message framing overhead of the chat format, see the OpenAI cookbook on counting tokens
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+TOKENS_PER_REPLY = 3
+
+_token_count_cache = LRUCache(TOKEN_COUNT_CACHE_SIZE)
+_token_count_cache_lock = Lock()
+
+
+def get_cached_token_count(key: tuple, compute: Callable[[], int]) -> int:
+    """
+    Return the token count cached under key, computing and caching it on a miss.
+    """
+    with _token_count_cache_lock:
+        num_tokens = _token_count_cache.get(key)
+    if num_tokens is None:
+        num_tokens = compute()
+        with _token_count_cache_lock:
+            _token_count_cache.put(key, num_tokens)
+    return num_tokens
+
+
+def get_cached_token_counts(keys: Sequence[tuple]) -> list[Optional[int]]:
+    """
+    Look up several token counts at once, None for the keys that were never cached.
+    """
+    with _token_count_cache_lock:
+        return [_token_count_cache.get(key) for key in keys]
+
+
+def put_cached_token_counts(num_tokens: dict[tuple, int]) -> None:
+    with _token_count_cache_lock:
+        for key, count in num_tokens.items():
+            _token_count_cache.put(key, count)
+
+
+def _load_tiktoken(encoding_name: str) -> Callable[[str], int]:
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count
+
+
+# (model name prefix, tiktoken encoding name) of the OpenAI model families, longest prefix wins
+_OPENAI_FAMILIES = [
+    ("gpt-4o", "o200k_base"),
+    ("gpt-4.1", "o200k_base"),
+    ("gpt-4.5", "o200k_base"),
+    ("chatgpt-4o", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("o3", "o200k_base"),
+    ("o4", "o200k_base"),
+    ("gpt-4", "cl100k_base"),
+    ("gpt-3.5", "cl100k_base"),
+    ("gpt-35", "cl100k_base"),
+    ("text-embedding-3", "cl100k_base"),
+    ("text-embedding-ada-002", "cl100k_base"),
+]
+
+
+def _normalize_provider(provider: str) -> Optional[str]:
+    try:
+        return str(ModelProviderID(provider))
+    except ValueError:
+        return None
+
+
+class LocalTokenizer:
+    """
+    Registry of tokenizers that can count tokens in-process for known model families of a provider.
+    Models without a registered family keep counting tokens through their provider.
+
+    Tokenizers are loaded by `preload` when the app starts, never on the request path: tiktoken
+    downloads its encodings on first use, which blocks until the network times out in air-gapped
+    deployments. Point `TIKTOKEN_CACHE_DIR` at a directory holding the encoding files to load them offline.
+    Until a tokenizer is loaded, its models count tokens remotely.
+    """
+
+    # (provider, model name prefix, tiktoken encoding name), longest prefix of the provider wins
+    _families: list[tuple[str, str, str]] = [
+        (str(ModelProviderID(provider)), model_prefix, encoding_name)
+        for provider in ("openai", "azure_openai")
+        for model_prefix, encoding_name in _OPENAI_FAMILIES
+    ]
+    _loaders: dict[str, Callable[[], Callable[[str], int]]] = {}
+    _encoders: dict[str, Callable[[str], int]] = {}
+    _unavailable: set[str] = set()
+    _lock = Lock()
+    _preload_lock = Lock()
+
+    @classmethod
+    def register(
+        cls,
+        provider: str,
+        model_prefix: str,
+        encoding_name: str,
+        loader: Optional[Callable[[], Callable[[str], int]]] = None,
+    ) -> None:
+        """
+        Map a model family of a provider to a tokenizer, loaded on the next `preload`.
+
+        :param provider: provider name, like `openai` or `langgenius/openai/openai`
+        :param model_prefix: model name prefix of the family
+        :param encoding_name: tiktoken encoding name, or any name when a loader is given
+        :param loader: builds a function counting the tokens of a text, defaults to the tiktoken encoding
+        """
+        provider = str(ModelProviderID(provider))
+        with cls._lock:
+            cls._families = [family for family in cls._families if family[:2] != (provider, model_prefix)]
+            cls._families.append((provider, model_prefix, encoding_name))
+            if loader:
+                cls._loaders[encoding_name] = loader
+
+    @classmethod
+    def get_encoding_name(cls, provider: str, model: str) -> Optional[str]:
+        provider_id = _normalize_provider(provider)
+        model = model.lower()
+        matches = [family for family in cls._families if family[0] == provider_id and model.startswith(family[1])]
+        if not matches:
+            return None
+        return max(matches, key=lambda family: len(family[1]))[2]
+
+    @classmethod
+    def preload(cls) -> None:
+        """
+        Load the tokenizers of all registered families.
+        A tokenizer that fails to load is not retried, its models keep counting tokens remotely.
+        """
+        with cls._preload_lock:
+            with cls._lock:
+                encoding_names = {family[2] for family in cls._families}
+                pending = sorted(encoding_names - cls._encoders.keys() - cls._unavailable)
+            for encoding_name in pending:
+                try:
+                    loader = cls._loaders.get(encoding_name)
+                    encoder = loader() if loader else _load_tiktoken(encoding_name)
+                except Exception:
+                    logger.warning(
+                        f"Failed to load local tokenizer {encoding_name}, falling back to remote token counting"
+                    )
+                    with cls._lock:
+                        cls._unavailable.add(encoding_name)
+                    continue
+                with cls._lock:
+                    cls._encoders[encoding_name] = encoder
+
+    @classmethod
+    def get_encoder(cls, provider: str, model: str) -> Optional[tuple[str, Callable[[str], int]]]:
+        """
+        Get the encoding name and local token counting function of a model.
+        None when its family is unknown or its tokenizer isn't loaded.
+        """
+        encoding_name = cls.get_encoding_name(provider, model)
+        if encoding_name is None:
+            return None
+        encoder = cls._encoders.get(encoding_name)
+        if encoder is None:
+            return None
+        return encoding_name, encoder
+
+    @classmethod
+    def _count(cls, encoder: Callable[[str], int], encoding_name: str, text: str) -> int:
+        if not text:
+            return 0
+        return get_cached_token_count((encoding_name, generate_text_hash(text)), lambda: encoder(text))
+
+    @classmethod
+    def get_num_tokens(cls, provider: str, model: str, texts: Sequence[str]) -> Optional[list[int]]:
+        """
+        Count tokens of each text locally, None when the model has no local tokenizer.
+        """
+        resolved = cls.get_encoder(provider, model)
+        if resolved is None:
+            return None
+        encoding_name, encoder = resolved
+        return [cls._count(encoder, encoding_name, text) for text in texts]
+
+    @classmethod
+    def get_num_tokens_for_messages(
+        cls,
+        provider: str,
+        model: str,
+        prompt_messages: Sequence[PromptMessage],
+        tools: Optional[Sequence[PromptMessageTool]] = None,
+    ) -> Optional[int]:
+        """
+        Count tokens of chat prompt messages locally.
+        None when the model has no local tokenizer or a message carries non-text content.
+        """
+        resolved = cls.get_encoder(provider, model)
+        if resolved is None:
+            return None
+        encoding_name, encoder = resolved
+
+        def count(text: str) -> int:
+            return cls._count(encoder, encoding_name, text)
+
+        num_tokens = 0
+        for message in prompt_messages:
+            num_tokens += TOKENS_PER_MESSAGE + count(message.role.value)
+            if isinstance(message.content, str):
+                num_tokens += count(message.content)
+            elif message.content:
+                for content in message.content:
+                    if not isinstance(content, TextPromptMessageContent):
+                        return None
+                    num_tokens += count(content.data)
+            if message.name:
+                num_tokens += TOKENS_PER_NAME + count(message.name)
+            if isinstance(message, AssistantPromptMessage):
+                for tool_call in message.tool_calls:
+                    num_tokens += count(tool_call.function.name) + count(tool_call.function.arguments)
+        num_tokens += TOKENS_PER_REPLY
+
+        for tool in tools or []:
+            num_tokens += count(tool.name) + count(tool.description)
+            num_tokens += count(json.dumps(tool.parameters, ensure_ascii=False))
+        return num_tokens
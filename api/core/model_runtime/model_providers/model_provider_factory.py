@@ -94,8 +94,11 @@ class ModelProviderFactory:
             plugin_providers = self.plugin_model_manager.fetch_model_providers(self.tenant_id)
 
             for provider in plugin_providers:
-                provider.declaration.provider = provider.plugin_id + "/" + provider.declaration.provider
-                plugin_model_providers.append(provider)
+                # the fetched providers are cached across requests, prefix the name on a copy
+                declaration = provider.declaration.model_copy(
+                    update={"provider": provider.plugin_id + "/" + provider.declaration.provider}
+                )
+                plugin_model_providers.append(provider.model_copy(update={"declaration": declaration}))
 
             return plugin_model_providers
 
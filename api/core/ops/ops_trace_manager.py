@@ -12,6 +12,7 @@ from flask import current_app
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from core.helper import json_codec
 from core.helper.encrypter import decrypt_token, encrypt_token, obfuscated_token
 from core.ops.entities.config_entity import (
     OPS_FILE_PATH,
@@ -800,10 +801,11 @@ class TraceQueueManager:
                 task_data = TaskData(
                     app_id=task.app_id,
                     trace_info_type=type(trace_info).__name__,
-                    trace_info=trace_info.model_dump() if trace_info else None,
+                    # serialized once, straight to JSON, together with the task data
+                    trace_info=trace_info,
                 )
                 file_path = f"{OPS_FILE_PATH}{task.app_id}/{file_id}.json"
-                storage.save(file_path, task_data.model_dump_json().encode("utf-8"))
+                storage.save(file_path, json_codec.dumps_bytes(task_data))
                 file_info = {
                     "file_id": file_id,
                     "app_id": task.app_id,
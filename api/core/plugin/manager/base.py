@@ -28,6 +28,7 @@ from core.plugin.manager.exc import (
     PluginPermissionDeniedError,
     PluginUniqueIdentifierError,
 )
+from core.plugin.utils.http_client import get_plugin_daemon_session
 
 plugin_daemon_inner_api_baseurl = dify_config.PLUGIN_DAEMON_URL
 plugin_daemon_inner_api_key = dify_config.PLUGIN_DAEMON_KEY
@@ -60,7 +61,7 @@ class BasePluginManager:
             data = json.dumps(data)
 
         try:
-            response = requests.request(
+            response = get_plugin_daemon_session().request(
                 method=method, url=str(url), headers=headers, data=data, params=params, stream=stream, files=files
             )
         except requests.exceptions.ConnectionError:
@@ -82,12 +83,16 @@ class BasePluginManager:
         Make a stream request to the plugin daemon inner API
         """
         response = self._request(method, path, headers, data, params, files, stream=True)
-        for line in response.iter_lines():
-            line = line.decode("utf-8").strip()
-            if line.startswith("data:"):
-                line = line[5:].strip()
-            if line:
-                yield line
+        try:
+            for line in response.iter_lines():
+                line = line.decode("utf-8").strip()
+                if line.startswith("data:"):
+                    line = line[5:].strip()
+                if line:
+                    yield line
+        finally:
+            # hand the connection back to the pool even if the consumer stops early
+            response.close()
 
     def _stream_request_with_model(
         self,
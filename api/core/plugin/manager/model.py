@@ -1,7 +1,14 @@
 import binascii
-from collections.abc import Generator, Sequence
-from typing import IO, Optional
-
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Generator, Hashable, Sequence
+from typing import IO, Any, Optional
+
+from configs import dify_config
+from core.helper.lru_cache import LRUCache
+from core.helper.model_provider_cache import PluginModelProvidersCache
 from core.model_runtime.entities.llm_entities import LLMResultChunk
 from core.model_runtime.entities.message_entities import PromptMessage, PromptMessageTool
 from core.model_runtime.entities.model_entities import AIModelEntity
@@ -20,12 +27,46 @@ from core.plugin.entities.plugin_daemon import (
 )
 from core.plugin.manager.base import BasePluginManager
 
+# model providers and schemas fetched from the plugin daemon: (version, expires at, value), the cached objects are
+# shared by every request of the process and must not be modified
+_model_providers_cache = LRUCache(dify_config.PROVIDER_CONFIGURATIONS_CACHE_CAPACITY)
+_model_schema_cache = LRUCache(dify_config.PLUGIN_MODEL_SCHEMA_CACHE_CAPACITY)
+_cache_lock = threading.Lock()
+
+
+def _get_cached(cache: LRUCache, key: Hashable, version: int) -> Any:
+    with _cache_lock:
+        cached = cache.get(key)
+    if cached and cached[0] == version and cached[1] > time.monotonic():
+        return cached[2]
+    return None
+
+
+def _put_cached(cache: LRUCache, key: Hashable, version: int, value: Any) -> None:
+    with _cache_lock:
+        cache.put(key, (version, time.monotonic() + dify_config.PLUGIN_MODEL_CACHE_TTL, value))
+
+
+def _credentials_fingerprint(credentials: dict) -> str:
+    return hashlib.sha256(json.dumps(credentials, sort_keys=True, default=str).encode()).hexdigest()
+
 
 class PluginModelManager(BasePluginManager):
     def fetch_model_providers(self, tenant_id: str) -> Sequence[PluginModelProviderEntity]:
         """
         Fetch model providers for the given tenant.
         """
+        if not dify_config.PLUGIN_MODEL_CACHE_TTL:
+            return self._fetch_model_providers(tenant_id)
+
+        version = PluginModelProvidersCache(tenant_id).get_version()
+        providers = _get_cached(_model_providers_cache, tenant_id, version)
+        if providers is None:
+            providers = self._fetch_model_providers(tenant_id)
+            _put_cached(_model_providers_cache, tenant_id, version, providers)
+        return providers
+
+    def _fetch_model_providers(self, tenant_id: str) -> Sequence[PluginModelProviderEntity]:
         response = self._request_with_plugin_daemon_response(
             "GET",
             f"plugin/{tenant_id}/management/models",
@@ -45,8 +86,33 @@ class PluginModelManager(BasePluginManager):
         credentials: dict,
     ) -> AIModelEntity | None:
         """
-        Get model schema
+        Get model schema, schemas depend on the credentials of customizable models
         """
+        if not dify_config.PLUGIN_MODEL_CACHE_TTL:
+            return self._get_model_schema(tenant_id, user_id, plugin_id, provider, model_type, model, credentials)
+
+        version = PluginModelProvidersCache(tenant_id).get_version()
+        key = (tenant_id, plugin_id, provider, model_type, model, _credentials_fingerprint(credentials))
+        model_schema = _get_cached(_model_schema_cache, key, version)
+        if model_schema is None:
+            model_schema = self._get_model_schema(
+                tenant_id, user_id, plugin_id, provider, model_type, model, credentials
+            )
+            # unknown models are not cached, they may be added with new credentials at any time
+            if model_schema is not None:
+                _put_cached(_model_schema_cache, key, version, model_schema)
+        return model_schema
+
+    def _get_model_schema(
+        self,
+        tenant_id: str,
+        user_id: str,
+        plugin_id: str,
+        provider: str,
+        model_type: str,
+        model: str,
+        credentials: dict,
+    ) -> AIModelEntity | None:
         response = self._request_with_plugin_daemon_response_stream(
             "POST",
             f"plugin/{tenant_id}/dispatch/model/schema",
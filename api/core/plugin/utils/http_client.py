@@ -0,0 +1,131 @@
+"""
+Process-wide pooled HTTP client for the plugin daemon inner API
+"""
+
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any
+
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from configs import dify_config
+
+
+class PluginDaemonPoolMetrics(BaseModel):
+    in_use_connections: int
+    idle_connections: int
+    wait_count: int
+    wait_time_total: float
+    wait_time_max: float
+
+
+class _PoolStats:
+    """
+    Counters shared by every connection pool of the plugin daemon client.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def on_get(self, wait_time: float) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.wait_count += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def on_put(self) -> None:
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+
+_pool_stats = _PoolStats()
+
+
+class _InstrumentedPoolMixin:
+    def _get_conn(self, timeout: float | None = None) -> Any:
+        start = time.perf_counter()
+        conn = super()._get_conn(timeout)  # type: ignore[misc]
+        _pool_stats.on_get(time.perf_counter() - start)
+        return conn
+
+    def _put_conn(self, conn: Any) -> None:
+        _pool_stats.on_put()
+        super()._put_conn(conn)  # type: ignore[misc]
+
+
+class _InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _PluginDaemonAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _InstrumentedHTTPConnectionPool,
+            "https": _InstrumentedHTTPSConnectionPool,
+        }
+
+    def idle_connections(self) -> int:
+        pools = self.poolmanager.pools
+        idle = 0
+        # RecentlyUsedContainer does not support iteration, keys() returns a snapshot
+        for key in pools.keys():  # noqa: SIM118
+            pool = pools.get(key)
+            if pool is not None and pool.pool is not None:
+                # the queue is pre-filled with None placeholders, only real connections are idle
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return idle
+
+
+_adapter: _PluginDaemonAdapter | None = None
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_plugin_daemon_session() -> requests.Session:
+    """
+    Get the keep-alive session shared by all plugin managers, requests.Session is safe to share across threads
+    as long as its configuration is not mutated after creation.
+    """
+    global _adapter, _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = _PluginDaemonAdapter(
+                    pool_connections=1,
+                    pool_maxsize=dify_config.PLUGIN_DAEMON_POOL_MAX_SIZE,
+                )
+                session = requests.Session()
+                # shared between tenants, cookies set by one response must never leak into another request
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _adapter = adapter
+                _session = session
+    return _session
+
+
+def get_plugin_daemon_pool_metrics() -> PluginDaemonPoolMetrics:
+    """
+    Snapshot of the plugin daemon connection pool usage.
+    """
+    return PluginDaemonPoolMetrics(
+        in_use_connections=_pool_stats.in_use,
+        idle_connections=_adapter.idle_connections() if _adapter else 0,
+        wait_count=_pool_stats.wait_count,
+        wait_time_total=_pool_stats.wait_time_total,
+        wait_time_max=_pool_stats.wait_time_max,
+    )
@@ -1,4 +1,6 @@
 import json
+import threading
+import time
 from collections import defaultdict
 from json import JSONDecodeError
 from typing import Any, Optional, cast
@@ -20,7 +22,12 @@ from core.entities.provider_entities import (
     SystemConfiguration,
 )
 from core.helper import encrypter
-from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.lru_cache import LRUCache
+from core.helper.model_provider_cache import (
+    ProviderConfigurationsCache,
+    ProviderCredentialsCache,
+    ProviderCredentialsCacheType,
+)
 from core.helper.position_helper import is_filtered
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
@@ -45,6 +52,10 @@ from models.provider import (
 )
 from services.feature_service import FeatureService
 
+# built provider configurations per workspace: (version, expires at, configurations)
+_configurations_cache = LRUCache(dify_config.PROVIDER_CONFIGURATIONS_CACHE_CAPACITY)
+_configurations_cache_lock = threading.Lock()
+
 
 class ProviderManager:
     """
@@ -89,9 +100,31 @@ class ProviderManager:
         - Get provider instance
         - Switch selection priority
 
+        The configurations of a workspace are built once and shared by the requests of this process until
+        PROVIDER_CONFIGURATIONS_CACHE_TTL passes or one of its provider records changes, they must not be modified.
+
         :param tenant_id:
         :return:
         """
+        if not dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL:
+            return self._get_configurations(tenant_id)
+
+        # read before building, configurations changed while they are built are stored with an outdated version
+        version = ProviderConfigurationsCache(tenant_id).get_version()
+        with _configurations_cache_lock:
+            cached = _configurations_cache.get(tenant_id)
+        if cached and cached[0] == version and cached[1] > time.monotonic():
+            return cast(ProviderConfigurations, cached[2])
+
+        provider_configurations = self._get_configurations(tenant_id)
+        with _configurations_cache_lock:
+            _configurations_cache.put(
+                tenant_id,
+                (version, time.monotonic() + dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL, provider_configurations),
+            )
+        return provider_configurations
+
+    def _get_configurations(self, tenant_id: str) -> ProviderConfigurations:
         # Get all provider records of the workspace
         provider_name_to_provider_records_dict = self._get_all_providers(tenant_id)
 
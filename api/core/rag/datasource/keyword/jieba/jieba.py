@@ -1,103 +1,128 @@
-import json
-from collections import defaultdict
-from typing import Any, Optional
+from collections import Counter
+from typing import Any
 
 from pydantic import BaseModel
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
 
-from configs import dify_config
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
 from core.rag.models.document import Document
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
-from models.dataset import Dataset, DatasetKeywordTable, DocumentSegment
+from models.dataset import (
+    Dataset,
+    DatasetKeywordPosting,
+    DatasetKeywordStatistics,
+    DatasetKeywordTable,
+    DocumentSegment,
+)
+
+# keyword column length of the posting table
+KEYWORD_MAX_LENGTH = 255
+POSTING_INSERT_BATCH_SIZE = 1000
 
 
 class KeywordTableConfig(BaseModel):
     max_keywords_per_chunk: int = 10
 
 
+class KeywordCorpusStatistics(BaseModel):
+    segment_count: int = 0
+    keyword_count: int = 0
+    document_frequencies: dict[str, int] = {}
+
+
 class Jieba(BaseKeyword):
+    """
+    Keyword index of a dataset, stored as one posting row per (keyword, index node id) pair.
+
+    Datasets indexed before the posting table kept the whole keyword table as one JSON document, those are moved
+    to posting rows by the `migrate-keyword-tables` command or by the first write to their index. Reads never
+    migrate, they only see the posting rows.
+    """
+
     def __init__(self, dataset: Dataset):
         super().__init__(dataset)
         self._config = KeywordTableConfig()
 
     def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-            keyword_table = self._get_dataset_keyword_table()
-            for text in texts:
-                keywords = keyword_table_handler.extract_keywords(
-                    text.page_content, self._config.max_keywords_per_chunk
-                )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+        self.migrate_legacy_keyword_table()
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keyword_table: dict[str, set[str]] = {}
+        for text in texts:
+            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata["doc_id"], list(keywords))
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._save_keyword_postings(keyword_table)
 
-            return self
+        return self
 
     def add_texts(self, texts: list[Document], **kwargs):
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-
-            keyword_table = self._get_dataset_keyword_table()
-            keywords_list = kwargs.get("keywords_list")
-            for i in range(len(texts)):
-                text = texts[i]
-                if keywords_list:
-                    keywords = keywords_list[i]
-                    if not keywords:
-                        keywords = keyword_table_handler.extract_keywords(
-                            text.page_content, self._config.max_keywords_per_chunk
-                        )
-                else:
+        self.migrate_legacy_keyword_table()
+        keyword_table_handler = JiebaKeywordTableHandler()
+
+        keyword_table: dict[str, set[str]] = {}
+        keywords_list = kwargs.get("keywords_list")
+        for i in range(len(texts)):
+            text = texts[i]
+            if keywords_list:
+                keywords = keywords_list[i]
+                if not keywords:
                     keywords = keyword_table_handler.extract_keywords(
                         text.page_content, self._config.max_keywords_per_chunk
                     )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+            else:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata["doc_id"], list(keywords))
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._save_keyword_postings(keyword_table)
 
     def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        if keyword_table is None:
-            return False
-        return id in set.union(*keyword_table.values())
+        posting = (
+            db.session.query(DatasetKeywordPosting.id)
+            .filter(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id == id)
+            .first()
+        )
+        return posting is not None
 
     def delete_by_ids(self, ids: list[str]) -> None:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table = self._get_dataset_keyword_table()
-            if keyword_table is not None:
-                keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-            self._save_dataset_keyword_table(keyword_table)
+        self.migrate_legacy_keyword_table()
+        if not ids:
+            return
+        stmt = (
+            delete(DatasetKeywordPosting)
+            .where(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id.in_(ids))
+            .returning(DatasetKeywordPosting.index_node_id)
+        )
+        deleted_node_ids = db.session.execute(stmt).scalars().all()
+        if deleted_node_ids:
+            # every posting of the index nodes is gone, so each of them leaves the corpus
+            self._update_keyword_statistics(-len(set(deleted_node_ids)), -len(deleted_node_ids))
+        db.session.commit()
 
     def search(self, query: str, **kwargs: Any) -> list[Document]:
-        keyword_table = self._get_dataset_keyword_table()
-
         k = kwargs.get("top_k", 4)
 
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table or {}, query, k)
+        sorted_chunk_indices = self._retrieve_ids_by_query(query, k)
+
+        segments: dict[str, DocumentSegment] = {}
+        if sorted_chunk_indices:
+            for segment in db.session.query(DocumentSegment).filter(
+                DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id.in_(sorted_chunk_indices)
+            ):
+                segments.setdefault(segment.index_node_id, segment)
 
         documents = []
         for chunk_index in sorted_chunk_indices:
-            segment = (
-                db.session.query(DocumentSegment)
-                .filter(DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id == chunk_index)
-                .first()
-            )
+            segment = segments.get(chunk_index)
 
             if segment:
                 documents.append(
@@ -117,55 +142,135 @@ class Jieba(BaseKeyword):
     def delete(self) -> None:
         lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
         with redis_client.lock(lock_name, timeout=600):
+            db.session.query(DatasetKeywordPosting).filter(DatasetKeywordPosting.dataset_id == self.dataset.id).delete(
+                synchronize_session=False
+            )
+            db.session.query(DatasetKeywordStatistics).filter(
+                DatasetKeywordStatistics.dataset_id == self.dataset.id
+            ).delete(synchronize_session=False)
             dataset_keyword_table = self.dataset.dataset_keyword_table
             if dataset_keyword_table:
-                db.session.delete(dataset_keyword_table)
-                db.session.commit()
-                if dataset_keyword_table.data_source_type != "database":
-                    file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
-                    storage.delete(file_key)
-
-    def _save_dataset_keyword_table(self, keyword_table):
-        keyword_table_dict = {
-            "__type__": "keyword_table",
-            "__data__": {"index_id": self.dataset.id, "summary": None, "table": keyword_table},
-        }
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        keyword_data_source_type = dataset_keyword_table.data_source_type
-        if keyword_data_source_type == "database":
-            dataset_keyword_table.keyword_table = json.dumps(keyword_table_dict, cls=SetEncoder)
+                self._delete_legacy_keyword_table(dataset_keyword_table)
             db.session.commit()
-        else:
-            file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
-            if storage.exists(file_key):
-                storage.delete(file_key)
-            storage.save(file_key, json.dumps(keyword_table_dict, cls=SetEncoder).encode("utf-8"))
 
-    def _get_dataset_keyword_table(self) -> Optional[dict]:
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            keyword_table_dict = dataset_keyword_table.keyword_table_dict
-            if keyword_table_dict:
-                return dict(keyword_table_dict["__data__"]["table"])
-        else:
-            keyword_data_source_type = dify_config.KEYWORD_DATA_SOURCE_TYPE
-            dataset_keyword_table = DatasetKeywordTable(
-                dataset_id=self.dataset.id,
-                keyword_table="",
-                data_source_type=keyword_data_source_type,
+    def _save_keyword_postings(self, keyword_table: dict[str, set[str]]) -> None:
+        """
+        Insert the (keyword, index node id) pairs of the keyword table, existing pairs are left untouched.
+        """
+        postings = [
+            {"dataset_id": self.dataset.id, "keyword": keyword, "index_node_id": node_id}
+            for keyword, node_ids in keyword_table.items()
+            # longer keywords do not fit the posting table and are not worth matching on
+            if len(keyword) <= KEYWORD_MAX_LENGTH
+            for node_id in node_ids
+        ]
+        inserted_node_ids: list[str] = []
+        for i in range(0, len(postings), POSTING_INSERT_BATCH_SIZE):
+            stmt = (
+                insert(DatasetKeywordPosting)
+                .values(postings[i : i + POSTING_INSERT_BATCH_SIZE])
+                .on_conflict_do_nothing(index_elements=["dataset_id", "keyword", "index_node_id"])
+                .returning(DatasetKeywordPosting.index_node_id)
             )
-            if keyword_data_source_type == "database":
-                dataset_keyword_table.keyword_table = json.dumps(
-                    {
-                        "__type__": "keyword_table",
-                        "__data__": {"index_id": self.dataset.id, "summary": None, "table": {}},
-                    },
-                    cls=SetEncoder,
+            inserted_node_ids.extend(db.session.execute(stmt).scalars().all())
+        if inserted_node_ids:
+            # index nodes whose postings were all inserted just now are new to the corpus
+            inserted_counts = Counter(inserted_node_ids)
+            posting_counts = (
+                db.session.query(DatasetKeywordPosting.index_node_id, func.count(DatasetKeywordPosting.id))
+                .filter(
+                    DatasetKeywordPosting.dataset_id == self.dataset.id,
+                    DatasetKeywordPosting.index_node_id.in_(list(inserted_counts)),
                 )
-            db.session.add(dataset_keyword_table)
+                .group_by(DatasetKeywordPosting.index_node_id)
+                .all()
+            )
+            new_segment_count = sum(1 for node_id, count in posting_counts if count == inserted_counts[node_id])
+            self._update_keyword_statistics(new_segment_count, len(inserted_node_ids))
+        db.session.commit()
+
+    def _update_keyword_statistics(self, segment_delta: int, keyword_delta: int) -> None:
+        """
+        Apply the postings inserted or deleted by a write to the corpus statistics of the dataset, used for BM25
+        scoring. The counts are incremented in place so that concurrent writers do not overwrite each other.
+        """
+        stmt = insert(DatasetKeywordStatistics).values(
+            dataset_id=self.dataset.id, segment_count=max(segment_delta, 0), keyword_count=max(keyword_delta, 0)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["dataset_id"],
+            set_={
+                "segment_count": func.greatest(DatasetKeywordStatistics.segment_count + segment_delta, 0),
+                "keyword_count": func.greatest(DatasetKeywordStatistics.keyword_count + keyword_delta, 0),
+                "updated_at": func.current_timestamp(),
+            },
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def get_corpus_statistics(cls, dataset_ids: list[str], keywords: list[str]) -> KeywordCorpusStatistics:
+        """
+        Get the keyword corpus statistics of the given datasets, restricted to the given keywords.
+        """
+        statistics = KeywordCorpusStatistics()
+        if not dataset_ids:
+            return statistics
+        segment_count, keyword_count = (
+            db.session.query(
+                func.coalesce(func.sum(DatasetKeywordStatistics.segment_count), 0),
+                func.coalesce(func.sum(DatasetKeywordStatistics.keyword_count), 0),
+            )
+            .filter(DatasetKeywordStatistics.dataset_id.in_(dataset_ids))
+            .one()
+        )
+        statistics.segment_count = int(segment_count)
+        statistics.keyword_count = int(keyword_count)
+        if keywords and statistics.segment_count:
+            rows = (
+                db.session.query(DatasetKeywordPosting.keyword, func.count(DatasetKeywordPosting.id))
+                .filter(DatasetKeywordPosting.dataset_id.in_(dataset_ids), DatasetKeywordPosting.keyword.in_(keywords))
+                .group_by(DatasetKeywordPosting.keyword)
+                .all()
+            )
+            statistics.document_frequencies = dict(rows)
+        return statistics
+
+    def migrate_legacy_keyword_table(self) -> None:
+        """
+        Move a keyword table stored as one JSON document into posting rows.
+
+        The legacy table is only dropped once it was loaded, a keyword file that exists but cannot be read is
+        kept for the next attempt.
+        """
+        if not self.dataset.dataset_keyword_table:
+            return
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            dataset_keyword_table = self.dataset.dataset_keyword_table
+            if not dataset_keyword_table:
+                return
+            keyword_table_dict = dataset_keyword_table.keyword_table_dict
+            if (
+                keyword_table_dict is None
+                and dataset_keyword_table.data_source_type != "database"
+                and storage.exists(self._legacy_keyword_file_key())
+            ):
+                # keyword_table_dict logs and swallows storage errors
+                raise ValueError(f"Failed to load the legacy keyword table of dataset {self.dataset.id}")
+            if keyword_table_dict:
+                self._save_keyword_postings(dict(keyword_table_dict["__data__"]["table"]))
+            self._delete_legacy_keyword_table(dataset_keyword_table)
             db.session.commit()
 
-        return {}
+    def _delete_legacy_keyword_table(self, dataset_keyword_table: DatasetKeywordTable) -> None:
+        db.session.delete(dataset_keyword_table)
+        if dataset_keyword_table.data_source_type != "database":
+            file_key = self._legacy_keyword_file_key()
+            if storage.exists(file_key):
+                storage.delete(file_key)
+
+    def _legacy_keyword_file_key(self) -> str:
+        return "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
 
     def _add_text_to_keyword_table(self, keyword_table: dict, id: str, keywords: list[str]) -> dict:
         for keyword in keywords:
@@ -174,41 +279,26 @@ class Jieba(BaseKeyword):
             keyword_table[keyword].add(id)
         return keyword_table
 
-    def _delete_ids_from_keyword_table(self, keyword_table: dict, ids: list[str]) -> dict:
-        # get set of ids that correspond to node
-        node_idxs_to_delete = set(ids)
-
-        # delete node_idxs from keyword to node idxs mapping
-        keywords_to_delete = set()
-        for keyword, node_idxs in keyword_table.items():
-            if node_idxs_to_delete.intersection(node_idxs):
-                keyword_table[keyword] = node_idxs.difference(node_idxs_to_delete)
-                if not keyword_table[keyword]:
-                    keywords_to_delete.add(keyword)
-
-        for keyword in keywords_to_delete:
-            del keyword_table[keyword]
-
-        return keyword_table
-
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
+    def _retrieve_ids_by_query(self, query: str, k: int = 4):
         keyword_table_handler = JiebaKeywordTableHandler()
         keywords = keyword_table_handler.extract_keywords(query)
+        if not keywords:
+            return []
 
         # go through text chunks in order of most matching keywords
-        chunk_indices_count: dict[str, int] = defaultdict(int)
-        keywords_list = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
-        for keyword in keywords_list:
-            for node_id in keyword_table[keyword]:
-                chunk_indices_count[node_id] += 1
-
-        sorted_chunk_indices = sorted(
-            chunk_indices_count.keys(),
-            key=lambda x: chunk_indices_count[x],
-            reverse=True,
+        match_count = func.count(DatasetKeywordPosting.keyword)
+        rows = (
+            db.session.query(DatasetKeywordPosting.index_node_id)
+            .filter(
+                DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.keyword.in_(list(keywords))
+            )
+            .group_by(DatasetKeywordPosting.index_node_id)
+            .order_by(match_count.desc(), DatasetKeywordPosting.index_node_id)
+            .limit(k)
+            .all()
         )
 
-        return sorted_chunk_indices[:k]
+        return [row.index_node_id for row in rows]
 
     def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: list[str]):
         document_segment = (
@@ -222,37 +312,27 @@ class Jieba(BaseKeyword):
             db.session.commit()
 
     def create_segment_keywords(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
+        self.migrate_legacy_keyword_table()
         self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._save_keyword_postings(self._add_text_to_keyword_table({}, node_id, keywords))
 
     def multi_create_segment_keywords(self, pre_segment_data_list: list):
+        self.migrate_legacy_keyword_table()
         keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = self._get_dataset_keyword_table()
+        keyword_table: dict[str, set[str]] = {}
         for pre_segment_data in pre_segment_data_list:
             segment = pre_segment_data["segment"]
             if pre_segment_data["keywords"]:
                 segment.keywords = pre_segment_data["keywords"]
                 keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, pre_segment_data["keywords"]
+                    keyword_table, segment.index_node_id, pre_segment_data["keywords"]
                 )
             else:
                 keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
                 segment.keywords = list(keywords)
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, list(keywords)
-                )
-        self._save_dataset_keyword_table(keyword_table)
+                keyword_table = self._add_text_to_keyword_table(keyword_table, segment.index_node_id, list(keywords))
+        self._save_keyword_postings(keyword_table)
 
     def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
-
-
-class SetEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        return super().default(obj)
+        self.migrate_legacy_keyword_table()
+        self._save_keyword_postings(self._add_text_to_keyword_table({}, node_id, keywords))
@@ -266,6 +266,11 @@ class RetrievalService:
                 .all()
             }
 
+            # Batch query child chunks and segments, keyed the way the documents reference them
+            child_chunks, segments_by_id, segments_by_index_node_id = cls._get_retrieval_segments(
+                documents, dataset_documents
+            )
+
             records = []
             include_segment_ids = set()
             segment_child_map = {}
@@ -282,32 +287,14 @@ class RetrievalService:
                     # Handle parent-child documents
                     child_index_node_id = document.metadata.get("doc_id")
 
-                    child_chunk = (
-                        db.session.query(ChildChunk).filter(ChildChunk.index_node_id == child_index_node_id).first()
-                    )
+                    child_chunk = child_chunks.get(child_index_node_id)
 
                     if not child_chunk:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.id == child_chunk.segment_id,
-                        )
-                        .options(
-                            load_only(
-                                DocumentSegment.id,
-                                DocumentSegment.content,
-                                DocumentSegment.answer,
-                            )
-                        )
-                        .first()
-                    )
+                    segment = segments_by_id.get(child_chunk.segment_id)
 
-                    if not segment:
+                    if not segment or segment.dataset_id != dataset_document.dataset_id:
                         continue
 
                     if segment.id not in include_segment_ids:
@@ -344,16 +331,7 @@ class RetrievalService:
                     if not index_node_id:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.index_node_id == index_node_id,
-                        )
-                        .first()
-                    )
+                    segment = segments_by_index_node_id.get((dataset_document.dataset_id, index_node_id))
 
                     if not segment:
                         continue
@@ -375,3 +353,63 @@ class RetrievalService:
         except Exception as e:
             db.session.rollback()
             raise e
+
+    @classmethod
+    def _get_retrieval_segments(
+        cls, documents: list[Document], dataset_documents: dict[str, DatasetDocument]
+    ) -> tuple[dict[str, ChildChunk], dict[str, DocumentSegment], dict[tuple[str, str], DocumentSegment]]:
+        """
+        Load the child chunks and segments referenced by retrieved documents with one query each.
+
+        :return: child chunks by index node id, parent segments by id,
+            segments by (dataset id, index node id)
+        """
+        child_index_node_ids = set()
+        index_node_ids = set()
+        for document in documents:
+            dataset_document = dataset_documents.get(document.metadata.get("document_id"))  # type: ignore
+            index_node_id = document.metadata.get("doc_id")
+            if not dataset_document or not index_node_id:
+                continue
+            if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                child_index_node_ids.add(index_node_id)
+            else:
+                index_node_ids.add(index_node_id)
+
+        child_chunks: dict[str, ChildChunk] = {}
+        segments_by_id: dict[str, DocumentSegment] = {}
+        if child_index_node_ids:
+            for child_chunk in db.session.query(ChildChunk).filter(ChildChunk.index_node_id.in_(child_index_node_ids)):
+                child_chunks.setdefault(child_chunk.index_node_id, child_chunk)
+            segment_ids = {child_chunk.segment_id for child_chunk in child_chunks.values()}
+            if segment_ids:
+                segments_by_id = {
+                    segment.id: segment
+                    for segment in db.session.query(DocumentSegment)
+                    .filter(
+                        DocumentSegment.enabled == True,
+                        DocumentSegment.status == "completed",
+                        DocumentSegment.id.in_(segment_ids),
+                    )
+                    .options(
+                        load_only(
+                            DocumentSegment.id,
+                            DocumentSegment.dataset_id,
+                            DocumentSegment.content,
+                            DocumentSegment.answer,
+                        )
+                    )
+                }
+
+        segments_by_index_node_id: dict[tuple[str, str], DocumentSegment] = {}
+        if index_node_ids:
+            dataset_ids = {dataset_document.dataset_id for dataset_document in dataset_documents.values()}
+            for segment in db.session.query(DocumentSegment).filter(
+                DocumentSegment.dataset_id.in_(dataset_ids),
+                DocumentSegment.enabled == True,
+                DocumentSegment.status == "completed",
+                DocumentSegment.index_node_id.in_(index_node_ids),
+            ):
+                segments_by_index_node_id.setdefault((segment.dataset_id, segment.index_node_id), segment)
+
+        return child_chunks, segments_by_id, segments_by_index_node_id
@@ -10,6 +10,7 @@ from pymilvus.milvus_client import IndexParams  # type: ignore
 from configs import dify_config
 from core.rag.datasource.vdb.field import Field
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -186,6 +187,21 @@ class MilvusVector(BaseVector):
 
         return len(result) > 0
 
+    def texts_exist(self, ids: list[str]) -> list[str]:
+        """
+        Get the IDs of the given texts that exist in the collection.
+        """
+        if not ids or not self._client.has_collection(self._collection_name):
+            return []
+
+        result = self._client.query(
+            collection_name=self._collection_name,
+            filter=f'metadata["doc_id"] in {json.dumps(ids)}',
+            output_fields=[Field.METADATA_KEY.value],
+        )
+
+        return [item[Field.METADATA_KEY.value]["doc_id"] for item in result]
+
     def field_exists(self, field: str) -> bool:
         """
         Check if a field exists in the collection.
@@ -332,10 +348,14 @@ class MilvusVector(BaseVector):
 
     def _init_client(self, config) -> MilvusClient:
         """
-        Initialize and return a Milvus client.
+        Initialize and return a Milvus client, shared by every MilvusVector with the same config.
         """
-        client = MilvusClient(uri=config.uri, user=config.user, password=config.password, db_name=config.database)
-        return client
+        return vector_client_registry.get_client(
+            self,
+            (VectorType.MILVUS, config.model_dump_json()),
+            lambda: MilvusClient(uri=config.uri, user=config.user, password=config.password, db_name=config.database),
+            close=lambda client: client.close(),
+        )
 
 
 class MilvusVectorFactory(AbstractVectorFactory):
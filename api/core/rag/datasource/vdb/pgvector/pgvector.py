@@ -1,4 +1,5 @@
 import json
+import threading
 import uuid
 from contextlib import contextmanager
 from typing import Any
@@ -9,6 +10,7 @@ from pydantic import BaseModel, model_validator
 
 from configs import dify_config
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -63,17 +65,62 @@ USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 """
 
 
+# seconds to wait for a connection once every connection of the pool is in use
+POOL_TIMEOUT = 30
+
+
+class BlockingConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    Thread-safe pool shared by all PGVector instances, waiting for a free connection instead of failing
+    when all of them are in use.
+    `PGVECTOR_MAX_CONNECTION` therefore caps the connections of the whole process, not of each instance,
+    its usage is reported by the `/vector-client-stat` endpoint.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._available = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self._available.acquire(timeout=POOL_TIMEOUT):
+            raise psycopg2.pool.PoolError("connection pool exhausted")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._available.release()
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "connections": len(self._pool) + len(self._used),
+            "in_use": len(self._used),
+            "max_connections": self.maxconn,
+        }
+
+
 class PGVector(BaseVector):
     def __init__(self, collection_name: str, config: PGVectorConfig):
         super().__init__(collection_name)
-        self.pool = self._create_connection_pool(config)
+        self.pool = vector_client_registry.get_client(
+            self,
+            (VectorType.PGVECTOR, config.model_dump_json()),
+            lambda: self._create_connection_pool(config),
+            close=lambda pool: pool.closeall(),
+            stats=lambda pool: pool.get_stats(),
+        )
         self.table_name = f"embedding_{collection_name}"
 
     def get_type(self) -> str:
         return VectorType.PGVECTOR
 
     def _create_connection_pool(self, config: PGVectorConfig):
-        return psycopg2.pool.SimpleConnectionPool(
+        return BlockingConnectionPool(
             config.min_connection,
             config.max_connection,
             host=config.host,
@@ -86,13 +133,32 @@ class PGVector(BaseVector):
     @contextmanager
     def _get_cursor(self):
         conn = self.pool.getconn()
-        cur = conn.cursor()
+        if conn.closed:
+            # closed by the server while idle in the pool
+            self.pool.putconn(conn, close=True)
+            conn = self.pool.getconn()
+        # the pool is shared by the process, the connection must go back to it whatever happens
+        close = False
         try:
-            yield cur
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            try:
+                conn.commit()
+            except Exception:
+                close = True
+                raise
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                # e.g. dropped by the server during the query
+                close = True
+            raise
         finally:
-            cur.close()
-            conn.commit()
-            self.pool.putconn(conn)
+            self.pool.putconn(conn, close=close or bool(conn.closed))
 
     def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
         dimension = len(embeddings[0])
@@ -125,6 +191,13 @@ class PGVector(BaseVector):
             cur.execute(f"SELECT id FROM {self.table_name} WHERE id = %s", (id,))
             return cur.fetchone() is not None
 
+    def texts_exist(self, ids: list[str]) -> list[str]:
+        if not ids:
+            return []
+        with self._get_cursor() as cur:
+            cur.execute(f"SELECT id FROM {self.table_name} WHERE id IN %s", (tuple(ids),))
+            return [str(record[0]) for record in cur]
+
     def get_by_ids(self, ids: list[str]) -> list[Document]:
         with self._get_cursor() as cur:
             cur.execute(f"SELECT meta, text FROM {self.table_name} WHERE id IN %s", (tuple(ids),))
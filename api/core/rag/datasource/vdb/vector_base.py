@@ -5,6 +5,9 @@ from typing import Any
 
 from core.rag.models.document import Document
 
+# ids checked for existence per store query when filtering duplicates
+DUPLICATE_CHECK_BATCH_SIZE = 1000
+
 
 class BaseVector(ABC):
     def __init__(self, collection_name: str):
@@ -26,6 +29,13 @@ class BaseVector(ABC):
     def text_exists(self, id: str) -> bool:
         raise NotImplementedError
 
+    def texts_exist(self, ids: list[str]) -> list[str]:
+        """
+        Get the ids of the given texts that already exist in the store.
+        Stores that can look up many ids in one query should override this.
+        """
+        return [id for id in ids if self.text_exists(id)]
+
     @abstractmethod
     def delete_by_ids(self, ids: list[str]) -> None:
         raise NotImplementedError
@@ -50,14 +60,12 @@ class BaseVector(ABC):
         raise NotImplementedError
 
     def _filter_duplicate_texts(self, texts: list[Document]) -> list[Document]:
-        for text in texts.copy():
-            if text.metadata and "doc_id" in text.metadata:
-                doc_id = text.metadata["doc_id"]
-                exists_duplicate_node = self.text_exists(doc_id)
-                if exists_duplicate_node:
-                    texts.remove(text)
-
-        return texts
+        doc_ids = list(dict.fromkeys(filter(None, ((text.metadata or {}).get("doc_id") for text in texts))))
+        existing_ids: set[str] = set()
+        for i in range(0, len(doc_ids), DUPLICATE_CHECK_BATCH_SIZE):
+            existing_ids.update(self.texts_exist(doc_ids[i : i + DUPLICATE_CHECK_BATCH_SIZE]))
+
+        return [text for text in texts if (text.metadata or {}).get("doc_id") not in existing_ids]
 
     def _get_uuids(self, texts: list[Document]) -> list[str]:
         return [text.metadata["doc_id"] for text in texts if text.metadata and "doc_id" in text.metadata]
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+import weakref
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any, Optional, TypeVar
+
+from pydantic import BaseModel
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class VectorClientStats(BaseModel):
+    store: str
+    leases: int
+    idle_seconds: float
+    created_at: float
+    pool: dict[str, int] = {}
+
+
+@dataclass
+class _Entry:
+    client: Any
+    close: Optional[Callable[[Any], None]]
+    stats: Optional[Callable[[Any], dict[str, int]]]
+    created_at: float = field(default_factory=time.time)
+    released_at: float = field(default_factory=time.monotonic)
+    leases: int = 0
+
+
+class VectorClientRegistry:
+    """
+    Vector store clients shared by every `Vector` of the process with the same store config.
+
+    A client is leased to the vector object that asked for it until that object is garbage collected, clients
+    without leases are closed once they have been idle for `VECTOR_STORE_CLIENT_IDLE_TIMEOUT` seconds.
+    Only clients that are safe to use from several threads at once belong here.
+    """
+
+    def __init__(self, idle_timeout: float) -> None:
+        self._idle_timeout = idle_timeout
+        self._entries: dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def get_client(
+        self,
+        owner: object,
+        key: Hashable,
+        create: Callable[[], T],
+        close: Optional[Callable[[T], None]] = None,
+        stats: Optional[Callable[[T], dict[str, int]]] = None,
+    ) -> T:
+        """
+        Get the client for a store config, creating it on first use.
+        :param owner: object using the client, the lease ends when it is garbage collected
+        :param key: store type and every setting the client is created from
+        :param create: create a new client
+        :param close: release the resources of a client that is no longer used
+        :param stats: pool stats of a client, e.g. connections in use
+        """
+        self.close_idle()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(client=create(), close=close, stats=stats)
+                self._entries[key] = entry
+            entry.leases += 1
+        weakref.finalize(owner, self._release, key, entry)
+        return entry.client
+
+    def close_idle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if entry.leases == 0 and now - entry.released_at >= self._idle_timeout
+            ]
+            for key, _ in idle:
+                del self._entries[key]
+        for key, entry in idle:
+            self._close(key, entry)
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+        for key, entry in entries:
+            self._close(key, entry)
+
+    def get_stats(self) -> list[VectorClientStats]:
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            VectorClientStats(
+                store=str(key[0]) if isinstance(key, tuple) else str(key),
+                leases=entry.leases,
+                idle_seconds=0.0 if entry.leases else now - entry.released_at,
+                created_at=entry.created_at,
+                pool=entry.stats(entry.client) if entry.stats else {},
+            )
+            for key, entry in entries
+        ]
+
+    def _release(self, key: Hashable, entry: _Entry) -> None:
+        with self._lock:
+            entry.leases -= 1
+            if entry.leases == 0:
+                entry.released_at = time.monotonic()
+
+    @staticmethod
+    def _close(key: Hashable, entry: _Entry) -> None:
+        if entry.close is None:
+            return
+        try:
+            entry.close(entry.client)
+        except Exception:
+            logger.exception("Failed to close idle vector store client")
+
+
+vector_client_registry = VectorClientRegistry(idle_timeout=dify_config.VECTOR_STORE_CLIENT_IDLE_TIMEOUT)
+
+
+def get_vector_client_stats() -> list[VectorClientStats]:
+    """
+    Stats of the vector store clients of this process.
+    """
+    return vector_client_registry.get_stats()
@@ -156,6 +156,17 @@ class Vector:
             embeddings = self._embeddings.embed_documents([document.page_content for document in texts])
             self._vector_processor.create(texts=texts, embeddings=embeddings, **kwargs)
 
+    def embed_documents(self, documents: list[Document]) -> tuple[list[list[float]], int]:
+        """
+        Embed documents without writing them, see `create_with_embeddings`.
+        :return: embeddings and the tokens used by the embedding model
+        """
+        return self._embeddings.embed_documents_with_usage([document.page_content for document in documents])
+
+    def create_with_embeddings(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
+        if texts:
+            self._vector_processor.create(texts=texts, embeddings=embeddings, **kwargs)
+
     def add_texts(self, documents: list[Document], **kwargs):
         if kwargs.get("duplicate_check", False):
             documents = self._filter_duplicate_texts(documents)
@@ -166,6 +177,9 @@ class Vector:
     def text_exists(self, id: str) -> bool:
         return self._vector_processor.text_exists(id)
 
+    def texts_exist(self, ids: list[str]) -> list[str]:
+        return self._vector_processor.texts_exist(ids)
+
     def delete_by_ids(self, ids: list[str]) -> None:
         self._vector_processor.delete_by_ids(ids)
 
@@ -186,7 +200,7 @@ class Vector:
             collection_exist_cache_key = "vector_indexing_{}".format(self._vector_processor.collection_name)
             redis_client.delete(collection_exist_cache_key)
 
-    def _get_embeddings(self) -> Embeddings:
+    def _get_embeddings(self) -> CacheEmbedding:
         model_manager = ModelManager()
 
         embedding_model = model_manager.get_model_instance(
@@ -198,16 +212,7 @@ class Vector:
         return CacheEmbedding(embedding_model)
 
     def _filter_duplicate_texts(self, texts: list[Document]) -> list[Document]:
-        for text in texts.copy():
-            if text.metadata is None:
-                continue
-            doc_id = text.metadata["doc_id"]
-            if doc_id:
-                exists_duplicate_node = self.text_exists(doc_id)
-                if exists_duplicate_node:
-                    texts.remove(text)
-
-        return texts
+        return self._vector_processor._filter_duplicate_texts(texts)
 
     def __getattr__(self, name):
         if self._vector_processor is not None:
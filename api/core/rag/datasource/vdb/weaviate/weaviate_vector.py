@@ -1,5 +1,6 @@
 import datetime
 import json
+import threading
 from typing import Any, Optional
 
 import requests
@@ -9,6 +10,7 @@ from pydantic import BaseModel, model_validator
 from configs import dify_config
 from core.rag.datasource.vdb.field import Field
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -33,10 +35,16 @@ class WeaviateConfig(BaseModel):
 class WeaviateVector(BaseVector):
     def __init__(self, collection_name: str, config: WeaviateConfig, attributes: list):
         super().__init__(collection_name)
-        self._client = self._init_client(config)
+        # the batch of a client is shared by every WeaviateVector using it, imports through it take turns
+        self._client, self._batch_lock = vector_client_registry.get_client(
+            self,
+            (VectorType.WEAVIATE, config.model_dump_json()),
+            lambda: (self._init_client(config), threading.Lock()),
+        )
         self._attributes = attributes
 
-    def _init_client(self, config: WeaviateConfig) -> weaviate.Client:
+    @staticmethod
+    def _init_client(config: WeaviateConfig) -> weaviate.Client:
         auth_config = weaviate.auth.AuthApiKey(api_key=config.api_key)
 
         weaviate.connect.connection.has_grpc = False
@@ -103,7 +111,7 @@ class WeaviateVector(BaseVector):
 
         ids = []
 
-        with self._client.batch as batch:
+        with self._batch_lock, self._client.batch as batch:
             for i, text in enumerate(texts):
                 data_properties = {Field.TEXT_KEY.value: text}
                 if metadatas is not None:
@@ -164,6 +172,31 @@ class WeaviateVector(BaseVector):
 
         return True
 
+    def texts_exist(self, ids: list[str]) -> list[str]:
+        collection_name = self._collection_name
+        schema = self._default_schema(self._collection_name)
+
+        # check whether the index already exists
+        if not ids or not self._client.schema.contains(schema):
+            return []
+        # ContainsAny needs weaviate 1.21, match the ids one by one in a single query instead
+        result = (
+            self._client.query.get(collection_name, ["doc_id"])
+            .with_where(
+                {
+                    "operator": "Or",
+                    "operands": [{"path": ["doc_id"], "operator": "Equal", "valueText": id} for id in ids],
+                }
+            )
+            .with_limit(len(ids))
+            .do()
+        )
+
+        if "errors" in result:
+            raise ValueError(f"Error during query: {result['errors']}")
+
+        return [entry["doc_id"] for entry in result["data"]["Get"][collection_name]]
+
     def delete_by_ids(self, ids: list[str]) -> None:
         # check whether the index already exists
         schema = self._default_schema(self._collection_name)
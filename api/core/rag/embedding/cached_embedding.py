@@ -1,16 +1,21 @@
 import base64
 import logging
+import threading
 from typing import Any, Optional, cast
 
 import numpy as np
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
+from core.helper.lru_cache import LRUCache
 from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
+from core.rag.embedding.embedding_codec import decode_embedding, encode_embedding, is_encoded_embedding
+from core.rag.embedding.embedding_dispatcher import EmbeddingDispatcher
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from libs import helper
@@ -19,32 +24,41 @@ from models.dataset import Embedding
 logger = logging.getLogger(__name__)
 
 
+# hashes looked up per query and rows written per insert against the embeddings table
+EMBEDDING_CACHE_BATCH_SIZE = 1000
+
+_local_cache = LRUCache(dify_config.EMBEDDING_CACHE_LOCAL_CAPACITY)
+_local_cache_lock = threading.Lock()
+
+
 class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
         self._model_instance = model_instance
         self._user = user
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        """Embed search docs in batches of 10."""
+        """Embed search docs in batches of the model's max chunks, sent concurrently."""
+        return self.embed_documents_with_usage(texts)[0]
+
+    def embed_documents_with_usage(self, texts: list[str]) -> tuple[list[list[float]], int]:
+        """
+        Embed search docs, also returning the tokens the embedding model reported for them.
+        Texts served from the embedding cache don't use any tokens.
+        """
+        tokens = 0
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
+        text_hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._get_cached_embeddings(set(text_hashes))
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        for i, hash in enumerate(text_hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash].tolist()
             else:
                 embedding_queue_indices.append(i)
         if embedding_queue_indices:
             embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
-            embedding_queue_embeddings = []
+            embedding_queue_embeddings: list[Optional[list[float]]] = []
             try:
                 model_type_instance = cast(TextEmbeddingModel, self._model_instance.model_type_instance)
                 model_schema = model_type_instance.get_model_schema(
@@ -55,12 +69,12 @@ class CacheEmbedding(Embeddings):
                     if model_schema and ModelPropertyKey.MAX_CHUNKS in model_schema.model_properties
                     else 1
                 )
-                for i in range(0, len(embedding_queue_texts), max_chunks):
-                    batch_texts = embedding_queue_texts[i : i + max_chunks]
-
-                    embedding_result = self._model_instance.invoke_text_embedding(
-                        texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
-                    )
+                batches = [
+                    embedding_queue_texts[i : i + max_chunks] for i in range(0, len(embedding_queue_texts), max_chunks)
+                ]
+                embedding_results = EmbeddingDispatcher(self._model_instance, self._user).embed(batches)
+                for embedding_result in embedding_results:
+                    tokens += embedding_result.usage.total_tokens
 
                     for vector in embedding_result.embeddings:
                         try:
@@ -70,35 +84,94 @@ class CacheEmbedding(Embeddings):
                             if np.isnan(normalized_embedding).any():
                                 # for issue #11827  float values are not json compliant
                                 logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
+                                embedding_queue_embeddings.append(None)
                                 continue
                             embedding_queue_embeddings.append(normalized_embedding)
-                        except IntegrityError:
-                            db.session.rollback()
                         except Exception:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                            embedding_queue_embeddings.append(None)
+                new_embeddings: dict[str, list[float]] = {}
+                for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
+                    if n_embedding is None:
+                        continue
+                    text_embeddings[i] = n_embedding
+                    new_embeddings.setdefault(text_hashes[i], n_embedding)
+                self._cache_embeddings(new_embeddings)
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
                 raise ex
 
-        return text_embeddings
+        return text_embeddings, tokens
+
+    def _local_cache_key(self, hash: str) -> tuple[str, str, str]:
+        return self._model_instance.provider, self._model_instance.model, hash
+
+    def _get_cached_embeddings(self, hashes: set[str]) -> dict[str, np.ndarray]:
+        """
+        Look up cached embeddings by text hash, in the local cache first and then in the embeddings table.
+        """
+        cached_embeddings: dict[str, np.ndarray] = {}
+        if _local_cache.capacity:
+            with _local_cache_lock:
+                for hash in hashes:
+                    embedding = _local_cache.get(self._local_cache_key(hash))
+                    if embedding is not None:
+                        cached_embeddings[hash] = embedding
+
+        missing_hashes = [hash for hash in hashes if hash not in cached_embeddings]
+        for i in range(0, len(missing_hashes), EMBEDDING_CACHE_BATCH_SIZE):
+            batch_hashes = missing_hashes[i : i + EMBEDDING_CACHE_BATCH_SIZE]
+            embeddings = (
+                db.session.query(Embedding)
+                .filter(
+                    Embedding.model_name == self._model_instance.model,
+                    Embedding.provider_name == self._model_instance.provider,
+                    Embedding.hash.in_(batch_hashes),
+                )
+                .all()
+            )
+            db_embeddings = {embedding.hash: embedding.get_embedding_array() for embedding in embeddings}
+            cached_embeddings.update(db_embeddings)
+            self._put_local_cache(db_embeddings)
+
+        return cached_embeddings
+
+    def _cache_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        """
+        Write embeddings to the embeddings table, rows cached concurrently by another worker are left untouched.
+        """
+        if not embeddings:
+            return
+        rows = [
+            {
+                "model_name": self._model_instance.model,
+                "hash": hash,
+                "provider_name": self._model_instance.provider,
+                "embedding": encode_embedding(n_embedding),
+            }
+            # a stable order keeps concurrent inserts of overlapping batches from deadlocking
+            for hash, n_embedding in sorted(embeddings.items())
+        ]
+        try:
+            for i in range(0, len(rows), EMBEDDING_CACHE_BATCH_SIZE):
+                stmt = (
+                    insert(Embedding)
+                    .values(rows[i : i + EMBEDDING_CACHE_BATCH_SIZE])
+                    .on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+                )
+                db.session.execute(stmt)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        self._put_local_cache({row["hash"]: decode_embedding(row["embedding"]) for row in rows})
+
+    def _put_local_cache(self, embeddings: dict[str, np.ndarray]) -> None:
+        if not _local_cache.capacity or not embeddings:
+            return
+        with _local_cache_lock:
+            for hash, embedding in embeddings.items():
+                _local_cache.put(self._local_cache_key(hash), embedding)
 
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
@@ -108,8 +181,10 @@ class CacheEmbedding(Embeddings):
         embedding = redis_client.get(embedding_cache_key)
         if embedding:
             redis_client.expire(embedding_cache_key, 600)
-            decoded_embedding = np.frombuffer(base64.b64decode(embedding), dtype="float")
-            return [float(x) for x in decoded_embedding]
+            if is_encoded_embedding(embedding):
+                return cast(list[float], decode_embedding(embedding).tolist())
+            # entries cached before the binary codec hold base64 encoded float64 values
+            return cast(list[float], np.frombuffer(base64.b64decode(embedding), dtype="float").tolist())
         try:
             embedding_result = self._model_instance.invoke_text_embedding(
                 texts=[text], user=self._user, input_type=EmbeddingInputType.QUERY
@@ -126,14 +201,7 @@ class CacheEmbedding(Embeddings):
             raise ex
 
         try:
-            # encode embedding to base64
-            embedding_vector = np.array(embedding_results)
-            vector_bytes = embedding_vector.tobytes()
-            # Transform to Base64
-            encoded_vector = base64.b64encode(vector_bytes)
-            # Transform to string
-            encoded_str = encoded_vector.decode("utf-8")
-            redis_client.setex(embedding_cache_key, 600, encoded_str)
+            redis_client.setex(embedding_cache_key, 600, encode_embedding(embedding_results))
         except Exception as ex:
             if dify_config.DEBUG:
                 logging.exception(f"Failed to add embedding to redis for the text '{text[:10]}...({len(text)} chars)'")
@@ -0,0 +1,45 @@
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+# Binary layout of a cached embedding: 4-byte magic, little-endian uint32 dimension,
+# then the vector as raw little-endian float32 values.
+EMBEDDING_MAGIC = b"DEB1"
+_HEADER = struct.Struct("<4sI")
+_DTYPE = np.dtype("<f4")
+
+
+def is_encoded_embedding(data: bytes) -> bool:
+    """
+    Check whether the data was produced by `encode_embedding`.
+
+    The magic alone doesn't tell legacy cache entries apart: pickled lists start with the pickle protocol byte,
+    but base64 encoded float64 values can start with "DEB1". Their header never matches their length though,
+    base64 characters read as a dimension above 700 million.
+    """
+    if len(data) < _HEADER.size:
+        return False
+    magic, dimension = _HEADER.unpack_from(data)
+    return magic == EMBEDDING_MAGIC and len(data) == _HEADER.size + dimension * _DTYPE.itemsize
+
+
+def encode_embedding(embedding: Sequence[float] | np.ndarray) -> bytes:
+    """
+    Encode an embedding vector as a header followed by little-endian float32 values.
+    """
+    vector = np.asarray(embedding, dtype=_DTYPE)
+    if vector.ndim != 1:
+        raise ValueError("Embedding must be a one-dimensional vector")
+    return _HEADER.pack(EMBEDDING_MAGIC, vector.shape[0]) + vector.tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """
+    Decode an embedding produced by `encode_embedding`.
+    The returned array is a read-only view on `data`, no copy is made.
+    """
+    if not is_encoded_embedding(data):
+        raise ValueError("Data is not an encoded embedding")
+    _, dimension = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_DTYPE, count=dimension, offset=_HEADER.size)
@@ -0,0 +1,180 @@
+"""
+Concurrent dispatch of document embedding batches.
+
+Batches of one model are sent concurrently, up to a limit shared by every dispatch to the same provider in the
+process. The limit adapts to the provider (AIMD): it grows by about one per round trip while latency stays close to
+the best observed, and is halved on rate limits or when latency climbs, so indexing runs at the throughput the
+provider actually allows. Load balancing configs are rotated and cooled down by `ModelInstance` as usual, a rate
+limit only reaches the dispatcher once every config is cooling down.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from configs import dify_config
+from core.entities.embedding_type import EmbeddingInputType
+from core.model_manager import ModelInstance
+from core.model_runtime.entities.text_embedding_entities import TextEmbeddingResult
+from core.model_runtime.errors.invoke import (
+    InvokeConnectionError,
+    InvokeRateLimitError,
+    InvokeServerUnavailableError,
+)
+
+logger = logging.getLogger(__name__)
+
+# seconds to wait before retrying a failed batch, doubled on every attempt
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Concurrency limit with additive increase and multiplicative decrease.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial_limit: int = 1,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ) -> None:
+        self.max_limit = max_limit
+        self._limit = float(min(initial_limit, max_limit))
+        self._backoff = backoff
+        self._latency_tolerance = latency_tolerance
+        self._baseline_latency: Optional[float] = None
+        self._last_decrease_at = 0.0
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency: Optional[float] = None, rate_limited: bool = False) -> None:
+        """
+        :param latency: seconds the call took, None if it failed without telling anything about the load
+        :param rate_limited: whether the provider rejected the call because of its rate limit
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if rate_limited:
+                self._decrease(self._baseline_latency or 0.0)
+            elif latency is not None:
+                if self._baseline_latency is None:
+                    self._baseline_latency = latency
+                if latency > self._baseline_latency * self._latency_tolerance:
+                    self._decrease(latency)
+                else:
+                    # about one more call per round trip at the current limit
+                    self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+                    self._baseline_latency += 0.1 * (latency - self._baseline_latency)
+            self._condition.notify_all()
+
+    def _decrease(self, latency: float = 0.0) -> None:
+        # the calls in flight when the limit was last decreased may still report the same congestion
+        now = time.monotonic()
+        if now - self._last_decrease_at < latency:
+            return
+        self._last_decrease_at = now
+        self._limit = max(1.0, self._limit * self._backoff)
+
+
+_limits: dict[tuple[str, str], AdaptiveConcurrencyLimit] = {}
+_limits_lock = threading.Lock()
+
+
+def get_concurrency_limit(model_instance: ModelInstance) -> AdaptiveConcurrencyLimit:
+    """
+    Get the concurrency limit shared by the embedding calls of a tenant to a provider.
+    """
+    key = (model_instance.provider_model_bundle.configuration.tenant_id, model_instance.provider)
+    with _limits_lock:
+        limit = _limits.get(key)
+        if limit is None:
+            max_limit = dify_config.EMBEDDING_MAX_CONCURRENCY
+            if model_instance.load_balancing_manager:
+                # every load balancing config has its own rate limit
+                max_limit *= max(1, model_instance.load_balancing_manager.config_count)
+            limit = _limits[key] = AdaptiveConcurrencyLimit(max_limit=max_limit)
+        return limit
+
+
+class EmbeddingDispatcher:
+    def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
+        self._model_instance = model_instance
+        self._user = user
+
+    def embed(self, batches: list[list[str]]) -> list[TextEmbeddingResult]:
+        """
+        Embed batches of documents concurrently, retrying each failed batch on its own.
+        :return: results in the order of the batches
+        """
+        limit = get_concurrency_limit(self._model_instance)
+        if len(batches) <= 1:
+            return [self._invoke(batch, limit, threading.Event()) for batch in batches]
+
+        cancelled = threading.Event()
+        with ThreadPoolExecutor(max_workers=min(len(batches), limit.max_limit)) as executor:
+            futures = [executor.submit(self._invoke, batch, limit, cancelled) for batch in batches]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                # the other batches are wasted once one of them failed for good
+                cancelled.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _invoke(
+        self, texts: list[str], limit: AdaptiveConcurrencyLimit, cancelled: threading.Event
+    ) -> TextEmbeddingResult:
+        attempt = 0
+        while True:
+            limit.acquire()
+            start_at = time.perf_counter()
+            try:
+                result = self._model_instance.invoke_text_embedding(
+                    texts=texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
+                )
+            except InvokeRateLimitError as e:
+                limit.release(rate_limited=True)
+                error: Exception = e
+            except (InvokeConnectionError, InvokeServerUnavailableError) as e:
+                limit.release()
+                error = e
+            except BaseException:
+                limit.release()
+                raise
+            else:
+                limit.release(latency=time.perf_counter() - start_at)
+                return result
+
+            attempt += 1
+            if attempt > dify_config.EMBEDDING_MAX_RETRIES or cancelled.is_set():
+                raise error
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            logger.warning(
+                "Embedding batch of %s texts failed, retrying in %.1fs (attempt %s): %s",
+                len(texts),
+                delay,
+                attempt,
+                error,
+            )
+            cancelled.wait(delay)
@@ -33,6 +33,12 @@ class BaseIndexProcessor(ABC):
     def clean(self, dataset: Dataset, node_ids: Optional[list[str]], with_keywords: bool = True, **kwargs):
         raise NotImplementedError
 
+    def get_vector_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        Get the documents written to the vector index when loading the given documents.
+        """
+        return documents
+
     @abstractmethod
     def retrieve(
         self,
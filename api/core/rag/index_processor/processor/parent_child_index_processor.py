@@ -99,13 +99,15 @@ class ParentChildIndexProcessor(BaseIndexProcessor):
     def load(self, dataset: Dataset, documents: list[Document], with_keywords: bool = True, **kwargs):
         if dataset.indexing_technique == "high_quality":
             vector = Vector(dataset)
-            for document in documents:
-                child_documents = document.children
-                if child_documents:
-                    formatted_child_documents = [
-                        Document(**child_document.model_dump()) for child_document in child_documents
-                    ]
-                    vector.create(formatted_child_documents)
+            vector.create(self.get_vector_documents(documents))
+
+    def get_vector_documents(self, documents: list[Document]) -> list[Document]:
+        # only the child chunks are embedded
+        return [
+            Document(**child_document.model_dump())
+            for document in documents
+            for child_document in document.children or []
+        ]
 
     def clean(self, dataset: Dataset, node_ids: Optional[list[str]], with_keywords: bool = True, **kwargs):
         # node_ids is segment's node_ids
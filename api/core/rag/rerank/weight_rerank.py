@@ -1,16 +1,21 @@
-import math
-from collections import Counter
-from typing import Optional
+from typing import Optional, cast
 
 import numpy as np
 
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
+from core.rag.datasource.keyword.jieba.jieba import Jieba, KeywordTableConfig
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.models.document import Document
 from core.rag.rerank.entity.weight import VectorSetting, Weights
 from core.rag.rerank.rerank_base import BaseRerankRunner
+from extensions.ext_database import db
+from models.dataset import DocumentSegment
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
 
 
 class WeightRerankRunner(BaseRerankRunner):
@@ -65,80 +70,102 @@ class WeightRerankRunner(BaseRerankRunner):
 
     def _calculate_keyword_score(self, query: str, documents: list[Document]) -> list[float]:
         """
-        Calculate BM25 scores
+        Calculate BM25 scores over the keywords of the documents, normalized to [0, 1]
         :param query: search query
         :param documents: documents for reranking
 
         :return:
         """
         keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            # get the document keywords
-            document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
+        query_keywords = sorted(keyword_table_handler.extract_keywords(query, None))
+        documents_keywords = self._get_documents_keywords(documents, keyword_table_handler)
+        for document, document_keywords in zip(documents, documents_keywords):
             if document.metadata is not None:
                 document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
 
-        # for idx, similarity in enumerate(similarities):
-        #     print(f"Document {idx + 1} similarity: {similarity}")
+        if not documents or not query_keywords:
+            return [0.0] * len(documents)
+
+        # corpus statistics are precomputed with the keyword index of the datasets,
+        # fall back to the candidate documents if the datasets have no keyword index
+        dataset_ids = [
+            dataset_id
+            for dataset_id in {document.metadata.get("dataset_id") for document in documents if document.metadata}
+            if dataset_id
+        ]
+        statistics = Jieba.get_corpus_statistics(dataset_ids, query_keywords)
+        if statistics.segment_count:
+            segment_count = statistics.segment_count
+            average_length = statistics.keyword_count / statistics.segment_count
+            document_frequencies = np.array(
+                [statistics.document_frequencies.get(keyword, 0) for keyword in query_keywords], dtype=np.float64
+            )
+        else:
+            segment_count = len(documents)
+            average_length = sum(len(document_keywords) for document_keywords in documents_keywords) / len(documents)
+            document_frequencies = np.array(
+                [
+                    sum(1 for document_keywords in documents_keywords if keyword in document_keywords)
+                    for keyword in query_keywords
+                ],
+                dtype=np.float64,
+            )
 
-        return similarities
+        # document x query keyword match matrix, keywords are sets so term frequencies are 0 or 1. it is dense:
+        # its size is the candidate documents times the query keywords, both small
+        keyword_index = {keyword: i for i, keyword in enumerate(query_keywords)}
+        rows = []
+        columns = []
+        for i, document_keywords in enumerate(documents_keywords):
+            for keyword in document_keywords:
+                if keyword in keyword_index:
+                    rows.append(i)
+                    columns.append(keyword_index[keyword])
+        matches = np.zeros((len(documents), len(query_keywords)), dtype=np.float64)
+        matches[rows, columns] = 1.0
+
+        idf = np.log((segment_count - document_frequencies + 0.5) / (document_frequencies + 0.5) + 1.0)
+        document_lengths = np.array([len(document_keywords) for document_keywords in documents_keywords])
+        length_norm = 1.0 - BM25_B + BM25_B * document_lengths / (average_length or 1.0)
+        scores = (matches @ idf) * (BM25_K1 + 1.0) / (1.0 + BM25_K1 * length_norm)
+
+        # 1.0 is the score of a document of average length matching every query keyword
+        max_score = idf.sum()
+        if not max_score:
+            return [0.0] * len(documents)
+        return cast(list[float], np.clip(scores / max_score, 0.0, 1.0).tolist())
+
+    def _get_documents_keywords(
+        self, documents: list[Document], keyword_table_handler: JiebaKeywordTableHandler
+    ) -> list[set[str]]:
+        """
+        Get the keywords of the documents, reusing the keywords stored on their segments
+        and only extracting them for documents without stored keywords.
+        """
+        index_node_ids = [document.metadata["doc_id"] for document in documents if document.metadata]
+        dataset_ids = {document.metadata.get("dataset_id") for document in documents if document.metadata} - {None}
+        stored_keywords: dict[tuple[str, str], list[str]] = {}
+        if index_node_ids and dataset_ids:
+            segments = db.session.query(
+                DocumentSegment.dataset_id, DocumentSegment.index_node_id, DocumentSegment.keywords
+            ).filter(DocumentSegment.dataset_id.in_(dataset_ids), DocumentSegment.index_node_id.in_(index_node_ids))
+            for segment in segments:
+                if segment.keywords:
+                    stored_keywords[(segment.dataset_id, segment.index_node_id)] = segment.keywords
+
+        max_keywords_per_chunk = KeywordTableConfig().max_keywords_per_chunk
+        documents_keywords = []
+        for document in documents:
+            keywords = None
+            if document.metadata:
+                keywords = stored_keywords.get((document.metadata.get("dataset_id"), document.metadata["doc_id"]))
+            if keywords:
+                documents_keywords.append(set(keywords))
+            else:
+                documents_keywords.append(
+                    keyword_table_handler.extract_keywords(document.page_content, max_keywords_per_chunk)
+                )
+        return documents_keywords
 
     def _calculate_cosine(
         self, tenant_id: str, query: str, documents: list[Document], vector_setting: VectorSetting
@@ -150,7 +177,17 @@ class WeightRerankRunner(BaseRerankRunner):
 
         :return:
         """
-        query_vector_scores = []
+        query_vector_scores = np.zeros(len(documents), dtype=np.float64)
+
+        # documents from vector search already carry their similarity score
+        unscored_indices = []
+        for i, document in enumerate(documents):
+            if document.metadata and "score" in document.metadata:
+                query_vector_scores[i] = document.metadata["score"]
+            else:
+                unscored_indices.append(i)
+        if not unscored_indices:
+            return cast(list[float], query_vector_scores.tolist())
 
         model_manager = ModelManager()
 
@@ -161,25 +198,26 @@ class WeightRerankRunner(BaseRerankRunner):
             model=vector_setting.embedding_model_name,
         )
         cache_embedding = CacheEmbedding(embedding_model)
-        query_vector = cache_embedding.embed_query(query)
-        for document in documents:
-            # calculate cosine similarity
-            if document.metadata and "score" in document.metadata:
-                query_vector_scores.append(document.metadata["score"])
-            else:
-                # transform to NumPy
-                vec1 = np.array(query_vector)
-                vec2 = np.array(document.vector)
-
-                # calculate dot product
-                dot_product = np.dot(vec1, vec2)
-
-                # calculate norm
-                norm_vec1 = np.linalg.norm(vec1)
-                norm_vec2 = np.linalg.norm(vec2)
-
-                # calculate cosine similarity
-                cosine_sim = dot_product / (norm_vec1 * norm_vec2)
-                query_vector_scores.append(cosine_sim)
+        query_vector = np.asarray(cache_embedding.embed_query(query), dtype=np.float32)
+
+        # vectors missing after hybrid merge are read from the embedding cache in one batch,
+        # only texts that were never embedded with this model are sent to it
+        missing_indices = [i for i in unscored_indices if documents[i].vector is None]
+        if missing_indices:
+            missing_vectors = cache_embedding.embed_documents([documents[i].page_content for i in missing_indices])
+            for i, vector in zip(missing_indices, missing_vectors):
+                documents[i].vector = vector
+
+        vector_indices = [i for i in unscored_indices if documents[i].vector]
+        if not vector_indices:
+            return cast(list[float], query_vector_scores.tolist())
+
+        # calculate cosine similarity of all documents with a single matrix product
+        matrix = np.asarray([documents[i].vector for i in vector_indices], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        dot_products = matrix @ query_vector
+        query_vector_scores[vector_indices] = np.divide(
+            dot_products, norms, out=np.zeros_like(dot_products), where=norms != 0
+        )
 
-        return query_vector_scores
+        return cast(list[float], query_vector_scores.tolist())
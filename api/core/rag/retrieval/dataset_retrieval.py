@@ -1,10 +1,16 @@
+import concurrent.futures
+import logging
 import math
 import threading
-from collections import Counter
+from collections import Counter, deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Optional, cast
 
 from flask import Flask, current_app
+from sqlalchemy import func
 
+from configs import dify_config
 from core.app.app_config.entities import DatasetEntity, DatasetRetrieveConfigEntity
 from core.app.entities.app_invoke_entities import InvokeFrom, ModelConfigWithCredentialsEntity
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
@@ -32,6 +38,8 @@ from models.dataset import Dataset, DatasetQuery, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from services.external_knowledge_service import ExternalDatasetService
 
+logger = logging.getLogger(__name__)
+
 default_retrieval_model: dict[str, Any] = {
     "search_method": RetrievalMethod.SEMANTIC_SEARCH.value,
     "reranking_enable": False,
@@ -41,6 +49,53 @@ default_retrieval_model: dict[str, Any] = {
 }
 
 
+class _RetrievalExecutor:
+    """
+    Threads shared by the multiple retrievals of the process, a retrieval mostly waits on the stores of its datasets.
+
+    A retrieval takes at most a few of the threads. A store that hangs keeps its thread past the deadline of the
+    retrieval, so once every shared thread is busy, retrievals run on threads of their own instead of queueing
+    behind the stalled ones.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dataset_retrieval")
+        self._idle_workers = threading.BoundedSemaphore(max_workers)
+
+    def submit_all(self, fn: Callable[..., Any], calls: list[dict[str, Any]], max_workers: int) -> list[Future]:
+        """
+        Call fn once per keyword arguments in calls, with at most max_workers calls running at once.
+        Calls whose future is cancelled before they start are skipped.
+        """
+        pending = deque((Future(), kwargs) for kwargs in calls)
+        futures = [future for future, _ in pending]
+
+        def run_pending():
+            while True:
+                try:
+                    future, kwargs = pending.popleft()
+                except IndexError:
+                    return
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn(**kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+
+        for _ in range(min(max_workers, len(calls))):
+            if self._idle_workers.acquire(blocking=False):
+                self._executor.submit(run_pending).add_done_callback(lambda _: self._idle_workers.release())
+            else:
+                threading.Thread(target=run_pending, name="dataset_retrieval_overflow", daemon=True).start()
+        return futures
+
+
+_retrieval_executor = _RetrievalExecutor(max_workers=dify_config.DATASET_RETRIEVAL_MAX_WORKERS)
+# hit counts and queries are saved off the request path, one retrieval at a time
+_stats_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dataset_retrieval_stats")
+
+
 class DatasetRetrieval:
     def __init__(self, application_generate_entity=None):
         self.application_generate_entity = application_generate_entity
@@ -101,20 +156,7 @@ class DatasetRetrieval:
         if features:
             if ModelFeature.TOOL_CALL in features or ModelFeature.MULTI_TOOL_CALL in features:
                 planning_strategy = PlanningStrategy.ROUTER
-        available_datasets = []
-        for dataset_id in dataset_ids:
-            # get dataset from dataset id
-            dataset = db.session.query(Dataset).filter(Dataset.tenant_id == tenant_id, Dataset.id == dataset_id).first()
-
-            # pass if dataset is not available
-            if not dataset:
-                continue
-
-            # pass if dataset is not available
-            if dataset and dataset.available_document_count == 0 and dataset.provider != "external":
-                continue
-
-            available_datasets.append(dataset)
+        available_datasets = self._get_available_datasets(tenant_id, dataset_ids)
         all_documents = []
         user_from = "account" if invoke_from in {InvokeFrom.EXPLORE, InvokeFrom.DEBUGGER} else "end_user"
         if retrieve_config.retrieve_strategy == DatasetRetrieveConfigEntity.RetrieveStrategy.SINGLE:
@@ -269,7 +311,7 @@ class DatasetRetrieval:
 
         if dataset_id:
             # get retrieval model config
-            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+            dataset = next((item for item in available_datasets if item.id == dataset_id), None)
             if dataset:
                 results = []
                 if dataset.provider == "external":
@@ -350,7 +392,6 @@ class DatasetRetrieval:
     ):
         if not available_datasets:
             return []
-        threads = []
         all_documents: list[Document] = []
         dataset_ids = [dataset.id for dataset in available_datasets]
         index_type_check = all(
@@ -384,22 +425,43 @@ class DatasetRetrieval:
                     ].embedding_model_provider
                     weights["vector_setting"]["embedding_model_name"] = available_datasets[0].embedding_model
 
-        for dataset in available_datasets:
-            index_type = dataset.indexing_technique
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
+        flask_app = current_app._get_current_object()  # type: ignore
+        # the datasets belong to the session of this thread, only plain values are handed to the workers
+        futures = _retrieval_executor.submit_all(
+            self._retriever,
+            [
+                {
+                    "flask_app": flask_app,
                     "dataset_id": dataset.id,
+                    "tenant_id": dataset.tenant_id,
+                    "dataset_name": dataset.name,
+                    "provider": dataset.provider,
+                    "indexing_technique": dataset.indexing_technique,
+                    "retrieval_model": dataset.retrieval_model or default_retrieval_model,
                     "query": query,
                     "top_k": top_k,
-                    "all_documents": all_documents,
-                },
+                }
+                for dataset in available_datasets
+            ],
+            max_workers=dify_config.DATASET_RETRIEVAL_MAX_WORKERS_PER_REQUEST,
+        )
+        done, not_done = concurrent.futures.wait(futures, timeout=dify_config.DATASET_RETRIEVAL_TIMEOUT)
+        if not_done:
+            logger.warning(
+                "Retrieval from %s of %s datasets did not finish in %ss, leaving them out",
+                len(not_done),
+                len(futures),
+                dify_config.DATASET_RETRIEVAL_TIMEOUT,
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            for future in not_done:
+                future.cancel()
+        for future in futures:
+            if future not in done:
+                continue
+            try:
+                all_documents.extend(future.result())
+            except Exception:
+                logger.exception("Failed to retrieve from dataset")
 
         with measure_time() as timer:
             if reranking_enable:
@@ -426,21 +488,21 @@ class DatasetRetrieval:
         self, documents: list[Document], message_id: Optional[str] = None, timer: Optional[dict] = None
     ) -> None:
         """Handle retrieval end."""
-        dify_documents = [document for document in documents if document.provider == "dify"]
-        for document in dify_documents:
-            if document.metadata is not None:
-                query = db.session.query(DocumentSegment).filter(
-                    DocumentSegment.index_node_id == document.metadata["doc_id"]
-                )
-
-                # if 'dataset_id' in document.metadata:
-                if "dataset_id" in document.metadata:
-                    query = query.filter(DocumentSegment.dataset_id == document.metadata["dataset_id"])
-
-                # add hit count to document segment
-                query.update({DocumentSegment.hit_count: DocumentSegment.hit_count + 1}, synchronize_session=False)
-
-                db.session.commit()
+        dify_documents = [
+            document for document in documents if document.provider == "dify" and document.metadata is not None
+        ]
+        if dify_documents:
+            index_node_ids = list({document.metadata["doc_id"] for document in dify_documents})
+            # only narrow down to the datasets when every document tells its dataset
+            dataset_ids = None
+            if all("dataset_id" in document.metadata for document in dify_documents):
+                dataset_ids = list({document.metadata["dataset_id"] for document in dify_documents})
+            _stats_executor.submit(
+                self._update_segment_hit_count,
+                flask_app=current_app._get_current_object(),  # type: ignore
+                index_node_ids=index_node_ids,
+                dataset_ids=dataset_ids,
+            )
 
         # get tracing instance
         trace_manager: TraceQueueManager | None = (
@@ -457,36 +519,110 @@ class DatasetRetrieval:
         """
         Handle query.
         """
-        if not query:
+        if not query or not dataset_ids:
             return
-        dataset_queries = []
-        for dataset_id in dataset_ids:
-            dataset_query = DatasetQuery(
-                dataset_id=dataset_id,
-                content=query,
-                source="app",
-                source_app_id=app_id,
-                created_by_role=user_from,
-                created_by=user_id,
-            )
-            dataset_queries.append(dataset_query)
-        if dataset_queries:
-            db.session.add_all(dataset_queries)
-        db.session.commit()
+        _stats_executor.submit(
+            self._save_dataset_queries,
+            flask_app=current_app._get_current_object(),  # type: ignore
+            query=query,
+            dataset_ids=dataset_ids,
+            app_id=app_id,
+            user_from=user_from,
+            user_id=user_id,
+        )
+
+    @staticmethod
+    def _update_segment_hit_count(
+        flask_app: Flask, index_node_ids: list[str], dataset_ids: Optional[list[str]] = None
+    ) -> None:
+        with flask_app.app_context():
+            try:
+                query = db.session.query(DocumentSegment).filter(DocumentSegment.index_node_id.in_(index_node_ids))
+                if dataset_ids is not None:
+                    query = query.filter(DocumentSegment.dataset_id.in_(dataset_ids))
 
-    def _retriever(self, flask_app: Flask, dataset_id: str, query: str, top_k: int, all_documents: list):
+                # add hit count to document segments
+                query.update({DocumentSegment.hit_count: DocumentSegment.hit_count + 1}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                logger.exception("Failed to update hit count of %s segments", len(index_node_ids))
+
+    @staticmethod
+    def _save_dataset_queries(
+        flask_app: Flask, query: str, dataset_ids: list[str], app_id: str, user_from: str, user_id: str
+    ) -> None:
         with flask_app.app_context():
-            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+            try:
+                db.session.add_all(
+                    [
+                        DatasetQuery(
+                            dataset_id=dataset_id,
+                            content=query,
+                            source="app",
+                            source_app_id=app_id,
+                            created_by_role=user_from,
+                            created_by=user_id,
+                        )
+                        for dataset_id in dataset_ids
+                    ]
+                )
+                db.session.commit()
+            except Exception:
+                logger.exception("Failed to save queries of %s datasets", len(dataset_ids))
 
-            if not dataset:
-                return []
+    @staticmethod
+    def _get_available_datasets(tenant_id: str, dataset_ids: Sequence[str]) -> list[Dataset]:
+        """
+        Get the datasets of the tenant that can be retrieved from, in the order of the given ids.
+        """
+        if not dataset_ids:
+            return []
+
+        # Subquery: Count the number of available documents for each dataset
+        subquery = (
+            db.session.query(
+                DatasetDocument.dataset_id, func.count(DatasetDocument.id).label("available_document_count")
+            )
+            .filter(
+                DatasetDocument.indexing_status == "completed",
+                DatasetDocument.enabled == True,
+                DatasetDocument.archived == False,
+                DatasetDocument.dataset_id.in_(dataset_ids),
+            )
+            .group_by(DatasetDocument.dataset_id)
+            .subquery()
+        )
+
+        datasets = (
+            db.session.query(Dataset)
+            .outerjoin(subquery, Dataset.id == subquery.c.dataset_id)
+            .filter(Dataset.tenant_id == tenant_id, Dataset.id.in_(dataset_ids))
+            .filter((subquery.c.available_document_count > 0) | (Dataset.provider == "external"))
+            .all()
+        )
+        datasets_by_id = {dataset.id: dataset for dataset in datasets}
+        return [datasets_by_id[dataset_id] for dataset_id in dict.fromkeys(dataset_ids) if dataset_id in datasets_by_id]
 
-            if dataset.provider == "external":
+    def _retriever(
+        self,
+        flask_app: Flask,
+        dataset_id: str,
+        tenant_id: str,
+        dataset_name: str,
+        provider: str,
+        indexing_technique: Optional[str],
+        retrieval_model: dict,
+        query: str,
+        top_k: int,
+    ) -> list[Document]:
+        all_documents: list[Document] = []
+        with flask_app.app_context():
+            if provider == "external":
                 external_documents = ExternalDatasetService.fetch_external_knowledge_retrieval(
-                    tenant_id=dataset.tenant_id,
+                    tenant_id=tenant_id,
                     dataset_id=dataset_id,
                     query=query,
-                    external_retrieval_parameters=dataset.retrieval_model,
+                    external_retrieval_parameters=retrieval_model,
                 )
                 for external_document in external_documents:
                     document = Document(
@@ -498,16 +634,14 @@ class DatasetRetrieval:
                         document.metadata["score"] = external_document.get("score")
                         document.metadata["title"] = external_document.get("title")
                         document.metadata["dataset_id"] = dataset_id
-                        document.metadata["dataset_name"] = dataset.name
+                        document.metadata["dataset_name"] = dataset_name
                     all_documents.append(document)
             else:
                 # get retrieval model , if the model is not setting , using default
-                retrieval_model = dataset.retrieval_model or default_retrieval_model
-
-                if dataset.indexing_technique == "economy":
+                if indexing_technique == "economy":
                     # use keyword table query
                     documents = RetrievalService.retrieve(
-                        retrieval_method="keyword_search", dataset_id=dataset.id, query=query, top_k=top_k
+                        retrieval_method="keyword_search", dataset_id=dataset_id, query=query, top_k=top_k
                     )
                     if documents:
                         all_documents.extend(documents)
@@ -516,21 +650,23 @@ class DatasetRetrieval:
                         # retrieval source
                         documents = RetrievalService.retrieve(
                             retrieval_method=retrieval_model["search_method"],
-                            dataset_id=dataset.id,
+                            dataset_id=dataset_id,
                             query=query,
                             top_k=retrieval_model.get("top_k") or 2,
                             score_threshold=retrieval_model.get("score_threshold", 0.0)
                             if retrieval_model["score_threshold_enabled"]
                             else 0.0,
-                            reranking_model=retrieval_model.get("reranking_model", None)
+                            reranking_model=retrieval_model.get("reranking_model")
                             if retrieval_model["reranking_enable"]
                             else None,
                             reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
-                            weights=retrieval_model.get("weights", None),
+                            weights=retrieval_model.get("weights"),
                         )
 
                         all_documents.extend(documents)
 
+        return all_documents
+
     def to_dataset_retriever_tool(
         self,
         tenant_id: str,
@@ -550,20 +686,7 @@ class DatasetRetrieval:
         :param hit_callback: hit callback
         """
         tools = []
-        available_datasets = []
-        for dataset_id in dataset_ids:
-            # get dataset from dataset id
-            dataset = db.session.query(Dataset).filter(Dataset.tenant_id == tenant_id, Dataset.id == dataset_id).first()
-
-            # pass if dataset is not available
-            if not dataset:
-                continue
-
-            # pass if dataset is not available
-            if dataset and dataset.provider != "external" and dataset.available_document_count == 0:
-                continue
-
-            available_datasets.append(dataset)
+        available_datasets = self._get_available_datasets(tenant_id, dataset_ids)
 
         if retrieve_config.retrieve_strategy == DatasetRetrieveConfigEntity.RetrieveStrategy.SINGLE:
             # get retrieval model config
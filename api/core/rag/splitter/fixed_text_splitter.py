@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Any, Optional
 
 from core.model_manager import ModelInstance
 from core.model_runtime.model_providers.__base.tokenizers.gpt2_tokenzier import GPT2Tokenizer
+from core.model_runtime.model_providers.__base.tokenizers.local_tokenizer import LocalTokenizer
 from core.rag.splitter.text_splitter import (
     TS,
     Collection,
@@ -35,6 +37,12 @@ class EnhanceRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
                 return []
 
             if embedding_model_instance:
+                # counted in-process when the model family has a local tokenizer
+                num_tokens = LocalTokenizer.get_num_tokens(
+                    embedding_model_instance.provider, embedding_model_instance.model, texts
+                )
+                if num_tokens is not None:
+                    return num_tokens
                 return embedding_model_instance.get_text_embedding_num_tokens(texts=texts)
             else:
                 return [GPT2Tokenizer.get_num_tokens(text) for text in texts]
@@ -64,50 +72,93 @@ class FixedRecursiveCharacterTextSplitter(EnhanceRecursiveCharacterTextSplitter)
         else:
             chunks = [text]
 
+        pieces = [_Piece(chunk) for chunk in chunks]
+        self._measure(pieces)
+        self._subdivide([piece for piece in pieces if piece.length > self._chunk_size])
+
         final_chunks = []
-        chunks_lengths = self._length_function(chunks)
-        for chunk, chunk_length in zip(chunks, chunks_lengths):
-            if chunk_length > self._chunk_size:
-                final_chunks.extend(self.recursive_split_text(chunk))
+        for piece in pieces:
+            if piece.length > self._chunk_size:
+                final_chunks.extend(self._merge_piece(piece))
             else:
-                final_chunks.append(chunk)
+                final_chunks.append(piece.text)
 
         return final_chunks
 
     def recursive_split_text(self, text: str) -> list[str]:
         """Split incoming text and return chunks."""
+        piece = _Piece(text)
+        self._subdivide([piece])
+        return self._merge_piece(piece)
+
+    def _measure(self, pieces: list[_Piece]) -> None:
+        if not pieces:
+            return
+        lengths = self._length_function([piece.text for piece in pieces])
+        for piece, length in zip(pieces, lengths):
+            piece.length = length
+
+    def _subdivide(self, pieces: list[_Piece]) -> None:
+        """
+        Split the pieces until every part is below the chunk size or can't be split any further.
+        The parts of all pieces are measured together, one length call per level instead of one per piece.
+        """
+        while pieces:
+            parts: list[_Piece] = []
+            for piece in pieces:
+                # Get appropriate separator to use
+                separator = self._separators[-1]
+                for _s in self._separators:
+                    if _s == "":
+                        separator = _s
+                        break
+                    if _s in piece.text:
+                        separator = _s
+                        break
+                # Now that we have the separator, split the text
+                splits = piece.text.split(separator) if separator else list(piece.text)
+                if len(splits) == 1 and splits[0] == piece.text:
+                    # a single character above the chunk size, keep it as it is
+                    continue
+                piece.separator = separator
+                piece.parts = [_Piece(split) for split in splits]
+                parts.extend(piece.parts)
+
+            self._measure(parts)
+            pieces = [part for part in parts if part.length >= self._chunk_size]
+
+    def _merge_piece(self, piece: _Piece) -> list[str]:
+        if piece.parts is None:
+            return [piece.text]
+
         final_chunks = []
-        # Get appropriate separator to use
-        separator = self._separators[-1]
-        for _s in self._separators:
-            if _s == "":
-                separator = _s
-                break
-            if _s in text:
-                separator = _s
-                break
-        # Now that we have the separator, split the text
-        if separator:
-            splits = text.split(separator)
-        else:
-            splits = list(text)
         # Now go merging things, recursively splitting longer texts.
         _good_splits = []
         _good_splits_lengths = []  # cache the lengths of the splits
-        s_lens = self._length_function(splits)
-        for s, s_len in zip(splits, s_lens):
-            if s_len < self._chunk_size:
-                _good_splits.append(s)
-                _good_splits_lengths.append(s_len)
+        for part in piece.parts:
+            if part.length < self._chunk_size:
+                _good_splits.append(part.text)
+                _good_splits_lengths.append(part.length)
             else:
                 if _good_splits:
-                    merged_text = self._merge_splits(_good_splits, separator, _good_splits_lengths)
+                    merged_text = self._merge_splits(_good_splits, piece.separator, _good_splits_lengths)
                     final_chunks.extend(merged_text)
                     _good_splits = []
                     _good_splits_lengths = []
-                other_info = self.recursive_split_text(s)
-                final_chunks.extend(other_info)
+                final_chunks.extend(self._merge_piece(part))
         if _good_splits:
-            merged_text = self._merge_splits(_good_splits, separator, _good_splits_lengths)
+            merged_text = self._merge_splits(_good_splits, piece.separator, _good_splits_lengths)
             final_chunks.extend(merged_text)
         return final_chunks
+
+
+@dataclass
+class _Piece:
+    """
+    A piece of the text being split, with its length and the parts it was split into when it was too long.
+    """
+
+    text: str
+    length: int = 0
+    separator: str = ""
+    parts: Optional[list[_Piece]] = None
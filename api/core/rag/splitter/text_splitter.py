@@ -65,6 +65,7 @@ class TextSplitter(BaseDocumentTransformer, ABC):
         self._chunk_size = chunk_size
         self._chunk_overlap = chunk_overlap
         self._length_function = length_function
+        self._separator_lengths: dict[str, int] = {}
         self._keep_separator = keep_separator
         self._add_start_index = add_start_index
 
@@ -106,10 +107,14 @@ class TextSplitter(BaseDocumentTransformer, ABC):
     def _merge_splits(self, splits: Iterable[str], separator: str, lengths: list[int]) -> list[str]:
         # We now want to combine these smaller pieces into medium size
         # chunks to send to the LLM.
-        separator_len = self._length_function([separator])[0]
+        if separator not in self._separator_lengths:
+            self._separator_lengths[separator] = self._length_function([separator])[0]
+        separator_len = self._separator_lengths[separator]
 
         docs = []
         current_doc: list[str] = []
+        # lengths of the splits in current_doc, so that popping one doesn't measure it again
+        current_doc_lengths: list[int] = []
         total = 0
         index = 0
         for d in splits:
@@ -129,11 +134,11 @@ class TextSplitter(BaseDocumentTransformer, ABC):
                     while total > self._chunk_overlap or (
                         total + _len + (separator_len if len(current_doc) > 0 else 0) > self._chunk_size and total > 0
                     ):
-                        total -= self._length_function([current_doc[0]])[0] + (
-                            separator_len if len(current_doc) > 1 else 0
-                        )
+                        total -= current_doc_lengths[0] + (separator_len if len(current_doc) > 1 else 0)
                         current_doc = current_doc[1:]
+                        current_doc_lengths = current_doc_lengths[1:]
             current_doc.append(d)
+            current_doc_lengths.append(_len)
             total += _len + (separator_len if len(current_doc) > 1 else 0)
             index += 1
         doc = self._join_docs(current_doc, separator)
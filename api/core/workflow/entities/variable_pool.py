@@ -3,7 +3,7 @@ from collections import defaultdict
 from collections.abc import Mapping, Sequence
 from typing import Any, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from core.file import File, FileAttribute, file_manager
 from core.variables import Segment, SegmentGroup, Variable
@@ -43,6 +43,11 @@ class VariablePool(BaseModel):
         description="Conversation variables.",
         default_factory=list,
     )
+    # Parent pool of a copy-on-write overlay, see `fork`. Reads fall through to the parent unless the
+    # selector has been written or removed in this pool; writes never reach the parent.
+    _parent: "VariablePool | None" = PrivateAttr(default=None)
+    _removed_nodes: set[str] = PrivateAttr(default_factory=set)
+    _removed_keys: set[tuple[str, int]] = PrivateAttr(default_factory=set)
 
     def __init__(
         self,
@@ -105,6 +110,7 @@ class VariablePool(BaseModel):
 
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]][hash_key] = variable
+        self._removed_keys.discard((selector[0], hash_key))
 
     def get(self, selector: Sequence[str], /) -> Segment | None:
         """
@@ -123,7 +129,7 @@ class VariablePool(BaseModel):
             return None
 
         hash_key = hash(tuple(selector[1:]))
-        value = self.variable_dictionary[selector[0]].get(hash_key)
+        value = self._get_segment(selector[0], hash_key)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
@@ -153,9 +159,44 @@ class VariablePool(BaseModel):
             return
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            if self._parent is not None:
+                self._removed_nodes.add(selector[0])
+                self._removed_keys = {key for key in self._removed_keys if key[0] != selector[0]}
             return
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]].pop(hash_key, None)
+        if self._parent is not None:
+            self._removed_keys.add((selector[0], hash_key))
+
+    def fork(self) -> "VariablePool":
+        """
+        Create a copy-on-write overlay of the variable pool.
+
+        The overlay reads through to this pool and keeps its own writes and removals private,
+        so creating it costs O(1) regardless of how many variables this pool holds.
+        This pool must outlive the overlay and should not be used to remove variables the
+        overlay still depends on.
+
+        Returns:
+            VariablePool: The overlay pool.
+        """
+        overlay = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=self.environment_variables,
+            conversation_variables=self.conversation_variables,
+        )
+        overlay._parent = self
+        return overlay
+
+    def _get_segment(self, node_id: str, hash_key: int, /) -> Segment | None:
+        node_variables = self.variable_dictionary.get(node_id)
+        if node_variables is not None and hash_key in node_variables:
+            return node_variables[hash_key]
+        if self._parent is None or node_id in self._removed_nodes or (node_id, hash_key) in self._removed_keys:
+            return None
+        return self._parent._get_segment(node_id, hash_key)
 
     def convert_template(self, template: str, /):
         parts = VARIABLE_PATTERN.split(template)
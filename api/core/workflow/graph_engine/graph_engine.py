@@ -1,11 +1,12 @@
 import contextvars
 import logging
 import queue
+import threading
 import time
 import uuid
-from collections.abc import Generator, Mapping
-from concurrent.futures import ThreadPoolExecutor, wait
-from copy import copy, deepcopy
+from collections.abc import Callable, Generator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 from datetime import UTC, datetime
 from typing import Any, Optional, cast
 
@@ -35,7 +36,7 @@ from core.workflow.graph_engine.entities.event import (
     ParallelBranchRunStartedEvent,
     ParallelBranchRunSucceededEvent,
 )
-from core.workflow.graph_engine.entities.graph import Graph, GraphEdge
+from core.workflow.graph_engine.entities.graph import Graph, GraphEdge, GraphParallel
 from core.workflow.graph_engine.entities.graph_init_params import GraphInitParams
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
@@ -226,13 +227,21 @@ class GraphEngine:
         parent_parallel_id: Optional[str] = None,
         parent_parallel_start_node_id: Optional[str] = None,
         handle_exceptions: list[str] = [],
+        parallel_start_node_id: Optional[str] = None,
+        previous_route_node_state: Optional[RouteNodeState] = None,
     ) -> Generator[GraphEngineEvent, None, None]:
-        parallel_start_node_id = None
+        """
+        Run the nodes from start_node_id one after the other.
+
+        Inside a parallel branch, the run stops at the first nested parallel and yields a _ParallelFanOut,
+        the branch goes on once the nested branches succeeded.
+        """
         if in_parallel_id:
-            parallel_start_node_id = start_node_id
+            parallel_start_node_id = parallel_start_node_id or start_node_id
+        else:
+            parallel_start_node_id = None
 
         next_node_id = start_node_id
-        previous_route_node_state: Optional[RouteNodeState] = None
         while True:
             # max steps reached
             if self.graph_runtime_state.node_run_steps > self.max_execution_steps:
@@ -387,12 +396,14 @@ class GraphEngine:
 
                         if len(sub_edge_mappings) == 1:
                             final_node_id = edge.target_node_id
+                        elif in_parallel_id:
+                            yield _ParallelFanOut(
+                                edge_mappings=sub_edge_mappings, previous_route_node_state=previous_route_node_state
+                            )
+                            return
                         else:
                             parallel_generator = self._run_parallel_branches(
-                                edge_mappings=sub_edge_mappings,
-                                in_parallel_id=in_parallel_id,
-                                parallel_start_node_id=parallel_start_node_id,
-                                handle_exceptions=handle_exceptions,
+                                edge_mappings=sub_edge_mappings, handle_exceptions=handle_exceptions
                             )
 
                             for parallel_result in parallel_generator:
@@ -413,12 +424,14 @@ class GraphEngine:
                     and previous_route_node_state.status == RouteNodeState.Status.EXCEPTION
                 ):
                     break
+                elif in_parallel_id:
+                    yield _ParallelFanOut(
+                        edge_mappings=edge_mappings, previous_route_node_state=previous_route_node_state
+                    )
+                    return
                 else:
                     parallel_generator = self._run_parallel_branches(
-                        edge_mappings=edge_mappings,
-                        in_parallel_id=in_parallel_id,
-                        parallel_start_node_id=parallel_start_node_id,
-                        handle_exceptions=handle_exceptions,
+                        edge_mappings=edge_mappings, handle_exceptions=handle_exceptions
                     )
 
                     for generated_item in parallel_generator:
@@ -438,11 +451,41 @@ class GraphEngine:
     def _run_parallel_branches(
         self,
         edge_mappings: list[GraphEdge],
-        in_parallel_id: Optional[str] = None,
-        parallel_start_node_id: Optional[str] = None,
         handle_exceptions: list[str] = [],
     ) -> Generator[GraphEngineEvent | str, None, None]:
-        # if nodes has no run conditions, parallel run all nodes
+        """
+        Run the branches of a parallel reached outside of any branch, yield their events and then the node id
+        to continue with once all of them succeeded.
+
+        The branches and every parallel nested in them are scheduled on the worker pool of the run and put
+        their events into one queue. No thread waits for nested branches, a branch fanning out hands its
+        continuation to the join of the nested parallel and gives its worker back.
+        """
+        parallel = self._get_parallel(edge_mappings)
+        q: queue.Queue = queue.Queue()
+        self._start_parallel_branches(
+            parallel=parallel,
+            edge_mappings=edge_mappings,
+            q=q,
+            handle_exceptions=handle_exceptions,
+            on_succeeded=lambda: q.put(None),
+        )
+
+        while True:
+            event = q.get()
+            if event is None:
+                break
+
+            yield event
+            if isinstance(event, ParallelBranchRunFailedEvent) and event.parallel_id == parallel.id:
+                raise GraphRunFailedError(event.error)
+
+        # get final node id
+        final_node_id = parallel.end_to_node_id
+        if final_node_id:
+            yield final_node_id
+
+    def _get_parallel(self, edge_mappings: list[GraphEdge]) -> GraphParallel:
         parallel_id = self.graph.node_parallel_mapping.get(edge_mappings[0].target_node_id)
         if not parallel_id:
             node_id = edge_mappings[0].target_node_id
@@ -461,77 +504,59 @@ class GraphEngine:
         if not parallel:
             raise GraphRunFailedError(f"Parallel {parallel_id} not found.")
 
-        # run parallel nodes, run in new thread and use queue to get results
-        q: queue.Queue = queue.Queue()
-
-        # Create a list to store the threads
-        futures = []
+        return parallel
 
-        # new thread
-        for edge in edge_mappings:
-            if (
-                edge.target_node_id not in self.graph.node_parallel_mapping
-                or self.graph.node_parallel_mapping.get(edge.target_node_id, "") != parallel_id
-            ):
-                continue
-
-            future = self.thread_pool.submit(
-                self._run_parallel_node,
-                **{
-                    "flask_app": current_app._get_current_object(),  # type: ignore[attr-defined]
-                    "q": q,
-                    "context": contextvars.copy_context(),
-                    "parallel_id": parallel_id,
-                    "parallel_start_node_id": edge.target_node_id,
-                    "parent_parallel_id": in_parallel_id,
-                    "parent_parallel_start_node_id": parallel_start_node_id,
-                    "handle_exceptions": handle_exceptions,
-                },
-            )
-
-            future.add_done_callback(self.thread_pool.task_done_callback)
-
-            futures.append(future)
-
-        succeeded_count = 0
-        while True:
-            try:
-                event = q.get(timeout=1)
-                if event is None:
-                    break
-
-                yield event
-                if event.parallel_id == parallel_id:
-                    if isinstance(event, ParallelBranchRunSucceededEvent):
-                        succeeded_count += 1
-                        if succeeded_count == len(futures):
-                            q.put(None)
-
-                        continue
-                    elif isinstance(event, ParallelBranchRunFailedEvent):
-                        raise GraphRunFailedError(event.error)
-            except queue.Empty:
-                continue
-
-        # wait all threads
-        wait(futures)
-
-        # get final node id
-        final_node_id = parallel.end_to_node_id
-        if final_node_id:
-            yield final_node_id
-
-    def _run_parallel_node(
+    def _start_parallel_branches(
         self,
-        flask_app: Flask,
-        context: contextvars.Context,
+        parallel: GraphParallel,
+        edge_mappings: list[GraphEdge],
         q: queue.Queue,
-        parallel_id: str,
-        parallel_start_node_id: str,
-        parent_parallel_id: Optional[str] = None,
-        parent_parallel_start_node_id: Optional[str] = None,
-        handle_exceptions: list[str] = [],
+        handle_exceptions: list[str],
+        on_succeeded: Callable[[], None],
+        parent_branch: Optional["_ParallelBranch"] = None,
     ) -> None:
+        """
+        Submit a branch per edge into the parallel to the worker pool, on_succeeded runs on the worker of the
+        last branch to succeed.
+        """
+        branch_edges = [
+            edge for edge in edge_mappings if self.graph.node_parallel_mapping.get(edge.target_node_id) == parallel.id
+        ]
+        join = _ParallelJoin(
+            branch_count=len(branch_edges),
+            on_succeeded=on_succeeded,
+            on_failed=(lambda error: self._fail_parallel_branch(parent_branch, error)) if parent_branch else None,
+        )
+        if not branch_edges:
+            on_succeeded()
+            return
+
+        flask_app = current_app._get_current_object()  # type: ignore[attr-defined]
+        try:
+            for edge in branch_edges:
+                branch = _ParallelBranch(
+                    q=q,
+                    join=join,
+                    parallel_id=parallel.id,
+                    parallel_start_node_id=edge.target_node_id,
+                    parent_parallel_id=parent_branch.parallel_id if parent_branch else None,
+                    parent_parallel_start_node_id=parent_branch.parallel_start_node_id if parent_branch else None,
+                    handle_exceptions=handle_exceptions,
+                )
+                future = self.thread_pool.submit(
+                    self._run_parallel_node,
+                    flask_app=flask_app,
+                    context=contextvars.copy_context(),
+                    branch=branch,
+                )
+
+                future.add_done_callback(self.thread_pool.task_done_callback)
+        except Exception:
+            # the error is reported by the caller, the branches submitted so far must not report it again
+            join.abandon()
+            raise
+
+    def _run_parallel_node(self, flask_app: Flask, context: contextvars.Context, branch: "_ParallelBranch") -> None:
         """
         Run parallel nodes
         """
@@ -540,59 +565,97 @@ class GraphEngine:
 
         with flask_app.app_context():
             try:
-                q.put(
+                branch.q.put(
                     ParallelBranchRunStartedEvent(
-                        parallel_id=parallel_id,
-                        parallel_start_node_id=parallel_start_node_id,
-                        parent_parallel_id=parent_parallel_id,
-                        parent_parallel_start_node_id=parent_parallel_start_node_id,
+                        parallel_id=branch.parallel_id,
+                        parallel_start_node_id=branch.parallel_start_node_id,
+                        parent_parallel_id=branch.parent_parallel_id,
+                        parent_parallel_start_node_id=branch.parent_parallel_start_node_id,
                     )
                 )
+                self._run_parallel_branch(branch=branch, start_node_id=branch.parallel_start_node_id)
+            finally:
+                db.session.remove()
 
-                # run node
+    def _run_parallel_branch(
+        self,
+        branch: "_ParallelBranch",
+        start_node_id: Optional[str],
+        previous_route_node_state: Optional[RouteNodeState] = None,
+    ) -> None:
+        """
+        Run a branch from start_node_id until it ends or fans out into a nested parallel.
+        """
+        try:
+            if start_node_id:
                 generator = self._run(
-                    start_node_id=parallel_start_node_id,
-                    in_parallel_id=parallel_id,
-                    parent_parallel_id=parent_parallel_id,
-                    parent_parallel_start_node_id=parent_parallel_start_node_id,
-                    handle_exceptions=handle_exceptions,
+                    start_node_id=start_node_id,
+                    in_parallel_id=branch.parallel_id,
+                    parent_parallel_id=branch.parent_parallel_id,
+                    parent_parallel_start_node_id=branch.parent_parallel_start_node_id,
+                    handle_exceptions=branch.handle_exceptions,
+                    parallel_start_node_id=branch.parallel_start_node_id,
+                    previous_route_node_state=previous_route_node_state,
                 )
 
                 for item in generator:
-                    q.put(item)
+                    if isinstance(item, _ParallelFanOut):
+                        self._fan_out_parallel_branch(branch, item)
+                        return
 
-                # trigger graph run success event
-                q.put(
-                    ParallelBranchRunSucceededEvent(
-                        parallel_id=parallel_id,
-                        parallel_start_node_id=parallel_start_node_id,
-                        parent_parallel_id=parent_parallel_id,
-                        parent_parallel_start_node_id=parent_parallel_start_node_id,
-                    )
-                )
-            except GraphRunFailedError as e:
-                q.put(
-                    ParallelBranchRunFailedEvent(
-                        parallel_id=parallel_id,
-                        parallel_start_node_id=parallel_start_node_id,
-                        parent_parallel_id=parent_parallel_id,
-                        parent_parallel_start_node_id=parent_parallel_start_node_id,
-                        error=e.error,
-                    )
-                )
-            except Exception as e:
-                logger.exception("Unknown Error when generating in parallel")
-                q.put(
-                    ParallelBranchRunFailedEvent(
-                        parallel_id=parallel_id,
-                        parallel_start_node_id=parallel_start_node_id,
-                        parent_parallel_id=parent_parallel_id,
-                        parent_parallel_start_node_id=parent_parallel_start_node_id,
-                        error=str(e),
-                    )
-                )
-            finally:
-                db.session.remove()
+                    branch.q.put(item)
+        except GraphRunFailedError as e:
+            self._fail_parallel_branch(branch, e.error)
+            return
+        except Exception as e:
+            logger.exception("Unknown Error when generating in parallel")
+            self._fail_parallel_branch(branch, str(e))
+            return
+
+        # trigger graph run success event
+        branch.q.put(
+            ParallelBranchRunSucceededEvent(
+                parallel_id=branch.parallel_id,
+                parallel_start_node_id=branch.parallel_start_node_id,
+                parent_parallel_id=branch.parent_parallel_id,
+                parent_parallel_start_node_id=branch.parent_parallel_start_node_id,
+            )
+        )
+        branch.join.branch_succeeded()
+
+    def _fan_out_parallel_branch(self, branch: "_ParallelBranch", fan_out: "_ParallelFanOut") -> None:
+        """
+        Start the branches of a parallel nested in branch, branch goes on from the node the nested parallel
+        ends to once they all succeeded.
+        """
+        parallel = self._get_parallel(fan_out.edge_mappings)
+        next_node_id = parallel.end_to_node_id
+        if next_node_id and self.graph.node_parallel_mapping.get(next_node_id) != branch.parallel_id:
+            # the nested parallel ends outside of the branch, so does the branch
+            next_node_id = None
+
+        self._start_parallel_branches(
+            parallel=parallel,
+            edge_mappings=fan_out.edge_mappings,
+            q=branch.q,
+            handle_exceptions=branch.handle_exceptions,
+            on_succeeded=lambda: self._run_parallel_branch(
+                branch=branch, start_node_id=next_node_id, previous_route_node_state=fan_out.previous_route_node_state
+            ),
+            parent_branch=branch,
+        )
+
+    def _fail_parallel_branch(self, branch: "_ParallelBranch", error: str) -> None:
+        branch.q.put(
+            ParallelBranchRunFailedEvent(
+                parallel_id=branch.parallel_id,
+                parallel_start_node_id=branch.parallel_start_node_id,
+                parent_parallel_id=branch.parent_parallel_id,
+                parent_parallel_start_node_id=branch.parent_parallel_start_node_id,
+                error=error,
+            )
+        )
+        branch.join.branch_failed(error)
 
     def _run_node(
         self,
@@ -865,11 +928,11 @@ class GraphEngine:
     def create_copy(self):
         """
         create a graph engine copy
-        :return: with a new variable pool instance of graph engine
+        :return: with a copy-on-write variable pool overlay of graph engine
         """
         new_instance = copy(self)
         new_instance.graph_runtime_state = copy(self.graph_runtime_state)
-        new_instance.graph_runtime_state.variable_pool = deepcopy(self.graph_runtime_state.variable_pool)
+        new_instance.graph_runtime_state.variable_pool = self.graph_runtime_state.variable_pool.fork()
         return new_instance
 
     def _handle_continue_on_error(
@@ -923,6 +986,76 @@ class GraphEngine:
         return error_result
 
 
+class _ParallelFanOut(GraphEngineEvent):
+    """
+    Yielded by the run of a branch reaching a nested parallel, never passed on to the consumer.
+    """
+
+    edge_mappings: list[GraphEdge]
+    previous_route_node_state: Optional[RouteNodeState] = None
+
+
+class _ParallelJoin:
+    """
+    Tracks the branches of a parallel run, on_succeeded runs once the last of them succeeded and on_failed
+    once on the first failed one.
+    """
+
+    def __init__(
+        self,
+        branch_count: int,
+        on_succeeded: Callable[[], None],
+        on_failed: Optional[Callable[[str], None]] = None,
+    ):
+        self._lock = threading.Lock()
+        self._pending_count = branch_count
+        self._failed = False
+        self._on_succeeded = on_succeeded
+        self._on_failed = on_failed
+
+    def branch_succeeded(self) -> None:
+        with self._lock:
+            self._pending_count -= 1
+            joined = self._pending_count == 0 and not self._failed
+        if joined:
+            self._on_succeeded()
+
+    def abandon(self) -> None:
+        with self._lock:
+            self._failed = True
+
+    def branch_failed(self, error: str) -> None:
+        with self._lock:
+            first_failure = not self._failed
+            self._failed = True
+        if first_failure and self._on_failed:
+            self._on_failed(error)
+
+
+class _ParallelBranch:
+    """
+    A branch of a parallel run, with the queue its events go to and the join it reports to.
+    """
+
+    def __init__(
+        self,
+        q: queue.Queue,
+        join: _ParallelJoin,
+        parallel_id: str,
+        parallel_start_node_id: str,
+        parent_parallel_id: Optional[str],
+        parent_parallel_start_node_id: Optional[str],
+        handle_exceptions: list[str],
+    ):
+        self.q = q
+        self.join = join
+        self.parallel_id = parallel_id
+        self.parallel_start_node_id = parallel_start_node_id
+        self.parent_parallel_id = parent_parallel_id
+        self.parent_parallel_start_node_id = parent_parallel_start_node_id
+        self.handle_exceptions = handle_exceptions
+
+
 class GraphRunFailedError(Exception):
     def __init__(self, error: str):
         self.error = error
@@ -4,7 +4,7 @@ import uuid
 from collections.abc import Generator, Mapping, Sequence
 from concurrent.futures import Future, wait
 from datetime import UTC, datetime
-from queue import Empty, Queue
+from queue import Queue
 from typing import TYPE_CHECKING, Any, Optional, cast
 
 from flask import Flask, current_app
@@ -190,26 +190,23 @@ class IterationNode(BaseNode[IterationNodeData]):
                     futures.append(future)
                 succeeded_count = 0
                 while True:
-                    try:
-                        event = q.get(timeout=1)
-                        if event is None:
-                            break
-                        if isinstance(event, IterationRunNextEvent):
-                            succeeded_count += 1
-                            if succeeded_count == len(futures):
-                                q.put(None)
-                        yield event
-                        if isinstance(event, RunCompletedEvent):
-                            q.put(None)
-                            for f in futures:
-                                if not f.done():
-                                    f.cancel()
-                            yield event
-                        if isinstance(event, IterationRunFailedEvent):
+                    event = q.get()
+                    if event is None:
+                        break
+                    if isinstance(event, IterationRunNextEvent):
+                        succeeded_count += 1
+                        if succeeded_count == len(futures):
                             q.put(None)
-                            yield event
-                    except Empty:
-                        continue
+                    yield event
+                    if isinstance(event, RunCompletedEvent):
+                        q.put(None)
+                        for f in futures:
+                            if not f.done():
+                                f.cancel()
+                        yield event
+                    if isinstance(event, IterationRunFailedEvent):
+                        q.put(None)
+                        yield event
 
                 # wait all threads
                 wait(futures)
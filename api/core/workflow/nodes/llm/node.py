@@ -11,6 +11,7 @@ from core.entities.provider_entities import QuotaUnit
 from core.errors.error import ModelCurrentlyNotSupportError, ProviderTokenNotInitError, QuotaExceededError
 from core.file import FileType, file_manager
 from core.helper.code_executor import CodeExecutor, CodeLanguage
+from core.helper.model_provider_cache import ProviderConfigurationsCache
 from core.memory.token_buffer_memory import TokenBufferMemory
 from core.model_manager import ModelInstance, ModelManager
 from core.model_runtime.entities import (
@@ -773,6 +774,8 @@ class LLMNode(BaseNode[LLMNodeData]):
                 }
             )
             db.session.commit()
+            # the remaining quota decides whether the hosted provider can still be used
+            ProviderConfigurationsCache(tenant_id=tenant_id).invalidate()
 
     @classmethod
     def _extract_variable_selector_to_variable_mapping(
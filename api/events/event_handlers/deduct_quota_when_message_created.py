@@ -3,6 +3,7 @@ from datetime import UTC, datetime
 from configs import dify_config
 from core.app.entities.app_invoke_entities import AgentChatAppGenerateEntity, ChatAppGenerateEntity
 from core.entities.provider_entities import QuotaUnit
+from core.helper.model_provider_cache import ProviderConfigurationsCache
 from core.plugin.entities.plugin import ModelProviderID
 from events.message_event import message_was_created
 from extensions.ext_database import db
@@ -63,3 +64,5 @@ def handle(sender, **kwargs):
             }
         )
         db.session.commit()
+        # the remaining quota decides whether the hosted provider can still be used
+        ProviderConfigurationsCache(tenant_id=application_generate_entity.app_config.tenant_id).invalidate()
@@ -65,3 +65,18 @@ def init_app(app: DifyApp):
             "connection_timeout": engine.pool.timeout(),  # type: ignore
             "recycle_time": db.engine.pool._recycle,  # type: ignore
         }
+
+    @app.route("/vector-client-stat")
+    def vector_client_stat():
+        from core.rag.datasource.vdb.vector_client_registry import get_vector_client_stats
+
+        return {
+            "pid": os.getpid(),
+            "clients": [stats.model_dump() for stats in get_vector_client_stats()],
+        }
+
+    @app.route("/plugin-daemon-pool-stat")
+    def plugin_daemon_pool_stat():
+        from core.plugin.utils.http_client import get_plugin_daemon_pool_metrics
+
+        return {"pid": os.getpid(), **get_plugin_daemon_pool_metrics().model_dump()}
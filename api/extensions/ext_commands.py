@@ -11,6 +11,7 @@ def init_app(app: DifyApp):
         fix_app_site_missing,
         install_plugins,
         migrate_data_for_plugin,
+        migrate_keyword_tables,
         reset_email,
         reset_encrypt_key_pair,
         reset_password,
@@ -29,6 +30,7 @@ def init_app(app: DifyApp):
         upgrade_db,
         fix_app_site_missing,
         migrate_data_for_plugin,
+        migrate_keyword_tables,
         extract_plugins,
         extract_unique_plugins,
         install_plugins,
@@ -0,0 +1,10 @@
+import threading
+
+from dify_app import DifyApp
+
+
+def init_app(app: DifyApp):
+    from core.model_runtime.model_providers.__base.tokenizers.local_tokenizer import LocalTokenizer
+
+    # loaded in the background, models count tokens remotely until their tokenizer is ready
+    threading.Thread(target=LocalTokenizer.preload, name="local_tokenizer_preload", daemon=True).start()
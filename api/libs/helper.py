@@ -18,6 +18,7 @@ from flask_restful import fields  # type: ignore
 from configs import dify_config
 from core.app.features.rate_limiting.rate_limit import RateLimitGenerator
 from core.file import helpers as file_helpers
+from core.helper import json_codec
 from extensions.ext_redis import redis_client
 
 if TYPE_CHECKING:
@@ -196,7 +197,7 @@ def generate_text_hash(text: str) -> str:
 
 def compact_generate_response(response: Union[Mapping, Generator, RateLimitGenerator]) -> Response:
     if isinstance(response, dict):
-        return Response(response=json.dumps(response), status=200, mimetype="application/json")
+        return Response(response=json_codec.dumps_bytes(response), status=200, mimetype="application/json")
     else:
 
         def generate() -> Generator:
@@ -14,6 +14,8 @@ from .dataset import (
     AppDatasetJoin,
     Dataset,
     DatasetCollectionBinding,
+    DatasetKeywordPosting,
+    DatasetKeywordStatistics,
     DatasetKeywordTable,
     DatasetPermission,
     DatasetPermissionEnum,
@@ -118,6 +120,8 @@ __all__ = [
     "DataSourceOauthBinding",
     "Dataset",
     "DatasetCollectionBinding",
+    "DatasetKeywordPosting",
+    "DatasetKeywordStatistics",
     "DatasetKeywordTable",
     "DatasetPermission",
     "DatasetPermissionEnum",
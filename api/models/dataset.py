@@ -11,11 +11,13 @@ import time
 from json import JSONDecodeError
 from typing import Any, cast
 
+import numpy as np
 from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped
 
 from configs import dify_config
+from core.rag.embedding.embedding_codec import decode_embedding, encode_embedding, is_encoded_embedding
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_storage import storage
 from services.entities.knowledge_entities.knowledge_entities import ParentMode, Rule
@@ -753,6 +755,35 @@ class DatasetKeywordTable(db.Model):  # type: ignore[name-defined]
                 return None
 
 
+class DatasetKeywordPosting(db.Model):  # type: ignore[name-defined]
+    __tablename__ = "dataset_keyword_postings"
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id", name="dataset_keyword_posting_pkey"),
+        db.UniqueConstraint("dataset_id", "keyword", "index_node_id", name="dataset_keyword_posting_unique_idx"),
+        db.Index("dataset_keyword_posting_node_idx", "dataset_id", "index_node_id"),
+    )
+
+    id = db.Column(StringUUID, primary_key=True, server_default=db.text("uuid_generate_v4()"))
+    dataset_id = db.Column(StringUUID, nullable=False)
+    keyword = db.Column(db.String(255), nullable=False)
+    index_node_id = db.Column(db.String(255), nullable=False)
+
+
+class DatasetKeywordStatistics(db.Model):  # type: ignore[name-defined]
+    __tablename__ = "dataset_keyword_statistics"
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id", name="dataset_keyword_statistics_pkey"),
+        db.UniqueConstraint("dataset_id", name="dataset_keyword_statistics_dataset_id_key"),
+    )
+
+    id = db.Column(StringUUID, primary_key=True, server_default=db.text("uuid_generate_v4()"))
+    dataset_id = db.Column(StringUUID, nullable=False)
+    # number of index nodes with keywords and number of (keyword, index node) postings of the dataset
+    segment_count = db.Column(db.Integer, nullable=False, server_default=db.text("0"))
+    keyword_count = db.Column(db.Integer, nullable=False, server_default=db.text("0"))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+
 class Embedding(db.Model):  # type: ignore[name-defined]
     __tablename__ = "embeddings"
     __table_args__ = (
@@ -771,10 +802,16 @@ class Embedding(db.Model):  # type: ignore[name-defined]
     provider_name = db.Column(db.String(255), nullable=False, server_default=db.text("''::character varying"))
 
     def set_embedding(self, embedding_data: list[float]):
-        self.embedding = pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+        self.embedding = encode_embedding(embedding_data)
 
     def get_embedding(self) -> list[float]:
-        return cast(list[float], pickle.loads(self.embedding))
+        return cast(list[float], self.get_embedding_array().tolist())
+
+    def get_embedding_array(self) -> np.ndarray:
+        if is_encoded_embedding(self.embedding):
+            return decode_embedding(self.embedding)
+        # rows written before the binary codec hold a pickled list of floats
+        return np.asarray(pickle.loads(self.embedding), dtype=np.float32)
 
 
 class DatasetCollectionBinding(db.Model):  # type: ignore[name-defined]
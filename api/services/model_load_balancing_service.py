@@ -7,7 +7,11 @@ from typing import Optional, Union
 from constants import HIDDEN_VALUE
 from core.entities.provider_configuration import ProviderConfiguration
 from core.helper import encrypter
-from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.model_provider_cache import (
+    ProviderConfigurationsCache,
+    ProviderCredentialsCache,
+    ProviderCredentialsCacheType,
+)
 from core.model_manager import LBModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
@@ -276,6 +280,7 @@ class ModelLoadBalancingService:
         )
         db.session.add(inherit_config)
         db.session.commit()
+        ProviderConfigurationsCache(tenant_id=tenant_id).invalidate()
 
         return inherit_config
 
@@ -422,6 +427,8 @@ class ModelLoadBalancingService:
 
             self._clear_credentials_cache(tenant_id, config_id)
 
+        ProviderConfigurationsCache(tenant_id=tenant_id).invalidate()
+
     def validate_load_balancing_credentials(
         self,
         tenant_id: str,
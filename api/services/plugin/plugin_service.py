@@ -6,6 +6,7 @@ from configs import dify_config
 from core.helper import marketplace
 from core.helper.download import download_with_size_limit
 from core.helper.marketplace import download_plugin_pkg
+from core.helper.model_provider_cache import PluginModelProvidersCache
 from core.plugin.entities.bundle import PluginBundleDependency
 from core.plugin.entities.plugin import (
     GenericProviderID,
@@ -14,7 +15,7 @@ from core.plugin.entities.plugin import (
     PluginInstallation,
     PluginInstallationSource,
 )
-from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginUploadResponse
+from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginInstallTaskStatus, PluginUploadResponse
 from core.plugin.manager.asset import PluginAssetManager
 from core.plugin.manager.debugging import PluginDebuggingManager
 from core.plugin.manager.plugin import PluginInstallationManager
@@ -101,7 +102,12 @@ class PluginService:
     @staticmethod
     def fetch_install_task(tenant_id: str, task_id: str) -> PluginInstallTask:
         manager = PluginInstallationManager()
-        return manager.fetch_plugin_installation_task(tenant_id, task_id)
+        task = manager.fetch_plugin_installation_task(tenant_id, task_id)
+        if task.status == PluginInstallTaskStatus.Success:
+            # plugins are installed by the daemon in the background, their model providers show up once it is done,
+            # the task is polled until then and may still be polled after
+            PluginModelProvidersCache(tenant_id).invalidate_once(f"install_task:{task_id}")
+        return task
 
     @staticmethod
     def delete_install_task(tenant_id: str, task_id: str) -> bool:
@@ -151,7 +157,7 @@ class PluginService:
             pkg = download_plugin_pkg(new_plugin_unique_identifier)
             manager.upload_pkg(tenant_id, pkg, verify_signature=False)
 
-        return manager.upgrade_plugin(
+        response = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -160,6 +166,8 @@ class PluginService:
                 "plugin_unique_identifier": new_plugin_unique_identifier,
             },
         )
+        PluginModelProvidersCache(tenant_id).invalidate()
+        return response
 
     @staticmethod
     def upgrade_plugin_with_github(
@@ -174,7 +182,7 @@ class PluginService:
         Upgrade plugin with github
         """
         manager = PluginInstallationManager()
-        return manager.upgrade_plugin(
+        response = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -185,6 +193,8 @@ class PluginService:
                 "package": package,
             },
         )
+        PluginModelProvidersCache(tenant_id).invalidate()
+        return response
 
     @staticmethod
     def upload_pkg(tenant_id: str, pkg: bytes, verify_signature: bool = False) -> PluginUploadResponse:
@@ -228,12 +238,14 @@ class PluginService:
     @staticmethod
     def install_from_local_pkg(tenant_id: str, plugin_unique_identifiers: Sequence[str]):
         manager = PluginInstallationManager()
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Package,
             [{}],
         )
+        PluginModelProvidersCache(tenant_id).invalidate()
+        return response
 
     @staticmethod
     def install_from_github(tenant_id: str, plugin_unique_identifier: str, repo: str, version: str, package: str):
@@ -242,7 +254,7 @@ class PluginService:
         returns plugin_unique_identifier
         """
         manager = PluginInstallationManager()
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             [plugin_unique_identifier],
             PluginInstallationSource.Github,
@@ -254,6 +266,8 @@ class PluginService:
                 }
             ],
         )
+        PluginModelProvidersCache(tenant_id).invalidate()
+        return response
 
     @staticmethod
     def install_from_marketplace_pkg(
@@ -275,7 +289,7 @@ class PluginService:
                 pkg = download_plugin_pkg(plugin_unique_identifier)
                 manager.upload_pkg(tenant_id, pkg, verify_signature)
 
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Marketplace,
@@ -286,11 +300,15 @@ class PluginService:
                 for plugin_unique_identifier in plugin_unique_identifiers
             ],
         )
+        PluginModelProvidersCache(tenant_id).invalidate()
+        return response
 
     @staticmethod
     def uninstall(tenant_id: str, plugin_installation_id: str) -> bool:
         manager = PluginInstallationManager()
-        return manager.uninstall(tenant_id, plugin_installation_id)
+        result = manager.uninstall(tenant_id, plugin_installation_id)
+        PluginModelProvidersCache(tenant_id).invalidate()
+        return result
 
     @staticmethod
     def check_tools_existence(tenant_id: str, provider_ids: Sequence[GenericProviderID]) -> Sequence[bool]:
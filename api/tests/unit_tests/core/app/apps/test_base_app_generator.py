@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from core.app.app_config.entities import VariableEntity, VariableEntityType
@@ -50,3 +52,30 @@ def test_validate_input_with_none_for_required_variable():
             )
 
         assert str(exc_info.value) == "test_var is required in input form"
+
+
+def test_convert_to_event_stream_renders_chunks_like_full_events():
+    envelope = {"conversation_id": "c", "message_id": "m", "created_at": 1700000000, "task_id": "t", "id": "m"}
+    messages = [
+        {"event": "message", **envelope, "answer": "Hel", "from_variable_selector": None},
+        {"event": "message", **envelope, "answer": 'lo "world"', "from_variable_selector": None},
+        "ping",
+        {"event": "message", **envelope, "answer": "\x00chunk\x00", "from_variable_selector": None},
+        {"event": "message", **envelope, "message_id": "other", "answer": "!", "from_variable_selector": None},
+        {
+            "event": "text_chunk",
+            "workflow_run_id": "w",
+            "task_id": "t",
+            "data": {"text": "你好", "from_variable_selector": ["a"]},
+        },
+        {"event": "message_end", **envelope, "metadata": {}},
+    ]
+
+    events = list(BaseAppGenerator.convert_to_event_stream(iter(messages)))
+
+    assert events[2] == "event: ping\n\n"
+    for message, event in zip(messages, events):
+        if isinstance(message, dict):
+            assert event.startswith("data: ")
+            assert event.endswith("\n\n")
+            assert json.loads(event[len("data: ") :]) == message
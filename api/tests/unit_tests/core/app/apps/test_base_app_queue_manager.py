@@ -0,0 +1,91 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.app.apps import base_app_queue_manager
+from core.app.apps.base_app_queue_manager import PublishFrom
+from core.app.apps.workflow.app_queue_manager import WorkflowAppQueueManager
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.entities.queue_entities import (
+    QueueLLMChunkEvent,
+    QueuePingEvent,
+    QueueStopEvent,
+    QueueTextChunkEvent,
+    QueueWorkflowSucceededEvent,
+)
+from core.model_runtime.entities.llm_entities import LLMResultChunk, LLMResultChunkDelta
+from core.model_runtime.entities.message_entities import AssistantPromptMessage, UserPromptMessage
+
+
+@pytest.fixture
+def queue_manager():
+    redis_client = MagicMock()
+    redis_client.get.return_value = None
+    stop_listener = MagicMock()
+    stop_listener.register.side_effect = lambda task_id: threading.Event()
+    stop_listener.is_listening.return_value = True
+    with (
+        patch("core.app.apps.base_app_queue_manager.redis_client", new=redis_client),
+        patch("core.app.apps.base_app_queue_manager._stop_listener", new=stop_listener),
+    ):
+        yield WorkflowAppQueueManager(
+            task_id="task", user_id="user", invoke_from=InvokeFrom.WEB_APP, app_mode="workflow"
+        )
+
+
+def _llm_chunk(text: str, index: int) -> QueueLLMChunkEvent:
+    return QueueLLMChunkEvent(
+        chunk=LLMResultChunk(
+            model="gpt-4o",
+            prompt_messages=[UserPromptMessage(content="hi")],
+            delta=LLMResultChunkDelta(index=index, message=AssistantPromptMessage(content=text)),
+        )
+    )
+
+
+def test_publish_skips_model_check_for_chunk_events(queue_manager):
+    with patch.object(queue_manager, "_check_for_sqlalchemy_models") as check:
+        queue_manager.publish(QueueTextChunkEvent(text="a"), PublishFrom.APPLICATION_MANAGER)
+        queue_manager.publish(_llm_chunk("a", 0), PublishFrom.APPLICATION_MANAGER)
+        check.assert_not_called()
+
+        queue_manager.publish(QueuePingEvent(), PublishFrom.APPLICATION_MANAGER)
+        check.assert_called_once()
+
+
+def test_listen_coalesces_queued_chunks(queue_manager):
+    for text in ["Hel", "lo", " wor"]:
+        queue_manager.publish(QueueTextChunkEvent(text=text), PublishFrom.APPLICATION_MANAGER)
+    queue_manager.publish(QueueTextChunkEvent(text="x", in_iteration_id="it"), PublishFrom.APPLICATION_MANAGER)
+    queue_manager.publish(QueuePingEvent(), PublishFrom.TASK_PIPELINE)
+    queue_manager.publish(QueueTextChunkEvent(text="ld"), PublishFrom.APPLICATION_MANAGER)
+    queue_manager.publish(QueueWorkflowSucceededEvent(outputs={}), PublishFrom.APPLICATION_MANAGER)
+
+    events = [message.event for message in queue_manager.listen()]
+
+    assert [event.text for event in events if isinstance(event, QueueTextChunkEvent)] == ["Hello wor", "x", "ld"]
+    assert isinstance(events[2], QueuePingEvent)
+    assert isinstance(events[-1], QueueWorkflowSucceededEvent)
+
+
+def test_listen_coalesces_llm_chunks(queue_manager):
+    for index, text in enumerate(["a", "b", "c"]):
+        queue_manager.publish(_llm_chunk(text, index), PublishFrom.APPLICATION_MANAGER)
+    queue_manager.stop_listen()
+
+    events = [message.event for message in queue_manager.listen()]
+
+    assert len(events) == 1
+    assert events[0].chunk.delta.message.content == "abc"
+    assert events[0].chunk.delta.index == 2
+
+
+def test_listen_stops_on_stop_signal_without_polling(queue_manager):
+    queue_manager.publish(QueueTextChunkEvent(text="a"), PublishFrom.APPLICATION_MANAGER)
+    queue_manager._stop_event.set()
+
+    events = [message.event for message in queue_manager.listen()]
+
+    assert isinstance(events[-1], QueueStopEvent)
+    base_app_queue_manager.redis_client.get.assert_not_called()
@@ -0,0 +1,73 @@
+import queue
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.app.apps.task_stop_listener import STOP_CHANNEL, TaskStopListener
+
+
+class _FakePubSub:
+    def __init__(self, messages: queue.Queue):
+        self._messages = messages
+        self.channels: list[str] = []
+
+    def subscribe(self, channel: str) -> None:
+        self.channels.append(channel)
+
+    def get_message(self, timeout: float):
+        try:
+            return self._messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def redis_client():
+    messages: queue.Queue = queue.Queue()
+    flags: dict[str, int] = {}
+    client = MagicMock()
+    client.pubsub.side_effect = lambda **kwargs: _FakePubSub(messages)
+    client.get.side_effect = flags.get
+    client.messages = messages
+    client.flags = flags
+    with patch("core.app.apps.task_stop_listener.redis_client", new=client):
+        yield client
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_stop_request_is_delivered_to_registered_task(redis_client):
+    listener = TaskStopListener(lambda task_id: f"stopped:{task_id}")
+    running = listener.register("task-1")
+    other = listener.register("task-2")
+    assert _wait_for(listener.is_listening)
+    reads = redis_client.get.call_count
+
+    redis_client.messages.put({"type": "message", "channel": STOP_CHANNEL, "data": b"task-1"})
+
+    assert running.wait(5)
+    assert not other.is_set()
+    # nothing is polled while the subscription is up
+    assert redis_client.get.call_count == reads
+
+
+def test_stop_flags_set_before_subscribing_are_picked_up(redis_client):
+    redis_client.flags["stopped:task-1"] = 1
+    listener = TaskStopListener(lambda task_id: f"stopped:{task_id}")
+
+    stop_event = listener.register("task-1")
+
+    assert stop_event.wait(5)
+    listener.unregister("task-1")
+    assert "task-1" not in listener._events
@@ -0,0 +1,130 @@
+import threading
+import time
+import uuid
+
+import pytest
+from flask import Flask
+
+from core.app.task_pipeline.workflow_node_execution_writer import (
+    WorkflowNodeExecutionWriter,
+    get_workflow_node_execution_writer_metrics,
+)
+from extensions.ext_database import db
+from models.workflow import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+
+
+class _RecordingWriter(WorkflowNodeExecutionWriter):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.batches: list[list[dict]] = []
+        self.fail = False
+        self.written = threading.Event()
+
+    def _write(self, rows):
+        if not rows:
+            return
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.batches.append(rows)
+        with self._condition:
+            self._flushed_rows += len(rows)
+            self._flush_count += 1
+        self.written.set()
+
+
+def _execution(id: str, status: WorkflowNodeExecutionStatus) -> WorkflowNodeExecution:
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = id
+    workflow_node_execution.status = status.value
+    return workflow_node_execution
+
+
+def test_save_coalesces_states_of_one_execution():
+    writer = _RecordingWriter(flush_interval=60, batch_size=100)
+    execution = _execution("node-1", WorkflowNodeExecutionStatus.RUNNING)
+    writer.save(execution)
+    execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+    execution.outputs = "{}"
+    writer.save(execution)
+    writer.save(_execution("node-2", WorkflowNodeExecutionStatus.RUNNING))
+
+    assert writer.queue_depth == 2
+    writer.flush()
+
+    assert writer.queue_depth == 0
+    assert len(writer.batches) == 1
+    rows = {row["id"]: row for row in writer.batches[0]}
+    assert rows["node-1"] == {"id": "node-1", "status": "succeeded", "outputs": "{}"}
+    assert rows["node-2"] == {"id": "node-2", "status": "running"}
+    assert writer.get_metrics().flushed_rows == 2
+
+
+def test_full_batch_is_written_in_background():
+    writer = _RecordingWriter(flush_interval=60, batch_size=2)
+    writer.save(_execution("node-1", WorkflowNodeExecutionStatus.RUNNING))
+    writer.save(_execution("node-2", WorkflowNodeExecutionStatus.RUNNING))
+
+    assert writer.written.wait(5)
+    assert [row["id"] for row in writer.batches[0]] == ["node-1", "node-2"]
+
+
+def test_flush_raises_and_background_failures_are_requeued():
+    writer = _RecordingWriter(flush_interval=60, batch_size=100)
+    writer.fail = True
+    writer.save(_execution("node-1", WorkflowNodeExecutionStatus.RUNNING))
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    writer.save(_execution("node-1", WorkflowNodeExecutionStatus.RUNNING))
+    writer._requeue(writer._take())
+    assert list(writer._pending) == ["node-1"]
+    assert writer._attempts == {"node-1": 1}
+
+    writer.fail = False
+    writer.flush()
+    assert writer.batches[0][0]["id"] == "node-1"
+    assert get_workflow_node_execution_writer_metrics().flushed_rows >= 1
+
+
+@pytest.fixture
+def database_app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        WorkflowNodeExecution.__table__.create(db.engine)
+        yield app
+
+
+def _stored_execution(status: WorkflowNodeExecutionStatus) -> WorkflowNodeExecution:
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = uuid.uuid4()
+    workflow_node_execution.tenant_id = uuid.uuid4()
+    workflow_node_execution.app_id = uuid.uuid4()
+    workflow_node_execution.workflow_id = uuid.uuid4()
+    workflow_node_execution.triggered_from = "workflow-run"
+    workflow_node_execution.index = 1
+    workflow_node_execution.node_id = "llm"
+    workflow_node_execution.node_type = "llm"
+    workflow_node_execution.title = "LLM"
+    workflow_node_execution.status = status.value
+    workflow_node_execution.created_by_role = "account"
+    workflow_node_execution.created_by = uuid.uuid4()
+    return workflow_node_execution
+
+
+def test_background_thread_writes_to_database(database_app):
+    writer = WorkflowNodeExecutionWriter(flush_interval=0.05, batch_size=100)
+    execution = _stored_execution(WorkflowNodeExecutionStatus.RUNNING)
+    writer.save(execution)
+    execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+    writer.save(execution)
+
+    deadline = time.monotonic() + 5
+    while writer.get_metrics().flushed_rows == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    metrics = writer.get_metrics()
+    assert metrics.flushed_rows == 1
+    assert metrics.dropped_rows == 0
+    assert db.session.execute(db.text("SELECT status FROM workflow_node_executions")).scalars().all() == ["succeeded"]
@@ -0,0 +1,135 @@
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from pydantic import BaseModel
+
+from core.helper import json_codec
+from core.model_runtime.utils.encoders import jsonable_encoder
+from core.variables import ArrayStringSegment, StringSegment
+from core.workflow.entities.node_entities import NodeRunMetadataKey
+from core.workflow.nodes.enums import NodeType
+from models.workflow import WorkflowNodeExecutionStatus
+
+BACKENDS = [json_codec.StdlibJSONBackend(), json_codec.OrjsonBackend()]
+
+
+class _NodeResult(BaseModel):
+    text: str
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda backend: backend.name)
+def backend(request):
+    with patch.object(json_codec, "_backend", request.param):
+        yield request.param
+
+
+def _llm_outputs() -> dict:
+    """
+    Outputs of an LLM node with a long answer, the bulk of what a workflow run stores and streams.
+    """
+    return {
+        "text": "Dify is an open-source LLM app development platform. " * 400,
+        "usage": {
+            "prompt_tokens": 1024,
+            "completion_tokens": 4096,
+            "total_tokens": 5120,
+            "total_price": Decimal("0.0123"),
+            "currency": "USD",
+            "latency": 12.5,
+        },
+        "finish_reason": "stop",
+    }
+
+
+def _http_outputs() -> dict:
+    """
+    Outputs of an HTTP request node returning a JSON document with many records.
+    """
+    return {
+        "status_code": 200,
+        "headers": {"content-type": "application/json"},
+        "body": json.dumps([{"id": i, "name": f"record {i}", "tags": ["a", "b", "c"]} for i in range(2000)]),
+        "files": [],
+    }
+
+
+def _execution_metadata() -> dict:
+    return {
+        NodeRunMetadataKey.TOTAL_TOKENS: 5120,
+        NodeRunMetadataKey.TOTAL_PRICE: Decimal("0.0123"),
+        NodeRunMetadataKey.CURRENCY: "USD",
+        NodeRunMetadataKey.ITERATION_ID: str(uuid.uuid4()),
+    }
+
+
+def _stream_chunk() -> dict:
+    return {
+        "event": "node_finished",
+        "task_id": str(uuid.uuid4()),
+        "workflow_run_id": str(uuid.uuid4()),
+        "data": {
+            "id": str(uuid.uuid4()),
+            "node_type": NodeType.LLM,
+            "status": WorkflowNodeExecutionStatus.SUCCEEDED,
+            "outputs": _llm_outputs(),
+            "created_at": 1700000000,
+        },
+    }
+
+
+def test_dumps_handles_common_types(backend):
+    node_execution_id = uuid.uuid4()
+    data = json.loads(
+        json_codec.dumps(
+            {
+                "id": node_execution_id,
+                "created_at": datetime(2024, 1, 2, 3, 4, 5),
+                "status": WorkflowNodeExecutionStatus.SUCCEEDED,
+                "answer": StringSegment(value="你好"),
+                "files": ArrayStringSegment(value=["a", "b"]),
+                "tags": {"x"},
+                NodeRunMetadataKey.TOTAL_TOKENS: 10,
+            }
+        )
+    )
+
+    assert data == {
+        "id": str(node_execution_id),
+        "created_at": "2024-01-02T03:04:05",
+        "status": "succeeded",
+        "answer": "你好",
+        "files": ["a", "b"],
+        "tags": ["x"],
+        "total_tokens": 10,
+    }
+
+
+def test_dumps_matches_the_previous_encoding(backend):
+    for payload in (_llm_outputs(), _http_outputs(), _execution_metadata()):
+        assert json.loads(json_codec.dumps(payload)) == json.loads(json.dumps(jsonable_encoder(payload)))
+
+
+def test_dumps_keeps_non_ascii_and_big_integers(backend):
+    assert json_codec.dumps({"text": "héllo"}) in ('{"text":"héllo"}', '{"text": "héllo"}')
+    assert json_codec.loads(json_codec.dumps({"n": 2**70})) == {"n": 2**70}
+
+
+def test_dumps_bytes_serializes_models_directly():
+    segment = StringSegment(value="hello")
+    assert json_codec.dumps_bytes(segment) == b'"hello"'
+    assert json.loads(json_codec.dumps_bytes(_NodeResult(text="hi"))) == {"text": "hi"}
+
+
+@pytest.mark.parametrize(
+    "payload_factory",
+    [_llm_outputs, _http_outputs, _execution_metadata, _stream_chunk],
+    ids=["llm_outputs", "http_outputs", "execution_metadata", "stream_chunk"],
+)
+def test_dumps_benchmark(backend, payload_factory, benchmark):
+    payload = payload_factory()
+    result = benchmark(json_codec.dumps, payload)
+    assert json.loads(result)
@@ -1,9 +1,19 @@
+import asyncio
 import random
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 
-from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, make_request
+from core.helper import ssrf_proxy
+from core.helper.ssrf_proxy import (
+    SSRF_DEFAULT_MAX_RETRIES,
+    STATUS_FORCELIST,
+    get_async_client,
+    get_client,
+    make_request,
+    make_request_async,
+)
 
 
 @patch("httpx.Client.request")
@@ -50,3 +60,55 @@ def test_retry_logic_success(mock_request):
     assert response.status_code == 200
     assert mock_request.call_count == SSRF_DEFAULT_MAX_RETRIES + 1
     assert mock_request.call_args_list[0][1].get("method") == "GET"
+
+
+@patch("httpx.Client.request")
+def test_client_is_reused_across_requests(mock_request):
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_request.return_value = mock_response
+
+    with patch.object(ssrf_proxy, "_clients", {}):
+        make_request("GET", "http://example.com")
+        make_request("GET", "http://example.com")
+        assert len(ssrf_proxy._clients) == 1
+        assert get_client() is get_client()
+
+
+def test_client_is_cached_per_proxy_configuration():
+    with patch.object(ssrf_proxy, "_clients", {}):
+        with patch.object(ssrf_proxy.dify_config, "SSRF_PROXY_ALL_URL", None):
+            direct_client = get_client()
+        with patch.object(ssrf_proxy.dify_config, "SSRF_PROXY_ALL_URL", "http://proxy:3128"):
+            proxied_client = get_client()
+        assert direct_client is not proxied_client
+        assert len(ssrf_proxy._clients) == 2
+
+
+def test_client_does_not_keep_response_cookies():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Set-Cookie": "session=secret; Path=/"})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler), cookies=ssrf_proxy._client_kwargs()["cookies"])
+    client.get("http://example.com")
+    assert not client.cookies
+
+
+def test_async_request_retries_and_reuses_client():
+    mock_response_500 = MagicMock()
+    mock_response_500.status_code = 500
+    mock_response_200 = MagicMock()
+    mock_response_200.status_code = 200
+
+    async def run():
+        with (
+            patch("httpx.AsyncClient.request", new_callable=AsyncMock) as mock_request,
+            patch("asyncio.sleep", new_callable=AsyncMock),
+        ):
+            mock_request.side_effect = [mock_response_500, mock_response_200]
+            response = await make_request_async("GET", "http://example.com", max_retries=1)
+            assert response.status_code == 200
+            assert mock_request.call_count == 2
+            assert get_async_client() is get_async_client()
+
+    asyncio.run(run())
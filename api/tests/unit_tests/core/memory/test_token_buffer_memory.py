@@ -0,0 +1,178 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from constants import UUID_NIL
+from core.memory import token_buffer_memory
+from core.memory.token_buffer_memory import TokenBufferMemory
+from core.model_runtime.entities import AssistantPromptMessage, TextPromptMessageContent, UserPromptMessage
+from models.model import Conversation
+
+
+def _history(count: int) -> list[SimpleNamespace]:
+    """
+    A linear thread of messages ordered newest first, each query and answer is three words long.
+    """
+    messages = []
+    for i in range(count):
+        messages.append(
+            SimpleNamespace(
+                id=f"message-{i}",
+                query=f"question number {i}",
+                answer=f"answer number {i}",
+                workflow_run_id=None,
+                parent_message_id=f"message-{i - 1}" if i else UUID_NIL,
+            )
+        )
+    return list(reversed(messages))
+
+
+def _memory() -> TokenBufferMemory:
+    model_instance = MagicMock()
+    model_instance.get_llm_num_tokens.side_effect = lambda prompt_messages: sum(
+        len(prompt_message.content.split()) for prompt_message in prompt_messages
+    )
+    return TokenBufferMemory(conversation=Conversation(), model_instance=model_instance)
+
+
+def _contents(prompt_messages) -> list[str]:
+    return [prompt_message.content for prompt_message in prompt_messages]
+
+
+def test_history_within_budget_is_kept():
+    memory = _memory()
+
+    with patch.object(TokenBufferMemory, "_iter_messages", return_value=iter(_history(3))):
+        prompt_messages = memory.get_history_prompt_messages(max_token_limit=2000)
+
+    assert _contents(prompt_messages) == [
+        "question number 0",
+        "answer number 0",
+        "question number 1",
+        "answer number 1",
+        "question number 2",
+        "answer number 2",
+    ]
+    assert isinstance(prompt_messages[0], UserPromptMessage)
+    assert isinstance(prompt_messages[1], AssistantPromptMessage)
+
+
+def test_history_is_cut_at_the_token_budget():
+    memory = _memory()
+    history = _history(100)
+
+    with patch.object(TokenBufferMemory, "_iter_messages", return_value=iter(history)) as mock_iter:
+        prompt_messages = memory.get_history_prompt_messages(max_token_limit=10)
+
+    # the oldest kept message may be an answer, exactly like dropping messages one by one from the front
+    assert _contents(prompt_messages) == ["answer number 98", "question number 99", "answer number 99"]
+    # the first page is already over the budget, older pages are not read
+    assert next(mock_iter.return_value).id == "message-49"
+    # one count of the page, then a bisection of its 100 prompt messages
+    assert memory.model_instance.get_llm_num_tokens.call_count <= 1 + 7
+
+
+def test_history_within_budget_is_counted_once_as_a_whole():
+    memory = _memory()
+    # every request has a fixed overhead, summing per message counts would count it once per message
+    memory.model_instance.get_llm_num_tokens.side_effect = lambda prompt_messages: 3 + sum(
+        len(prompt_message.content.split()) for prompt_message in prompt_messages
+    )
+
+    with patch.object(TokenBufferMemory, "_iter_messages", return_value=iter(_history(3))):
+        prompt_messages = memory.get_history_prompt_messages(max_token_limit=21)
+
+    assert len(prompt_messages) == 6
+    memory.model_instance.get_llm_num_tokens.assert_called_once()
+
+
+def test_pruned_history_matches_dropping_messages_one_by_one():
+    history = _history(30)
+    for i, message in enumerate(history):
+        message.answer = " ".join(["word"] * (i % 7 + 1))
+
+    for max_token_limit in (1, 5, 17, 40, 93, 150):
+        memory = _memory()
+        with patch.object(TokenBufferMemory, "_iter_messages", return_value=iter(list(history))):
+            prompt_messages = memory.get_history_prompt_messages(max_token_limit=max_token_limit)
+
+        expected = [message for m in reversed(history) for message in memory._build_prompt_messages(m)]
+        count = memory.model_instance.get_llm_num_tokens.side_effect
+        while count(expected) > max_token_limit and len(expected) > 1:
+            expected.pop(0)
+        assert _contents(prompt_messages) == _contents(expected)
+
+
+def test_latest_message_without_answer_is_skipped():
+    history = _history(2)
+    history[0].answer = ""
+
+    with patch.object(TokenBufferMemory, "_iter_messages", return_value=iter(history)):
+        prompt_messages = _memory().get_history_prompt_messages(max_token_limit=2)
+
+    # a single message over the budget is still kept
+    assert _contents(prompt_messages) == ["answer number 0"]
+
+
+@patch.object(token_buffer_memory, "db")
+def test_iter_messages_fetches_pages_lazily(mock_db):
+    history = _history(120)
+    query = mock_db.session.query.return_value.filter.return_value.order_by.return_value
+    query.offset.side_effect = lambda offset: SimpleNamespace(
+        limit=lambda limit: SimpleNamespace(all=lambda: history[offset : offset + limit])
+    )
+    memory = _memory()
+
+    messages = memory._iter_messages(500)
+    assert [next(messages).id for _ in range(3)] == ["message-119", "message-118", "message-117"]
+    assert query.offset.call_count == 1
+
+    assert len(list(memory._iter_messages(500))) == 120
+    assert len(list(memory._iter_messages(60))) == 60
+
+
+@patch.object(token_buffer_memory, "file_manager")
+@patch.object(token_buffer_memory, "file_factory")
+@patch.object(token_buffer_memory, "FileUploadConfigManager")
+@patch.object(token_buffer_memory, "db")
+def test_message_files_and_upload_config_are_loaded_once(
+    mock_db, mock_config_manager, mock_file_factory, mock_file_manager
+):
+    history = _history(4)
+    for message in history:
+        message.workflow_run_id = f"run-{message.id}"
+    files = [SimpleNamespace(message_id=message.id) for message in history]
+    workflow = SimpleNamespace(features_dict={"file_upload": {}})
+
+    def query(*entities):
+        result = MagicMock()
+        if entities[0] is token_buffer_memory.MessageFile:
+            result.filter.return_value.all.return_value = files
+        elif entities[0] is token_buffer_memory.WorkflowRun.id:
+            result.filter.return_value.all.return_value = [
+                SimpleNamespace(id=message.workflow_run_id, workflow_id="workflow-1") for message in history
+            ]
+        elif entities[0] is token_buffer_memory.Workflow:
+            result.filter.return_value.first.return_value = workflow
+        else:
+            result.filter.return_value.order_by.return_value.offset.return_value.limit.return_value.all.return_value = (
+                history
+            )
+        return result
+
+    mock_db.session.query.side_effect = query
+    mock_config_manager.convert.return_value = MagicMock(image_config=None)
+    mock_file_factory.build_from_message_files.side_effect = lambda message_files, **kwargs: message_files
+    mock_file_manager.to_prompt_message_content.return_value = TextPromptMessageContent(data="[file]")
+    memory = _memory()
+    memory.conversation.mode = "advanced-chat"
+    memory.model_instance.get_llm_num_tokens.side_effect = lambda prompt_messages: 1
+
+    with patch.object(TokenBufferMemory, "_app_record", SimpleNamespace(tenant_id="tenant")):
+        prompt_messages = memory.get_history_prompt_messages(max_token_limit=2000)
+
+    assert len(prompt_messages) == 8
+    queried = [call.args[0] for call in mock_db.session.query.call_args_list]
+    assert queried.count(token_buffer_memory.MessageFile) == 1
+    assert queried.count(token_buffer_memory.WorkflowRun.id) == 1
+    assert queried.count(token_buffer_memory.Workflow) == 1
+    mock_config_manager.convert.assert_called_once_with(workflow.features_dict, is_vision=False)
@@ -0,0 +1,129 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.model_runtime.entities.message_entities import (
+    ImagePromptMessageContent,
+    SystemPromptMessage,
+    TextPromptMessageContent,
+    UserPromptMessage,
+)
+from core.model_runtime.model_providers.__base.large_language_model import LargeLanguageModel
+from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
+from core.model_runtime.model_providers.__base.tokenizers import local_tokenizer
+from core.model_runtime.model_providers.__base.tokenizers.local_tokenizer import (
+    TOKENS_PER_MESSAGE,
+    TOKENS_PER_REPLY,
+    LocalTokenizer,
+)
+
+DEFAULT_FAMILIES = list(LocalTokenizer._families)
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+@pytest.fixture(autouse=True)
+def tokenizer_registry():
+    with (
+        patch.object(LocalTokenizer, "_families", [("langgenius/test/test", "word-model", "words")]),
+        patch.object(LocalTokenizer, "_loaders", {"words": lambda: _count_words}),
+        patch.object(LocalTokenizer, "_encoders", {}),
+        patch.object(LocalTokenizer, "_unavailable", set()),
+        patch.object(local_tokenizer, "_token_count_cache", local_tokenizer.LRUCache(100)),
+    ):
+        LocalTokenizer.preload()
+        yield
+
+
+def _model(model_class):
+    return model_class.model_construct(tenant_id="tenant", plugin_id="langgenius/test", provider_name="test")
+
+
+def test_get_encoding_name_matches_longest_prefix_of_the_provider():
+    LocalTokenizer.register("test", "word-model-large", "large-words", loader=lambda: _count_words)
+
+    assert LocalTokenizer.get_encoding_name("test", "word-model-small") == "words"
+    assert LocalTokenizer.get_encoding_name("langgenius/test/test", "Word-Model") == "words"
+    assert LocalTokenizer.get_encoding_name("test", "word-model-large-2") == "large-words"
+    assert LocalTokenizer.get_encoding_name("test", "unknown") is None
+    assert LocalTokenizer.get_encoding_name("other", "word-model") is None
+    assert LocalTokenizer.get_encoding_name("test", "vendor/word-model") is None
+
+
+def test_default_families_are_limited_to_openai_providers():
+    with patch.object(LocalTokenizer, "_families", DEFAULT_FAMILIES):
+        assert LocalTokenizer.get_encoding_name("langgenius/openai/openai", "gpt-4o-mini") == "o200k_base"
+        assert LocalTokenizer.get_encoding_name("azure_openai", "gpt-35-turbo") == "cl100k_base"
+        assert LocalTokenizer.get_encoding_name("langgenius/ollama/ollama", "gpt-4o") is None
+        assert LocalTokenizer.get_encoding_name("someone/openai-compatible/openai_api_compatible", "o3") is None
+
+
+def test_tokenizers_are_only_loaded_by_preload():
+    loader = MagicMock(return_value=_count_words)
+    LocalTokenizer.register("test", "lazy-model", "lazy-words", loader=loader)
+
+    # the request path counts remotely instead of loading the tokenizer
+    assert LocalTokenizer.get_num_tokens("test", "lazy-model", ["hello world"]) is None
+    loader.assert_not_called()
+
+    LocalTokenizer.preload()
+    assert LocalTokenizer.get_num_tokens("test", "lazy-model", ["hello world"]) == [2]
+    loader.assert_called_once()
+
+
+def test_unloadable_tokenizer_is_not_retried():
+    LocalTokenizer.register("test", "broken-model", "missing_encoding")
+
+    with patch.object(local_tokenizer, "_load_tiktoken", side_effect=ConnectionError) as mock_load:
+        LocalTokenizer.preload()
+        LocalTokenizer.preload()
+    mock_load.assert_called_once()
+    assert LocalTokenizer.get_num_tokens("test", "broken-model", ["hello"]) is None
+
+
+@patch("core.model_runtime.model_providers.__base.large_language_model.PluginModelManager")
+def test_llm_counts_text_messages_locally(mock_manager):
+    prompt_messages = [
+        SystemPromptMessage(content="you are helpful"),
+        UserPromptMessage(content=[TextPromptMessageContent(data="hello there")]),
+    ]
+
+    num_tokens = _model(LargeLanguageModel).get_num_tokens("word-model", {}, prompt_messages)
+
+    # role names count as one word each
+    assert num_tokens == 2 * TOKENS_PER_MESSAGE + (1 + 3) + (1 + 2) + TOKENS_PER_REPLY
+    mock_manager.assert_not_called()
+
+
+@patch("core.model_runtime.model_providers.__base.large_language_model.PluginModelManager")
+def test_llm_falls_back_to_remote_and_caches(mock_manager):
+    mock_manager.return_value.get_llm_num_tokens.return_value = 42
+    image = ImagePromptMessageContent(format="png", mime_type="image/png", url="http://example.com/a.png")
+    prompt_messages = [UserPromptMessage(content=[TextPromptMessageContent(data="describe"), image])]
+    model = _model(LargeLanguageModel)
+
+    assert model.get_num_tokens("word-model", {}, prompt_messages) == 42
+    assert model.get_num_tokens("word-model", {}, prompt_messages) == 42
+    other_messages = [UserPromptMessage(content=[TextPromptMessageContent(data="describe it"), image])]
+    assert model.get_num_tokens("word-model", {}, other_messages) == 42
+    assert model.get_num_tokens("other-model", {}, [UserPromptMessage(content="hi")]) == 42
+    assert mock_manager.return_value.get_llm_num_tokens.call_count == 3
+
+
+@patch("core.model_runtime.model_providers.__base.text_embedding_model.PluginModelManager")
+def test_text_embedding_counts_locally(mock_manager):
+    assert _model(TextEmbeddingModel).get_num_tokens("word-model", {}, ["a b c", "", "d"]) == [3, 0, 1]
+    mock_manager.assert_not_called()
+
+
+@patch("core.model_runtime.model_providers.__base.text_embedding_model.PluginModelManager")
+def test_text_embedding_requests_only_uncached_texts(mock_manager):
+    get_num_tokens = mock_manager.return_value.get_text_embedding_num_tokens
+    get_num_tokens.side_effect = lambda texts, **kwargs: [len(text) for text in texts]
+    model = _model(TextEmbeddingModel)
+
+    assert model.get_num_tokens("other-model", {}, ["aa", "bbb"]) == [2, 3]
+    assert model.get_num_tokens("other-model", {}, ["bbb", "cccc", "aa"]) == [3, 4, 2]
+    assert [call.kwargs["texts"] for call in get_num_tokens.call_args_list] == [["aa", "bbb"], ["cccc"]]
@@ -0,0 +1,88 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from core.plugin.manager.base import BasePluginManager
+from core.plugin.utils import http_client
+
+# enough events that the stream is still open after the first chunk is read
+STREAM_EVENTS = 1000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections: set[int] = set()
+    cookies: list[str] = []
+
+    def do_GET(self):  # noqa: N802
+        _Handler.connections.add(self.client_address[1])
+        if self.headers.get("Cookie"):
+            _Handler.cookies.append(self.headers["Cookie"])
+        if self.path.endswith("/stream"):
+            body = b"".join(b'data: {"code": 0, "message": "", "data": %d}\n\n' % i for i in range(STREAM_EVENTS))
+        else:
+            body = b'{"code": 0, "message": "", "data": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=tenant-a; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def plugin_daemon():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _Handler.connections = set()
+    _Handler.cookies = []
+    with (
+        patch("core.plugin.manager.base.plugin_daemon_inner_api_baseurl", f"http://127.0.0.1:{server.server_port}"),
+        patch.object(http_client, "_session", None),
+        patch.object(http_client, "_adapter", None),
+        patch.object(http_client, "_pool_stats", http_client._PoolStats()),
+    ):
+        yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_keep_alive_connection(plugin_daemon):
+    manager = BasePluginManager()
+    for _ in range(5):
+        assert manager._request_with_plugin_daemon_response("GET", "plugin/ping", bool) is True
+
+    assert len(_Handler.connections) == 1
+    metrics = http_client.get_plugin_daemon_pool_metrics()
+    assert metrics.in_use_connections == 0
+    assert metrics.idle_connections == 1
+    assert metrics.wait_count == 5
+
+
+def test_cookies_are_never_kept_between_requests(plugin_daemon):
+    manager = BasePluginManager()
+    for _ in range(2):
+        assert manager._request_with_plugin_daemon_response("GET", "plugin/ping", bool) is True
+
+    assert _Handler.cookies == []
+    assert len(http_client.get_plugin_daemon_session().cookies) == 0
+
+
+def test_stream_releases_connection_when_consumer_stops_early(plugin_daemon):
+    manager = BasePluginManager()
+    stream = manager._request_with_plugin_daemon_response_stream("GET", "plugin/stream", int)
+    assert next(stream) == 0
+    assert http_client.get_plugin_daemon_pool_metrics().in_use_connections == 1
+
+    stream.close()
+    assert http_client.get_plugin_daemon_pool_metrics().in_use_connections == 0
+
+    events = list(manager._request_with_plugin_daemon_response_stream("GET", "plugin/stream", int))
+    assert events == list(range(STREAM_EVENTS))
+    assert http_client.get_plugin_daemon_pool_metrics().in_use_connections == 0
@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.helper.lru_cache import LRUCache
+from core.plugin.entities.plugin_daemon import PluginInstallTaskStatus
+from core.plugin.manager import model as plugin_model
+from core.plugin.manager.model import PluginModelManager
+from services.plugin.plugin_service import PluginService
+
+
+@pytest.fixture
+def version():
+    with (
+        patch.object(plugin_model, "_model_providers_cache", LRUCache(10)),
+        patch.object(plugin_model, "_model_schema_cache", LRUCache(10)),
+        patch.object(plugin_model.PluginModelProvidersCache, "get_version", return_value=0) as get_version,
+    ):
+        yield get_version
+
+
+def test_fetch_model_providers_is_cached_until_version_changes(version):
+    manager = PluginModelManager()
+    providers = [MagicMock()]
+    with patch.object(manager, "_request_with_plugin_daemon_response", return_value=providers) as request:
+        assert manager.fetch_model_providers("tenant") is providers
+        assert manager.fetch_model_providers("tenant") is providers
+        assert request.call_count == 1
+
+        manager.fetch_model_providers("other-tenant")
+        assert request.call_count == 2
+
+        version.return_value = 1
+        manager.fetch_model_providers("tenant")
+        assert request.call_count == 3
+
+
+def test_fetch_model_providers_expires(version):
+    manager = PluginModelManager()
+    with (
+        patch.object(manager, "_request_with_plugin_daemon_response", return_value=[]) as request,
+        patch.object(plugin_model.time, "monotonic", side_effect=[0, 1000, 1000]),
+    ):
+        manager.fetch_model_providers("tenant")
+        manager.fetch_model_providers("tenant")
+        assert request.call_count == 2
+
+
+def test_get_model_schema_is_cached_per_credentials(version):
+    manager = PluginModelManager()
+    schema = MagicMock()
+    with patch.object(
+        manager, "_request_with_plugin_daemon_response_stream", side_effect=lambda *a, **k: iter([schema])
+    ) as request:
+        for _ in range(2):
+            model_schema = manager.get_model_schema(
+                "tenant", "user", "langgenius/openai", "openai", "llm", "gpt-4o", {"api_key": "a", "base": "x"}
+            )
+            assert model_schema is schema.model_schema
+        assert request.call_count == 1
+
+        # same credentials in another order
+        manager.get_model_schema(
+            "tenant", "user", "langgenius/openai", "openai", "llm", "gpt-4o", {"base": "x", "api_key": "a"}
+        )
+        assert request.call_count == 1
+
+        manager.get_model_schema("tenant", "user", "langgenius/openai", "openai", "llm", "gpt-4o", {"api_key": "b"})
+        assert request.call_count == 2
+
+
+def test_get_model_schema_does_not_cache_unknown_models(version):
+    manager = PluginModelManager()
+    with patch.object(
+        manager, "_request_with_plugin_daemon_response_stream", side_effect=lambda *a, **k: iter([])
+    ) as request:
+        for _ in range(2):
+            assert manager.get_model_schema("tenant", "user", "langgenius/openai", "openai", "llm", "x", {}) is None
+        assert request.call_count == 2
+
+
+def test_cache_disabled(version):
+    manager = PluginModelManager()
+    with (
+        patch.object(plugin_model.dify_config, "PLUGIN_MODEL_CACHE_TTL", 0),
+        patch.object(manager, "_request_with_plugin_daemon_response", return_value=[]) as request,
+    ):
+        manager.fetch_model_providers("tenant")
+        manager.fetch_model_providers("tenant")
+        assert request.call_count == 2
+        version.assert_not_called()
+
+
+def test_finished_install_task_invalidates_once():
+    with (
+        patch("core.helper.model_provider_cache.redis_client", new=MagicMock()) as redis_client,
+        patch("services.plugin.plugin_service.PluginInstallationManager") as installation_manager,
+    ):
+        installation_manager.return_value.fetch_plugin_installation_task.return_value = MagicMock(
+            status=PluginInstallTaskStatus.Success
+        )
+        # the flag of the task is only set by the first poll
+        redis_client.set.side_effect = [True, None]
+
+        PluginService.fetch_install_task("tenant", "task")
+        PluginService.fetch_install_task("tenant", "task")
+
+    redis_client.set.assert_called_with(
+        "plugin_model_providers_invalidated:tenant_id:tenant:event:install_task:task", 1, nx=True, ex=86400
+    )
+    assert [call.args[0] for call in redis_client.incr.call_args_list] == [
+        "plugin_model_providers_version:tenant_id:tenant",
+        "provider_configurations_version:tenant_id:tenant",
+    ]
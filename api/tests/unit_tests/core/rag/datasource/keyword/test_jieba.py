@@ -0,0 +1,251 @@
+import json
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from core.rag.datasource.keyword.jieba.jieba import KEYWORD_MAX_LENGTH, Jieba
+from core.rag.models.document import Document
+from models.dataset import Dataset, DatasetKeywordTable
+
+
+@pytest.fixture
+def mock_db():
+    with patch("core.rag.datasource.keyword.jieba.jieba.db") as mock_db:
+        yield mock_db
+
+
+def _jieba(dataset_keyword_table=None) -> Jieba:
+    dataset = MagicMock(id="dataset", tenant_id="tenant", dataset_keyword_table=dataset_keyword_table)
+    return Jieba(dataset)
+
+
+def _result(rows: list) -> MagicMock:
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    return result
+
+
+def _statements(mock_db) -> list:
+    return [call.args[0] for call in mock_db.session.execute.call_args_list]
+
+
+def _compiled(statement):
+    return statement.compile(dialect=postgresql.dialect())
+
+
+def test_saved_postings_increment_statistics(mock_db):
+    # n1 is new, n2 already had a posting for another keyword
+    mock_db.session.execute.side_effect = [_result(["n1", "n1", "n2"]), MagicMock()]
+    mock_db.session.query.return_value.filter.return_value.group_by.return_value.all.return_value = [
+        ("n1", 2),
+        ("n2", 3),
+    ]
+
+    _jieba()._save_keyword_postings({"python": {"n1", "n2"}, "dify": {"n1"}})
+
+    insert_postings, update_statistics = (_compiled(statement) for statement in _statements(mock_db))
+    assert "ON CONFLICT (dataset_id, keyword, index_node_id) DO NOTHING" in str(insert_postings)
+    assert "RETURNING dataset_keyword_postings.index_node_id" in str(insert_postings)
+    assert "segment_count = greatest(dataset_keyword_statistics.segment_count +" in str(update_statistics)
+    assert update_statistics.params["segment_count"] == 1
+    assert update_statistics.params["keyword_count"] == 3
+    assert update_statistics.params["segment_count_1"] == 1
+    assert update_statistics.params["keyword_count_1"] == 3
+    mock_db.session.commit.assert_called_once()
+
+
+def test_existing_postings_leave_statistics_untouched(mock_db):
+    mock_db.session.execute.return_value = _result([])
+
+    _jieba()._save_keyword_postings({"python": {"n1"}})
+
+    assert len(_statements(mock_db)) == 1
+    mock_db.session.query.assert_not_called()
+
+
+def test_delete_by_ids_decrements_statistics(mock_db):
+    mock_db.session.execute.side_effect = [_result(["n1", "n1", "n2"]), MagicMock()]
+
+    _jieba().delete_by_ids(["n1", "n2", "n3"])
+
+    delete_postings, update_statistics = (_compiled(statement) for statement in _statements(mock_db))
+    assert str(delete_postings).startswith("DELETE FROM dataset_keyword_postings")
+    assert update_statistics.params["segment_count_1"] == -2
+    assert update_statistics.params["keyword_count_1"] == -3
+    # a missing statistics row is never created with negative counts
+    assert update_statistics.params["segment_count"] == 0
+    assert update_statistics.params["keyword_count"] == 0
+    mock_db.session.commit.assert_called_once()
+
+
+def _inserted_postings(statement) -> set[tuple[str, str]]:
+    params = _compiled(statement).params
+    return {
+        (params[f"keyword_m{i}"], params[f"index_node_id_m{i}"])
+        for i in range(len([key for key in params if key.startswith("keyword_m")]))
+    }
+
+
+def _text(doc_id: str, content: str) -> Document:
+    return Document(page_content=content, metadata={"doc_id": doc_id})
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba.JiebaKeywordTableHandler")
+def test_add_texts_writes_one_posting_per_keyword_and_node(mock_handler, mock_db):
+    mock_handler.return_value.extract_keywords.side_effect = [{"python", "dify"}, {"python"}]
+    mock_db.session.execute.return_value = _result([])
+
+    _jieba().add_texts([_text("n1", "python dify"), _text("n2", "python")], keywords_list=[None, ["agent"]])
+
+    # given keywords are used as is, empty ones are extracted from the text
+    assert _inserted_postings(_statements(mock_db)[0]) == {("python", "n1"), ("dify", "n1"), ("agent", "n2")}
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba.JiebaKeywordTableHandler")
+def test_create_skips_keywords_too_long_for_the_posting_table(mock_handler, mock_db):
+    mock_handler.return_value.extract_keywords.return_value = {"python", "x" * (KEYWORD_MAX_LENGTH + 1)}
+    mock_db.session.execute.return_value = _result([])
+
+    _jieba().create([_text("n1", "python")])
+
+    assert _inserted_postings(_statements(mock_db)[0]) == {("python", "n1")}
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba.JiebaKeywordTableHandler")
+def test_search_returns_segments_in_ranking_order(mock_handler, mock_db):
+    mock_handler.return_value.extract_keywords.return_value = {"python", "dify"}
+    query = mock_db.session.query.return_value
+    ranking = query.filter.return_value.group_by.return_value.order_by.return_value.limit
+    ranking.return_value.all.return_value = [
+        MagicMock(index_node_id="n2"),
+        MagicMock(index_node_id="missing"),
+        MagicMock(index_node_id="n1"),
+    ]
+    query.filter.return_value.__iter__.return_value = iter(
+        [
+            MagicMock(index_node_id="n1", content="one", index_node_hash="h1", document_id="d1", dataset_id="dataset"),
+            MagicMock(index_node_id="n2", content="two", index_node_hash="h2", document_id="d2", dataset_id="dataset"),
+        ]
+    )
+
+    documents = _jieba().search("python dify", top_k=3)
+
+    ranking.assert_called_once_with(3)
+    # segments are fetched in one query, nodes without a segment are left out
+    assert [document.page_content for document in documents] == ["two", "one"]
+    assert documents[0].metadata == {"doc_id": "n2", "doc_hash": "h2", "document_id": "d2", "dataset_id": "dataset"}
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba.JiebaKeywordTableHandler")
+def test_search_without_keywords_does_not_query(mock_handler, mock_db):
+    mock_handler.return_value.extract_keywords.return_value = set()
+
+    assert _jieba().search("the") == []
+    mock_db.session.query.assert_not_called()
+
+
+def _legacy_keyword_table(data_source_type: str, keyword_table: str = "") -> DatasetKeywordTable:
+    return DatasetKeywordTable(dataset_id="dataset", keyword_table=keyword_table, data_source_type=data_source_type)
+
+
+LEGACY_TABLE = json.dumps(
+    {"__type__": "keyword_table", "__data__": {"table": {"python": ["n1", "n2"], "dify": ["n1"]}}}
+)
+
+
+@pytest.fixture
+def legacy_environment():
+    with (
+        patch.object(Dataset, "query") as dataset_query,
+        patch("core.rag.datasource.keyword.jieba.jieba.redis_client", new=MagicMock()) as redis_client,
+        patch("core.rag.datasource.keyword.jieba.jieba.storage") as storage,
+        patch("models.dataset.storage") as model_storage,
+    ):
+        dataset_query.filter_by.return_value.first.return_value = MagicMock(tenant_id="tenant")
+        yield redis_client, storage, model_storage
+
+
+def test_migrate_legacy_keyword_table_from_database(mock_db, legacy_environment):
+    redis_client, storage, _ = legacy_environment
+    mock_db.session.execute.return_value = _result([])
+    legacy_table = _legacy_keyword_table("database", LEGACY_TABLE)
+
+    _jieba(legacy_table).migrate_legacy_keyword_table()
+
+    redis_client.lock.assert_called_once_with("keyword_indexing_lock_dataset", timeout=600)
+    assert _inserted_postings(_statements(mock_db)[0]) == {("python", "n1"), ("python", "n2"), ("dify", "n1")}
+    mock_db.session.delete.assert_called_once_with(legacy_table)
+    storage.delete.assert_not_called()
+
+
+def test_migrate_legacy_keyword_table_from_file(mock_db, legacy_environment):
+    _, storage, model_storage = legacy_environment
+    mock_db.session.execute.return_value = _result([])
+    model_storage.load_once.return_value = LEGACY_TABLE.encode()
+    storage.exists.return_value = True
+    legacy_table = _legacy_keyword_table("file")
+
+    _jieba(legacy_table).migrate_legacy_keyword_table()
+
+    model_storage.load_once.assert_called_once_with("keyword_files/tenant/dataset.txt")
+    assert _inserted_postings(_statements(mock_db)[0]) == {("python", "n1"), ("python", "n2"), ("dify", "n1")}
+    mock_db.session.delete.assert_called_once_with(legacy_table)
+    storage.delete.assert_called_once_with("keyword_files/tenant/dataset.txt")
+
+
+def test_migrate_legacy_keyword_table_keeps_file_that_fails_to_load(mock_db, legacy_environment):
+    _, storage, model_storage = legacy_environment
+    model_storage.load_once.side_effect = ConnectionError("storage unavailable")
+    storage.exists.return_value = True
+
+    with pytest.raises(ValueError, match="legacy keyword table"):
+        _jieba(_legacy_keyword_table("file")).migrate_legacy_keyword_table()
+
+    mock_db.session.execute.assert_not_called()
+    mock_db.session.delete.assert_not_called()
+    mock_db.session.commit.assert_not_called()
+    storage.delete.assert_not_called()
+
+
+def test_migrate_legacy_keyword_table_without_file(mock_db, legacy_environment):
+    _, storage, model_storage = legacy_environment
+    model_storage.load_once.side_effect = FileNotFoundError("keyword_files/tenant/dataset.txt")
+    storage.exists.return_value = False
+    legacy_table = _legacy_keyword_table("file")
+
+    _jieba(legacy_table).migrate_legacy_keyword_table()
+
+    mock_db.session.execute.assert_not_called()
+    mock_db.session.delete.assert_called_once_with(legacy_table)
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba.JiebaKeywordTableHandler")
+def test_search_does_not_migrate_legacy_keyword_table(mock_handler, mock_db, legacy_environment):
+    redis_client, _, _ = legacy_environment
+    mock_handler.return_value.extract_keywords.return_value = set()
+
+    assert _jieba(_legacy_keyword_table("database", LEGACY_TABLE)).search("python") == []
+    redis_client.lock.assert_not_called()
+    mock_db.session.delete.assert_not_called()
+
+
+def test_migrate_legacy_keyword_table_done_by_another_worker(mock_db, legacy_environment):
+    redis_client, _, _ = legacy_environment
+    jieba = _jieba()
+    # the table was there before the lock was taken, but not anymore once it was held
+    type(jieba.dataset).dataset_keyword_table = PropertyMock(side_effect=[_legacy_keyword_table("database"), None])
+
+    jieba.migrate_legacy_keyword_table()
+
+    redis_client.lock.assert_called_once()
+    mock_db.session.execute.assert_not_called()
+    mock_db.session.delete.assert_not_called()
+
+
+def test_migrate_without_legacy_keyword_table_takes_no_lock(mock_db, legacy_environment):
+    redis_client, _, _ = legacy_environment
+
+    _jieba().migrate_legacy_keyword_table()
+
+    redis_client.lock.assert_not_called()
@@ -0,0 +1,60 @@
+import importlib.util
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+import sqlalchemy as sa
+
+MIGRATIONS_DIR = Path(__file__).parents[6] / "migrations" / "versions"
+
+
+def _load_migration(name: str):
+    path = next(MIGRATIONS_DIR.glob(f"*_{name}.py"))
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    assert spec
+    assert spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def op():
+    return MagicMock()
+
+
+def test_postings_migration(op):
+    migration = _load_migration("add_dataset_keyword_postings")
+    assert migration.down_revision == "4413929e1ec2"
+
+    with patch.object(migration, "op", op):
+        migration.upgrade()
+        table = sa.Table(*op.create_table.call_args.args[:1], sa.MetaData(), *op.create_table.call_args.args[1:])
+        assert table.name == "dataset_keyword_postings"
+        assert [column.name for column in table.columns] == ["id", "dataset_id", "keyword", "index_node_id"]
+        unique = next(c for c in table.constraints if c.name == "dataset_keyword_posting_unique_idx")
+        assert [column.name for column in unique.columns] == ["dataset_id", "keyword", "index_node_id"]
+        batch_op = op.batch_alter_table.return_value.__enter__.return_value
+        batch_op.create_index.assert_called_once_with(
+            "dataset_keyword_posting_node_idx", ["dataset_id", "index_node_id"], unique=False
+        )
+
+        migration.downgrade()
+        batch_op.drop_index.assert_called_once_with("dataset_keyword_posting_node_idx")
+        op.drop_table.assert_called_once_with("dataset_keyword_postings")
+
+
+def test_statistics_migration_backfills_from_postings(op):
+    postings = _load_migration("add_dataset_keyword_postings")
+    migration = _load_migration("add_dataset_keyword_statistics")
+    assert migration.down_revision == postings.revision
+
+    with patch.object(migration, "op", op):
+        migration.upgrade()
+        assert op.create_table.call_args.args[0] == "dataset_keyword_statistics"
+        backfill = op.execute.call_args.args[0]
+        assert backfill.startswith("INSERT INTO dataset_keyword_statistics")
+        assert "COUNT(DISTINCT index_node_id), COUNT(id) FROM dataset_keyword_postings GROUP BY dataset_id" in backfill
+
+        migration.downgrade()
+        op.drop_table.assert_called_once_with("dataset_keyword_statistics")
@@ -0,0 +1,144 @@
+from unittest.mock import patch
+
+import pytest
+
+from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from models.dataset import ChildChunk, DocumentSegment
+from models.dataset import Document as DatasetDocument
+
+
+class _Query:
+    """Stands in for a session query, only rows matching the enabled filter of the real query are returned."""
+
+    def __init__(self, model: type, rows: list):
+        self.model = model
+        self.rows = rows
+        self.criteria: list[str] = []
+
+    def filter(self, *criteria):
+        self.criteria.extend(str(criterion) for criterion in criteria)
+        return self
+
+    def options(self, *options):
+        return self
+
+    def all(self):
+        return list(self)
+
+    def __iter__(self):
+        if self.model is DocumentSegment and "document_segments.enabled = true" in self.criteria:
+            return iter([row for row in self.rows if row.enabled])
+        return iter(self.rows)
+
+
+def _dataset_document(document_id: str, doc_form: str) -> DatasetDocument:
+    return DatasetDocument(id=document_id, doc_form=doc_form, dataset_id="dataset")
+
+
+def _segment(segment_id: str, enabled: bool = True) -> DocumentSegment:
+    return DocumentSegment(
+        id=segment_id,
+        dataset_id="dataset",
+        index_node_id=f"node-{segment_id}",
+        content=f"content of {segment_id}",
+        enabled=enabled,
+        status="completed",
+    )
+
+
+def _child_chunk(chunk_id: str, segment_id: str, position: int) -> ChildChunk:
+    return ChildChunk(
+        id=chunk_id,
+        segment_id=segment_id,
+        index_node_id=f"node-{chunk_id}",
+        content=f"content of {chunk_id}",
+        position=position,
+    )
+
+
+def _document(document_id: str, index_node_id: str, score: float) -> Document:
+    return Document(
+        page_content="unused", metadata={"document_id": document_id, "doc_id": index_node_id, "score": score}
+    )
+
+
+@pytest.fixture
+def session():
+    rows: dict[type, list] = {DatasetDocument: [], ChildChunk: [], DocumentSegment: []}
+    queries: list[_Query] = []
+
+    def query(model):
+        queries.append(_Query(model, rows[model]))
+        return queries[-1]
+
+    with patch("core.rag.datasource.retrieval_service.db") as mock_db:
+        mock_db.session.query.side_effect = query
+        yield rows, queries
+
+
+def test_text_segments_keep_order_and_scores(session):
+    rows, queries = session
+    rows[DatasetDocument] = [_dataset_document("document", IndexType.PARAGRAPH_INDEX)]
+    rows[DocumentSegment] = [_segment("1"), _segment("2"), _segment("3")]
+
+    segments = RetrievalService.format_retrieval_documents(
+        [
+            _document("document", "node-3", 0.9),
+            _document("document", "node-1", 0.7),
+            _document("document", "node-2", 0.2),
+        ]
+    )
+
+    assert [(segment.segment.id, segment.score) for segment in segments] == [("3", 0.9), ("1", 0.7), ("2", 0.2)]
+    # the documents and all their segments are loaded with one query each
+    assert len(queries) == 2
+
+
+def test_child_chunks_are_grouped_under_their_parent_segment(session):
+    rows, queries = session
+    rows[DatasetDocument] = [_dataset_document("document", IndexType.PARENT_CHILD_INDEX)]
+    rows[ChildChunk] = [_child_chunk("a", "1", 1), _child_chunk("b", "2", 1), _child_chunk("c", "1", 2)]
+    rows[DocumentSegment] = [_segment("1"), _segment("2")]
+
+    segments = RetrievalService.format_retrieval_documents(
+        [
+            _document("document", "node-a", 0.5),
+            _document("document", "node-b", 0.6),
+            _document("document", "node-c", 0.8),
+        ]
+    )
+
+    assert [segment.segment.id for segment in segments] == ["1", "2"]
+    parent, other = segments
+    assert [(chunk.id, chunk.score) for chunk in parent.child_chunks or []] == [("a", 0.5), ("c", 0.8)]
+    assert parent.score == 0.8
+    assert [chunk.id for chunk in other.child_chunks or []] == ["b"]
+    assert other.score == 0.6
+    assert len(queries) == 3
+
+
+def test_documents_without_an_enabled_segment_are_dropped(session):
+    rows, _ = session
+    rows[DatasetDocument] = [
+        _dataset_document("text", IndexType.PARAGRAPH_INDEX),
+        _dataset_document("parent-child", IndexType.PARENT_CHILD_INDEX),
+    ]
+    rows[ChildChunk] = [_child_chunk("a", "1", 1), _child_chunk("b", "disabled", 1), _child_chunk("c", "missing", 1)]
+    rows[DocumentSegment] = [_segment("1"), _segment("2"), _segment("disabled", enabled=False)]
+
+    segments = RetrievalService.format_retrieval_documents(
+        [
+            _document("text", "node-missing", 1.0),
+            _document("text", "node-disabled", 0.9),
+            _document("text", "node-2", 0.8),
+            _document("parent-child", "node-b", 0.7),
+            _document("parent-child", "node-c", 0.6),
+            _document("parent-child", "node-unknown", 0.5),
+            _document("parent-child", "node-a", 0.4),
+            _document("deleted-document", "node-1", 0.3),
+        ]
+    )
+
+    assert [(segment.segment.id, segment.score) for segment in segments] == [("2", 0.8), ("1", 0.4)]
@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("elasticsearch")
+
+from core.rag.datasource.vdb.elasticsearch.elasticsearch_vector import ElasticSearchVector
+
+
+def _elasticsearch_vector() -> ElasticSearchVector:
+    vector = ElasticSearchVector.__new__(ElasticSearchVector)
+    vector._collection_name = "collection"
+    vector._client = MagicMock()
+    return vector
+
+
+def test_texts_exist_gets_all_ids_without_source():
+    vector = _elasticsearch_vector()
+    vector._client.mget.return_value = {
+        "docs": [
+            {"_id": "id-1", "found": True},
+            {"_id": "id-2", "found": False},
+            {"_id": "id-3", "found": True},
+        ]
+    }
+
+    assert vector.texts_exist(["id-1", "id-2", "id-3"]) == ["id-1", "id-3"]
+    vector._client.mget.assert_called_once_with(index="collection", ids=["id-1", "id-2", "id-3"], source=False)
+
+
+def test_texts_exist_without_ids_does_not_query():
+    vector = _elasticsearch_vector()
+
+    assert vector.texts_exist([]) == []
+    vector._client.mget.assert_not_called()
@@ -1,7 +1,9 @@
+from unittest.mock import MagicMock
+
 import pytest
 from pydantic.error_wrappers import ValidationError
 
-from core.rag.datasource.vdb.milvus.milvus_vector import MilvusConfig
+from core.rag.datasource.vdb.milvus.milvus_vector import MilvusConfig, MilvusVector
 
 
 def test_default_value():
@@ -16,3 +18,31 @@ def test_default_value():
 
     config = MilvusConfig(**valid_config)
     assert config.database == "default"
+
+
+def _milvus_vector() -> MilvusVector:
+    vector = MilvusVector.__new__(MilvusVector)
+    vector._collection_name = "collection"
+    vector._client = MagicMock()
+    return vector
+
+
+def test_texts_exist_filters_on_all_doc_ids_at_once():
+    vector = _milvus_vector()
+    vector._client.has_collection.return_value = True
+    vector._client.query.return_value = [{"metadata": {"doc_id": "id-1"}}, {"metadata": {"doc_id": "id-3"}}]
+
+    assert vector.texts_exist(["id-1", "id-2", "id-3"]) == ["id-1", "id-3"]
+    vector._client.query.assert_called_once_with(
+        collection_name="collection",
+        filter='metadata["doc_id"] in ["id-1", "id-2", "id-3"]',
+        output_fields=["metadata"],
+    )
+
+
+def test_texts_exist_without_collection_does_not_query():
+    vector = _milvus_vector()
+    vector._client.has_collection.return_value = False
+
+    assert vector.texts_exist(["id-1"]) == []
+    vector._client.query.assert_not_called()
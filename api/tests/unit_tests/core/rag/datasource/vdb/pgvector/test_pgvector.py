@@ -0,0 +1,92 @@
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import pytest
+
+from core.rag.datasource.vdb.pgvector import pgvector
+from core.rag.datasource.vdb.pgvector.pgvector import BlockingConnectionPool, PGVector
+
+
+@pytest.fixture
+def connections():
+    connections: list[MagicMock] = []
+
+    def connect(*args, **kwargs):
+        conn = MagicMock()
+        conn.closed = 0
+        conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        connections.append(conn)
+        return conn
+
+    with (
+        patch.object(psycopg2.pool.psycopg2, "connect", side_effect=connect),
+        patch.object(pgvector, "POOL_TIMEOUT", 0.1),
+    ):
+        yield connections
+
+
+def _vector(pool: BlockingConnectionPool) -> PGVector:
+    vector = PGVector.__new__(PGVector)
+    vector.pool = pool
+    vector.table_name = "embedding_test"
+    return vector
+
+
+def _query_on_dropped_connection(vector: PGVector, connections: list[MagicMock]) -> None:
+    with vector._get_cursor() as cur:
+        cur.execute("SELECT 1")
+        # the server went away, psycopg2 only notices once the connection is used
+        connections[-1].commit.side_effect = psycopg2.InterfaceError("connection already closed")
+        connections[-1].rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+
+
+def test_connection_dropped_during_commit_is_closed_and_released(connections):
+    pool = BlockingConnectionPool(1, 1)
+    vector = _vector(pool)
+
+    for _ in range(3):
+        with pytest.raises(psycopg2.InterfaceError):
+            _query_on_dropped_connection(vector, connections)
+
+    # every broken connection was discarded and its slot given back, otherwise the pool would be exhausted
+    assert len(connections) == 3
+    assert all(conn.close.called for conn in connections)
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_failed_query_is_rolled_back_and_connection_reused(connections):
+    pool = BlockingConnectionPool(1, 1)
+    vector = _vector(pool)
+
+    with pytest.raises(ValueError):
+        with vector._get_cursor():
+            raise ValueError("bad query")
+    with vector._get_cursor():
+        pass
+
+    assert len(connections) == 1
+    connections[0].rollback.assert_called_once()
+    connections[0].commit.assert_called_once()
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_texts_exist_queries_all_ids_at_once(connections):
+    vector = _vector(BlockingConnectionPool(1, 1))
+
+    with patch.object(vector, "_get_cursor") as get_cursor:
+        cursor = get_cursor.return_value.__enter__.return_value
+        cursor.__iter__.return_value = iter([("id-1",), ("id-3",)])
+
+        assert vector.texts_exist(["id-1", "id-2", "id-3"]) == ["id-1", "id-3"]
+
+    cursor.execute.assert_called_once_with("SELECT id FROM embedding_test WHERE id IN %s", (("id-1", "id-2", "id-3"),))
+
+
+def test_texts_exist_without_ids_does_not_query(connections):
+    vector = _vector(BlockingConnectionPool(1, 1))
+
+    with patch.object(vector, "_get_cursor") as get_cursor:
+        assert vector.texts_exist([]) == []
+    get_cursor.assert_not_called()
@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from core.rag.datasource.vdb.qdrant.qdrant_vector import QdrantVector
+
+
+def _qdrant_vector() -> QdrantVector:
+    vector = QdrantVector.__new__(QdrantVector)
+    vector._collection_name = "collection"
+    vector._client = MagicMock()
+    collection = MagicMock()
+    collection.name = "collection"
+    vector._client.get_collections.return_value.collections = [collection]
+    return vector
+
+
+def test_texts_exist_retrieves_all_points_at_once():
+    vector = _qdrant_vector()
+    vector._client.retrieve.return_value = [MagicMock(id="id-1"), MagicMock(id="id-3")]
+
+    assert vector.texts_exist(["id-1", "id-2", "id-3"]) == ["id-1", "id-3"]
+    vector._client.retrieve.assert_called_once_with(
+        collection_name="collection", ids=["id-1", "id-2", "id-3"], with_payload=False, with_vectors=False
+    )
+
+
+def test_texts_exist_without_collection_does_not_retrieve():
+    vector = _qdrant_vector()
+    vector._client.get_collections.return_value.collections = []
+
+    assert vector.texts_exist(["id-1"]) == []
+    vector._client.retrieve.assert_not_called()
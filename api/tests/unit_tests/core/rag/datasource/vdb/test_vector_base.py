@@ -0,0 +1,70 @@
+from typing import Any
+from unittest.mock import patch
+
+from core.rag.datasource.vdb import vector_base
+from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.models.document import Document
+
+
+class _MemoryVector(BaseVector):
+    def __init__(self, ids: set[str]):
+        super().__init__("collection")
+        self.ids = ids
+        self.queries: list[list[str]] = []
+
+    def get_type(self) -> str:
+        return "memory"
+
+    def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
+        pass
+
+    def add_texts(self, documents: list[Document], embeddings: list[list[float]], **kwargs):
+        pass
+
+    def text_exists(self, id: str) -> bool:
+        self.queries.append([id])
+        return id in self.ids
+
+    def delete_by_ids(self, ids: list[str]) -> None:
+        pass
+
+    def delete_by_metadata_field(self, key: str, value: str) -> None:
+        pass
+
+    def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
+        return []
+
+    def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
+        return []
+
+    def delete(self) -> None:
+        pass
+
+
+class _BulkMemoryVector(_MemoryVector):
+    def texts_exist(self, ids: list[str]) -> list[str]:
+        self.queries.append(ids)
+        return [id for id in ids if id in self.ids]
+
+
+def _documents(*doc_ids):
+    return [Document(page_content=str(doc_id), metadata={"doc_id": doc_id} if doc_id else {}) for doc_id in doc_ids]
+
+
+def test_filter_duplicate_texts_falls_back_to_text_exists():
+    vector = _MemoryVector({"a", "c"})
+
+    texts = vector._filter_duplicate_texts(_documents("a", "b", "c", None))
+
+    assert [text.page_content for text in texts] == ["b", "None"]
+    assert vector.queries == [["a"], ["b"], ["c"]]
+
+
+def test_filter_duplicate_texts_queries_in_batches():
+    vector = _BulkMemoryVector({"1", "3", "4"})
+
+    with patch.object(vector_base, "DUPLICATE_CHECK_BATCH_SIZE", 2):
+        texts = vector._filter_duplicate_texts(_documents("0", "1", "1", "2", "3", "4"))
+
+    assert [text.page_content for text in texts] == ["0", "2"]
+    assert vector.queries == [["0", "1"], ["2", "3"], ["4"]]
@@ -0,0 +1,100 @@
+import gc
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.rag.datasource.vdb.pgvector.pgvector import BlockingConnectionPool, PGVector, PGVectorConfig
+from core.rag.datasource.vdb.vector_client_registry import VectorClientRegistry
+
+
+class _Owner:
+    pass
+
+
+def test_get_client_shares_clients_by_key():
+    registry = VectorClientRegistry(idle_timeout=60)
+    create = MagicMock(side_effect=lambda: object())
+    first, second, other = _Owner(), _Owner(), _Owner()
+
+    client = registry.get_client(first, ("qdrant", "a"), create)
+
+    assert registry.get_client(second, ("qdrant", "a"), create) is client
+    assert registry.get_client(other, ("qdrant", "b"), create) is not client
+    assert create.call_count == 2
+    assert [stats.leases for stats in registry.get_stats()] == [2, 1]
+
+
+def test_idle_clients_are_closed_once_unused():
+    registry = VectorClientRegistry(idle_timeout=0)
+    close = MagicMock()
+    owner = _Owner()
+    client = registry.get_client(owner, ("milvus", "a"), object, close=close)
+
+    # still leased
+    registry.close_idle()
+    close.assert_not_called()
+
+    del owner
+    gc.collect()
+    registry.close_idle()
+
+    close.assert_called_once_with(client)
+    assert registry.get_stats() == []
+
+
+def test_get_stats_reports_pool_stats():
+    registry = VectorClientRegistry(idle_timeout=60)
+    owner = _Owner()
+    registry.get_client(owner, ("pgvector", "a"), object, stats=lambda client: {"in_use": 1})
+
+    [stats] = registry.get_stats()
+
+    assert stats.store == "pgvector"
+    assert stats.pool == {"in_use": 1}
+
+
+@pytest.fixture
+def pgvector_config() -> PGVectorConfig:
+    return PGVectorConfig(
+        host="localhost",
+        port=5432,
+        user="postgres",
+        password="difyai123456",
+        database="dify",
+        min_connection=1,
+        max_connection=2,
+    )
+
+
+def test_pgvector_instances_share_one_pool(pgvector_config):
+    registry = VectorClientRegistry(idle_timeout=60)
+    with (
+        patch("core.rag.datasource.vdb.pgvector.pgvector.vector_client_registry", registry),
+        patch.object(PGVector, "_create_connection_pool", side_effect=lambda config: MagicMock()) as create_pool,
+    ):
+        first = PGVector("collection_a", pgvector_config)
+        second = PGVector("collection_b", pgvector_config)
+
+    assert first.pool is second.pool
+    create_pool.assert_called_once()
+
+
+def test_blocking_pool_waits_for_a_free_connection():
+    with patch("psycopg2.pool.psycopg2.connect", side_effect=lambda *args, **kwargs: MagicMock(closed=0)):
+        pool = BlockingConnectionPool(0, 1)
+        conn = pool.getconn()
+        acquired = threading.Event()
+
+        def get_second():
+            pool.putconn(pool.getconn())
+            acquired.set()
+
+        thread = threading.Thread(target=get_second)
+        thread.start()
+        assert not acquired.wait(0.1)
+        assert pool.get_stats() == {"connections": 1, "in_use": 1, "max_connections": 1}
+
+        pool.putconn(conn)
+        assert acquired.wait(1)
+        thread.join()
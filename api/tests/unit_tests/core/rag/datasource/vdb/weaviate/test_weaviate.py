@@ -0,0 +1,53 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("weaviate")
+
+from core.rag.datasource.vdb.weaviate.weaviate_vector import WeaviateVector
+
+
+def _weaviate_vector() -> WeaviateVector:
+    vector = WeaviateVector.__new__(WeaviateVector)
+    vector._collection_name = "Vector_index_test_Node"
+    vector._client = MagicMock()
+    vector._client.schema.contains.return_value = True
+    return vector
+
+
+def test_texts_exist_matches_all_ids_in_one_query():
+    vector = _weaviate_vector()
+    query = vector._client.query.get.return_value.with_where.return_value.with_limit.return_value
+    query.do.return_value = {"data": {"Get": {"Vector_index_test_Node": [{"doc_id": "id-1"}, {"doc_id": "id-3"}]}}}
+
+    assert vector.texts_exist(["id-1", "id-2", "id-3"]) == ["id-1", "id-3"]
+    vector._client.query.get.assert_called_once_with("Vector_index_test_Node", ["doc_id"])
+    vector._client.query.get.return_value.with_where.assert_called_once_with(
+        {
+            "operator": "Or",
+            "operands": [
+                {"path": ["doc_id"], "operator": "Equal", "valueText": "id-1"},
+                {"path": ["doc_id"], "operator": "Equal", "valueText": "id-2"},
+                {"path": ["doc_id"], "operator": "Equal", "valueText": "id-3"},
+            ],
+        }
+    )
+    # the default limit would cut off large batches
+    vector._client.query.get.return_value.with_where.return_value.with_limit.assert_called_once_with(3)
+
+
+def test_texts_exist_raises_on_query_errors():
+    vector = _weaviate_vector()
+    query = vector._client.query.get.return_value.with_where.return_value.with_limit.return_value
+    query.do.return_value = {"errors": [{"message": "bad filter"}]}
+
+    with pytest.raises(ValueError, match="bad filter"):
+        vector.texts_exist(["id-1"])
+
+
+def test_texts_exist_without_schema_does_not_query():
+    vector = _weaviate_vector()
+    vector._client.schema.contains.return_value = False
+
+    assert vector.texts_exist(["id-1"]) == []
+    vector._client.query.get.assert_not_called()
@@ -0,0 +1,88 @@
+import base64
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from core.helper.lru_cache import LRUCache
+from core.model_runtime.entities.text_embedding_entities import EmbeddingUsage, TextEmbeddingResult
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from libs import helper
+from models.dataset import Embedding
+
+
+def _model_instance(vectors: list[list[float]]) -> MagicMock:
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "text-embedding-3-small"
+    model_instance.load_balancing_manager = None
+    model_instance.model_type_instance.get_model_schema.return_value = None
+    model_instance.invoke_text_embedding.side_effect = [
+        TextEmbeddingResult(
+            model="text-embedding-3-small", embeddings=[vector], usage=MagicMock(spec=EmbeddingUsage, total_tokens=5)
+        )
+        for vector in vectors
+    ]
+    return model_instance
+
+
+def _cached_row(text: str, vector: list[float]) -> Embedding:
+    embedding = Embedding(model_name="text-embedding-3-small", hash=helper.generate_text_hash(text))
+    embedding.set_embedding(vector)
+    return embedding
+
+
+@patch("core.rag.embedding.cached_embedding.db")
+def test_embed_documents_looks_up_cache_in_one_query(mock_db):
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [
+        _cached_row("cached", [1.0, 0.0]),
+    ]
+    model_instance = _model_instance([[0.0, 2.0], [3.0, 0.0]])
+
+    embeddings = CacheEmbedding(model_instance).embed_documents(["cached", "new", "other", "cached"])
+
+    assert embeddings == [[1.0, 0.0], [0.0, 1.0], [1.0, 0.0], [1.0, 0.0]]
+    assert mock_db.session.query.call_count == 1
+    assert model_instance.invoke_text_embedding.call_count == 2
+    # misses are written back with a single multi-row insert
+    assert mock_db.session.execute.call_count == 1
+    mock_db.session.commit.assert_called_once()
+
+
+@patch("core.rag.embedding.cached_embedding._local_cache", LRUCache(10))
+@patch("core.rag.embedding.cached_embedding.db")
+def test_embed_documents_with_usage_counts_only_embedded_texts(mock_db):
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [
+        _cached_row("cached", [1.0, 0.0]),
+    ]
+    model_instance = _model_instance([[0.0, 2.0]])
+
+    embeddings, tokens = CacheEmbedding(model_instance).embed_documents_with_usage(["cached", "new"])
+
+    assert embeddings == [[1.0, 0.0], [0.0, 1.0]]
+    assert tokens == 5
+
+
+@patch("core.rag.embedding.cached_embedding._local_cache", LRUCache(10))
+@patch("core.rag.embedding.cached_embedding.db")
+def test_embed_documents_uses_local_cache(mock_db):
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+    model_instance = _model_instance([[0.0, 2.0]])
+
+    assert CacheEmbedding(model_instance).embed_documents(["local"]) == [[0.0, 1.0]]
+    assert CacheEmbedding(model_instance).embed_documents(["local"]) == [[0.0, 1.0]]
+
+    assert mock_db.session.query.call_count == 1
+    assert model_instance.invoke_text_embedding.call_count == 1
+
+
+def test_embed_query_reads_legacy_base64_entry_starting_with_magic():
+    vector = np.frombuffer(b"\x0c\x40\x75" + bytes(5) + np.float64(0.5).tobytes(), dtype="float")
+    legacy = base64.b64encode(vector.tobytes())
+    assert legacy.startswith(b"DEB1")
+
+    with patch("core.rag.embedding.cached_embedding.redis_client", new=MagicMock()) as redis_client:
+        redis_client.get.return_value = legacy
+        model_instance = _model_instance([])
+
+        assert CacheEmbedding(model_instance).embed_query("hello") == vector.tolist()
+    model_instance.invoke_text_embedding.assert_not_called()
@@ -0,0 +1,48 @@
+import base64
+import pickle
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.embedding_codec import decode_embedding, encode_embedding, is_encoded_embedding
+from models.dataset import Embedding
+
+
+def test_encode_decode_roundtrip():
+    vector = [0.5, -0.25, 0.125]
+
+    data = encode_embedding(vector)
+    decoded = decode_embedding(data)
+
+    assert is_encoded_embedding(data)
+    assert len(data) == 8 + 4 * len(vector)
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == vector
+    # decoding is a view on the encoded bytes
+    assert not decoded.flags.writeable
+
+
+def test_decode_rejects_invalid_data():
+    with pytest.raises(ValueError):
+        decode_embedding(pickle.dumps([0.5, 0.25]))
+    with pytest.raises(ValueError):
+        decode_embedding(encode_embedding([0.5, 0.25])[:-1])
+
+
+def test_legacy_base64_entry_starting_with_magic_is_not_encoded():
+    # float64 values whose base64 encoding starts with "DEB1"
+    legacy = base64.b64encode(b"\x0c\x40\x75" + bytes(5) + np.float64(0.5).tobytes())
+
+    assert legacy.startswith(b"DEB1")
+    assert not is_encoded_embedding(legacy)
+    with pytest.raises(ValueError, match="not an encoded embedding"):
+        decode_embedding(legacy)
+
+
+def test_embedding_reads_legacy_pickled_rows():
+    embedding = Embedding(embedding=pickle.dumps([0.5, 0.25], protocol=pickle.HIGHEST_PROTOCOL))
+    assert embedding.get_embedding() == [0.5, 0.25]
+
+    embedding.set_embedding([0.5, 0.25])
+    assert is_encoded_embedding(embedding.embedding)
+    assert embedding.get_embedding() == [0.5, 0.25]
@@ -0,0 +1,142 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.model_runtime.entities.text_embedding_entities import EmbeddingUsage, TextEmbeddingResult
+from core.model_runtime.errors.invoke import InvokeBadRequestError, InvokeRateLimitError
+from core.rag.embedding import embedding_dispatcher
+from core.rag.embedding.embedding_dispatcher import AdaptiveConcurrencyLimit, EmbeddingDispatcher
+
+
+class _FakeProvider:
+    """
+    Embedding provider answering after a delay, rate limiting calls above a concurrency ceiling.
+    """
+
+    def __init__(self, ceiling: int, latency: float = 0.01) -> None:
+        self.ceiling = ceiling
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts: list[str], user=None, input_type=None) -> TextEmbeddingResult:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            rejected = self.in_flight > self.ceiling
+            if rejected:
+                self.rate_limited += 1
+        try:
+            if rejected:
+                raise InvokeRateLimitError("rate limited")
+            time.sleep(self.latency)
+            return TextEmbeddingResult(
+                model="text-embedding-3-small",
+                embeddings=[[float(len(text)), 1.0] for text in texts],
+                usage=MagicMock(spec=EmbeddingUsage, total_tokens=len(texts)),
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _model_instance(provider) -> MagicMock:
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.provider_model_bundle.configuration.tenant_id = "tenant"
+    model_instance.load_balancing_manager = None
+    model_instance.invoke_text_embedding.side_effect = provider
+    return model_instance
+
+
+@pytest.fixture(autouse=True)
+def _isolated_limits():
+    with (
+        patch.object(embedding_dispatcher, "_limits", {}),
+        patch.object(embedding_dispatcher, "RETRY_BASE_DELAY", 0.001),
+    ):
+        yield
+
+
+def test_limit_increases_additively_and_halves_on_rate_limit():
+    limit = AdaptiveConcurrencyLimit(max_limit=16)
+    for _ in range(20):
+        limit.acquire()
+        limit.release(latency=0.1)
+    assert limit.limit > 4
+
+    before = limit.limit
+    limit.acquire()
+    limit.release(rate_limited=True)
+    assert limit.limit == before // 2
+
+
+def test_limit_decreases_when_latency_climbs():
+    limit = AdaptiveConcurrencyLimit(max_limit=16, initial_limit=8)
+    limit.acquire()
+    limit.release(latency=0.1)
+    limit.acquire()
+    limit.release(latency=1.0)
+
+    assert limit.limit == 4
+
+
+def test_embed_keeps_batch_order_and_stays_under_the_limit():
+    provider = _FakeProvider(ceiling=100)
+    batches = [[f"text {i}" * (i + 1)] for i in range(40)]
+
+    with patch.object(embedding_dispatcher.dify_config, "EMBEDDING_MAX_CONCURRENCY", 4):
+        results = EmbeddingDispatcher(_model_instance(provider)).embed(batches)
+
+    assert [result.embeddings[0][0] for result in results] == [float(len(batch[0])) for batch in batches]
+    assert 1 < provider.max_in_flight <= 4
+
+
+def test_embed_retries_rate_limited_batches_and_backs_off():
+    provider = _FakeProvider(ceiling=3)
+    batches = [[f"text {i}"] for i in range(60)]
+
+    with (
+        patch.object(embedding_dispatcher.dify_config, "EMBEDDING_MAX_CONCURRENCY", 16),
+        patch.object(embedding_dispatcher.dify_config, "EMBEDDING_MAX_RETRIES", 20),
+    ):
+        results = EmbeddingDispatcher(_model_instance(provider)).embed(batches)
+
+    assert len(results) == 60
+    assert provider.rate_limited > 0
+    assert embedding_dispatcher._limits[("tenant", "openai")].limit <= 8
+
+
+def test_embed_raises_errors_that_are_not_retryable():
+    model_instance = _model_instance(InvokeBadRequestError("bad request"))
+
+    with pytest.raises(InvokeBadRequestError):
+        EmbeddingDispatcher(model_instance).embed([["a"], ["b"]])
+
+    assert model_instance.invoke_text_embedding.call_count <= 2
+
+
+def test_embed_gives_up_after_max_retries():
+    model_instance = _model_instance(InvokeRateLimitError("rate limited"))
+
+    with (
+        patch.object(embedding_dispatcher.dify_config, "EMBEDDING_MAX_RETRIES", 2),
+        pytest.raises(InvokeRateLimitError),
+    ):
+        EmbeddingDispatcher(model_instance).embed([["a"]])
+
+    assert model_instance.invoke_text_embedding.call_count == 3
+
+
+def test_max_limit_scales_with_load_balancing_configs():
+    model_instance = _model_instance(_FakeProvider(ceiling=100))
+    model_instance.load_balancing_manager = MagicMock(config_count=3)
+
+    with patch.object(embedding_dispatcher.dify_config, "EMBEDDING_MAX_CONCURRENCY", 4):
+        limit = embedding_dispatcher.get_concurrency_limit(model_instance)
+
+    assert limit.max_limit == 12
@@ -0,0 +1,101 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.rag.datasource.keyword.jieba.jieba import KeywordCorpusStatistics
+from core.rag.models.document import Document
+from core.rag.rerank.entity.weight import KeywordSetting, VectorSetting, Weights
+from core.rag.rerank.weight_rerank import WeightRerankRunner
+
+
+def _document(doc_id: str, content: str) -> Document:
+    return Document(page_content=content, metadata={"doc_id": doc_id, "dataset_id": "dataset"})
+
+
+def _segment(doc_id: str, keywords: list[str]) -> MagicMock:
+    return MagicMock(dataset_id="dataset", index_node_id=doc_id, keywords=keywords)
+
+
+@pytest.fixture
+def runner() -> WeightRerankRunner:
+    return WeightRerankRunner(
+        tenant_id="tenant",
+        weights=Weights(
+            vector_setting=VectorSetting(
+                vector_weight=0.7, embedding_provider_name="openai", embedding_model_name="text-embedding-3-small"
+            ),
+            keyword_setting=KeywordSetting(keyword_weight=0.3),
+        ),
+    )
+
+
+@patch("core.rag.rerank.weight_rerank.Jieba.get_corpus_statistics")
+@patch("core.rag.rerank.weight_rerank.db")
+def test_keyword_score_uses_stored_keywords_and_corpus_statistics(mock_db, mock_statistics, runner):
+    mock_db.session.query.return_value.filter.return_value = [
+        _segment("1", ["python", "dify"]),
+        _segment("2", ["python", "workflow", "agent", "rag"]),
+        _segment("3", ["java"]),
+    ]
+    mock_statistics.return_value = KeywordCorpusStatistics(
+        segment_count=100, keyword_count=300, document_frequencies={"python": 10, "dify": 2}
+    )
+    documents = [_document("1", "unused"), _document("2", "unused"), _document("3", "unused")]
+
+    with patch("core.rag.rerank.weight_rerank.JiebaKeywordTableHandler") as mock_handler:
+        mock_handler.return_value.extract_keywords.return_value = {"python", "dify"}
+        scores = runner._calculate_keyword_score("python dify", documents)
+
+    # only the query is tokenized, document keywords come from their segments
+    mock_handler.return_value.extract_keywords.assert_called_once()
+    assert documents[0].metadata["keywords"] == {"python", "dify"}
+    assert scores[0] == 1.0
+    assert 0.0 < scores[1] < scores[0]
+    assert scores[2] == 0.0
+
+
+@patch("core.rag.rerank.weight_rerank.Jieba.get_corpus_statistics")
+@patch("core.rag.rerank.weight_rerank.db")
+def test_keyword_score_without_keyword_index(mock_db, mock_statistics, runner):
+    mock_db.session.query.return_value.filter.return_value = [
+        _segment("1", ["python"]),
+        _segment("2", ["java"]),
+    ]
+    mock_statistics.return_value = KeywordCorpusStatistics()
+    documents = [_document("1", "unused"), _document("2", "unused")]
+
+    with patch("core.rag.rerank.weight_rerank.JiebaKeywordTableHandler") as mock_handler:
+        mock_handler.return_value.extract_keywords.return_value = {"python"}
+        scores = runner._calculate_keyword_score("python", documents)
+
+    assert scores[0] > 0.0
+    assert scores[1] == 0.0
+
+
+@patch("core.rag.rerank.weight_rerank.CacheEmbedding")
+@patch("core.rag.rerank.weight_rerank.ModelManager")
+def test_cosine_scores_batch_missing_vectors(mock_model_manager, mock_cache_embedding, runner):
+    cache_embedding = mock_cache_embedding.return_value
+    cache_embedding.embed_query.return_value = [1.0, 0.0]
+    cache_embedding.embed_documents.return_value = [[0.0, 3.0], [2.0, 2.0]]
+    scored = _document("1", "scored")
+    scored.metadata["score"] = 0.9
+    with_vector = _document("2", "with vector")
+    with_vector.vector = [4.0, 0.0]
+    documents = [scored, with_vector, _document("3", "missing"), _document("4", "missing too")]
+
+    scores = runner._calculate_cosine("tenant", "query", documents, runner.weights.vector_setting)
+
+    # all missing vectors are fetched with one call
+    cache_embedding.embed_documents.assert_called_once_with(["missing", "missing too"])
+    assert scores == pytest.approx([0.9, 1.0, 0.0, 2**0.5 / 2])
+
+
+@patch("core.rag.rerank.weight_rerank.ModelManager")
+def test_cosine_scores_skip_embedding_when_all_scored(mock_model_manager, runner):
+    documents = [_document("1", "a"), _document("2", "b")]
+    documents[0].metadata["score"] = 0.5
+    documents[1].metadata["score"] = 0.25
+
+    assert runner._calculate_cosine("tenant", "query", documents, runner.weights.vector_setting) == [0.5, 0.25]
+    mock_model_manager.assert_not_called()
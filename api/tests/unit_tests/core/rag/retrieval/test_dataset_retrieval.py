@@ -0,0 +1,136 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from core.rag.models.document import Document
+from core.rag.retrieval import dataset_retrieval
+from core.rag.retrieval.dataset_retrieval import DatasetRetrieval
+
+
+def _dataset(dataset_id: str):
+    dataset = MagicMock()
+    dataset.id = dataset_id
+    dataset.indexing_technique = "high_quality"
+    dataset.embedding_model = "embedding"
+    dataset.embedding_model_provider = "provider"
+    dataset.retrieval_model = None
+    return dataset
+
+
+def _multiple_retrieve(retrieval: DatasetRetrieval, datasets: list):
+    return retrieval.multiple_retrieve(
+        app_id="app",
+        tenant_id="tenant",
+        user_id="user",
+        user_from="account",
+        available_datasets=datasets,
+        query="query",
+        top_k=4,
+        score_threshold=0.0,
+        reranking_mode="reranking_model",
+        reranking_enable=False,
+    )
+
+
+def test_multiple_retrieve_leaves_out_datasets_past_the_deadline():
+    released = threading.Event()
+
+    def retriever(dataset_id, **kwargs):
+        if dataset_id == "slow":
+            released.wait(5)
+        return [Document(page_content=dataset_id, metadata={"score": 1.0, "doc_id": dataset_id})]
+
+    retrieval = DatasetRetrieval()
+    with (
+        patch.object(dataset_retrieval.dify_config, "DATASET_RETRIEVAL_TIMEOUT", 0.2),
+        patch.object(retrieval, "_retriever", side_effect=retriever),
+        patch.object(retrieval, "_on_query") as on_query,
+        patch.object(retrieval, "_on_retrieval_end"),
+    ):
+        documents = _multiple_retrieve(retrieval, [_dataset("fast"), _dataset("slow"), _dataset("other")])
+    released.set()
+
+    assert sorted(document.page_content for document in documents) == ["fast", "other"]
+    assert on_query.call_args.args[1] == ["fast", "slow", "other"]
+
+
+def test_multiple_retrieve_skips_failed_datasets():
+    def retriever(dataset_id, **kwargs):
+        if dataset_id == "broken":
+            raise ValueError("store is down")
+        return [Document(page_content=dataset_id, metadata={"score": 1.0, "doc_id": dataset_id})]
+
+    retrieval = DatasetRetrieval()
+    with (
+        patch.object(retrieval, "_retriever", side_effect=retriever),
+        patch.object(retrieval, "_on_query"),
+        patch.object(retrieval, "_on_retrieval_end"),
+    ):
+        documents = _multiple_retrieve(retrieval, [_dataset("broken"), _dataset("fine")])
+
+    assert [document.page_content for document in documents] == ["fine"]
+
+
+def test_multiple_retrieve_hands_plain_values_to_the_workers():
+    retrieval = DatasetRetrieval()
+    with (
+        patch.object(retrieval, "_retriever", return_value=[]) as retriever,
+        patch.object(retrieval, "_on_query"),
+        patch.object(retrieval, "_on_retrieval_end"),
+    ):
+        _multiple_retrieve(retrieval, [_dataset("dataset")])
+
+    kwargs = retriever.call_args.kwargs
+    assert kwargs["dataset_id"] == "dataset"
+    assert kwargs["retrieval_model"] == dataset_retrieval.default_retrieval_model
+    assert "dataset" not in kwargs
+
+
+def test_retrieval_takes_at_most_its_share_of_workers():
+    executor = dataset_retrieval._RetrievalExecutor(max_workers=8)
+    lock = threading.Lock()
+    running = [0]
+    most_running = [0]
+
+    def call(index):
+        with lock:
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return index
+
+    futures = executor.submit_all(call, [{"index": i} for i in range(10)], max_workers=2)
+
+    assert [future.result(timeout=5) for future in futures] == list(range(10))
+    assert most_running[0] == 2
+
+
+def test_retrieval_runs_on_its_own_threads_when_every_worker_is_stuck():
+    executor = dataset_retrieval._RetrievalExecutor(max_workers=1)
+    released = threading.Event()
+    stuck = executor.submit_all(released.wait, [{"timeout": 5}], max_workers=1)
+
+    futures = executor.submit_all(lambda index: index, [{"index": 1}, {"index": 2}], max_workers=2)
+
+    assert [future.result(timeout=1) for future in futures] == [1, 2]
+    released.set()
+    assert stuck[0].result(timeout=5) is True
+
+
+def test_cancelled_calls_are_skipped():
+    executor = dataset_retrieval._RetrievalExecutor(max_workers=1)
+    released = threading.Event()
+    calls = []
+
+    def call(index):
+        calls.append(index)
+        released.wait(5)
+
+    futures = executor.submit_all(call, [{"index": 1}, {"index": 2}], max_workers=1)
+    assert futures[1].cancel()
+    released.set()
+    futures[0].result(timeout=5)
+
+    assert calls == [1]
@@ -0,0 +1,136 @@
+import random
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.rag.splitter.fixed_text_splitter import FixedRecursiveCharacterTextSplitter
+
+WORDS = ["dify", "workflow", "knowledge", "retrieval", "embedding", "segment", "a", "of", "the"]
+
+
+def _document(paragraphs: int, seed: int = 0) -> str:
+    """
+    Paragraphs of 20-200 words, some of them without any line break so they need to be split by words.
+    """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(2, 20)):
+            sentences.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 10))) + ".")
+        separator = "\n" if rng.random() < 0.5 else " "
+        result.append(separator.join(sentences))
+    return "\n\n".join(result)
+
+
+class _CountingLength:
+    """
+    Word count as token count, recording how often the splitter asked for lengths.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, texts: list[str]) -> list[int]:
+        self.calls += 1
+        self.texts += len(texts)
+        return [len(text.split()) for text in texts]
+
+
+def _reference_split(splitter: FixedRecursiveCharacterTextSplitter, text: str) -> list[str]:
+    """
+    The recursive algorithm measuring every level of every piece on its own.
+    """
+
+    def recursive_split(text: str) -> list[str]:
+        separator = next((s for s in splitter._separators if s == "" or s in text), "")
+        splits = text.split(separator) if separator else list(text)
+        final_chunks: list[str] = []
+        good: list[str] = []
+        good_lengths: list[int] = []
+        for split, length in zip(splits, splitter._length_function(splits)):
+            if length < splitter._chunk_size:
+                good.append(split)
+                good_lengths.append(length)
+            else:
+                if good:
+                    final_chunks.extend(splitter._merge_splits(good, separator, good_lengths))
+                    good, good_lengths = [], []
+                final_chunks.extend(recursive_split(split))
+        if good:
+            final_chunks.extend(splitter._merge_splits(good, separator, good_lengths))
+        return final_chunks
+
+    chunks = text.split(splitter._fixed_separator)
+    final_chunks = []
+    for chunk, length in zip(chunks, splitter._length_function(chunks)):
+        if length > splitter._chunk_size:
+            final_chunks.extend(recursive_split(chunk))
+        else:
+            final_chunks.append(chunk)
+    return final_chunks
+
+
+@pytest.mark.parametrize(("chunk_size", "chunk_overlap"), [(50, 0), (50, 10), (120, 30), (500, 50)])
+def test_split_text_matches_recursive_split(chunk_size, chunk_overlap):
+    text = _document(200, seed=chunk_size)
+    splitter = FixedRecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=_CountingLength()
+    )
+
+    assert splitter.split_text(text) == _reference_split(splitter, text)
+
+
+def test_split_text_measures_once_per_level():
+    length_function = _CountingLength()
+    splitter = FixedRecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=10, length_function=length_function)
+
+    chunks = splitter.split_text(_document(500))
+
+    assert all(len(chunk.split()) <= 50 for chunk in chunks)
+    # fixed separator, then "\n" and " " levels, plus one call per distinct separator
+    assert length_function.calls <= 6
+
+
+def test_split_text_keeps_unsplittable_text():
+    splitter = FixedRecursiveCharacterTextSplitter(
+        chunk_size=1, chunk_overlap=0, length_function=lambda x: [5] * len(x)
+    )
+
+    assert splitter.split_text("ab") == ["a", "b"]
+
+
+def test_from_encoder_counts_locally_for_known_models():
+    embedding_model_instance = MagicMock()
+    embedding_model_instance.provider = "langgenius/openai/openai"
+    embedding_model_instance.model = "text-embedding-3-small"
+    with patch(
+        "core.rag.splitter.fixed_text_splitter.LocalTokenizer.get_num_tokens",
+        side_effect=lambda provider, model, texts: [len(text.split()) for text in texts],
+    ) as get_num_tokens:
+        splitter = FixedRecursiveCharacterTextSplitter.from_encoder(
+            embedding_model_instance=embedding_model_instance, chunk_size=20, chunk_overlap=0
+        )
+        chunks = splitter.split_text(_document(20))
+
+    assert chunks
+    assert get_num_tokens.call_args.args[:2] == ("langgenius/openai/openai", "text-embedding-3-small")
+    embedding_model_instance.get_text_embedding_num_tokens.assert_not_called()
+
+
+def test_split_large_document_benchmark(benchmark):
+    # about 500 pages of text
+    text = _document(5000)
+    length_function = _CountingLength()
+    splitter = FixedRecursiveCharacterTextSplitter(
+        chunk_size=100, chunk_overlap=20, separators=["\n", " ", ""], length_function=length_function
+    )
+
+    chunks = benchmark(splitter.split_text, text)
+    assert chunks
+
+    # counted on a run of its own, the benchmark stats are not there with --benchmark-disable
+    length_function.calls = 0
+    splitter.split_text(text)
+    assert length_function.calls <= 6
@@ -0,0 +1,95 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from core.indexing_runner import DocumentIsPausedError, IndexingRunner
+from core.rag.index_processor.processor.paragraph_index_processor import ParagraphIndexProcessor
+from core.rag.models.document import Document
+
+
+class _FakeVector:
+    """
+    Vector recording what each stage did, embedding a text as its length.
+    """
+
+    lock = threading.Lock()
+    embedded: list[str] = []
+    written: list[tuple[list[str], list[list[float]]]] = []
+
+    def __init__(self, dataset) -> None:
+        pass
+
+    def embed_documents(self, documents):
+        with self.lock:
+            self.embedded.extend(document.page_content for document in documents)
+        return [[float(len(document.page_content))] for document in documents], len(documents)
+
+    def create_with_embeddings(self, texts, embeddings, **kwargs):
+        with self.lock:
+            self.written.append(([text.page_content for text in texts], embeddings))
+
+
+@pytest.fixture
+def pipeline():
+    _FakeVector.embedded = []
+    _FakeVector.written = []
+    redis_client = MagicMock()
+    redis_client.get.return_value = None
+    with (
+        patch("core.indexing_runner.Vector", _FakeVector),
+        patch("core.indexing_runner.redis_client", new=redis_client),
+        patch("core.indexing_runner.ModelManager"),
+        patch.object(IndexingRunner, "_complete_segments") as complete_segments,
+    ):
+        yield redis_client, complete_segments
+
+
+def _documents(count: int) -> list[Document]:
+    return [Document(page_content=f"segment {i}", metadata={"doc_id": str(i)}) for i in range(count)]
+
+
+def _run(documents: list[Document]) -> int:
+    return IndexingRunner()._run_indexing_pipeline(
+        Flask(__name__), ParagraphIndexProcessor(), MagicMock(), MagicMock(id="document"), documents
+    )
+
+
+def test_pipeline_embeds_writes_and_completes_every_batch(pipeline):
+    _, complete_segments = pipeline
+    documents = _documents(300)
+
+    tokens = _run(documents)
+
+    assert tokens == 300
+    assert sorted(_FakeVector.embedded) == sorted(document.page_content for document in documents)
+    written = [text for texts, _ in _FakeVector.written for text in texts]
+    assert sorted(written) == sorted(_FakeVector.embedded)
+    for texts, embeddings in _FakeVector.written:
+        assert embeddings == [[float(len(text))] for text in texts]
+    completed = [document.metadata["doc_id"] for call in complete_segments.call_args_list for document in call.args[2]]
+    assert sorted(completed, key=int) == [str(i) for i in range(300)]
+    # segments are completed batch by batch instead of once at the end
+    assert complete_segments.call_count == 5
+
+
+def test_pipeline_stops_when_embedding_fails(pipeline):
+    _, complete_segments = pipeline
+    with (
+        patch.object(_FakeVector, "embed_documents", side_effect=ValueError("embedding failed")),
+        pytest.raises(ValueError, match="embedding failed"),
+    ):
+        _run(_documents(1000))
+
+    complete_segments.assert_not_called()
+
+
+def test_pipeline_stops_when_document_is_paused(pipeline):
+    redis_client, complete_segments = pipeline
+    redis_client.get.return_value = b"True"
+
+    with pytest.raises(DocumentIsPausedError):
+        _run(_documents(300))
+
+    assert _FakeVector.written == []
@@ -70,3 +70,31 @@ def test_lb_model_manager_fetch_next(mocker, lb_model_manager):
 
         config = lb_model_manager.fetch_next()
         assert config == config3
+
+
+def test_lb_model_manager_leaves_shared_configs_untouched():
+    load_balancing_configs = [
+        ModelLoadBalancingConfiguration(id="id1", name="__inherit__", credentials={}),
+        ModelLoadBalancingConfiguration(id="id2", name="first", credentials={"openai_api_key": "fake_key"}),
+    ]
+
+    lb_model_manager = LBModelManager(
+        tenant_id="tenant_id",
+        provider="openai",
+        model_type=ModelType.LLM,
+        model="gpt-4",
+        load_balancing_configs=load_balancing_configs,
+        managed_credentials={"openai_api_key": "managed_key"},
+    )
+    without_inherit = LBModelManager(
+        tenant_id="tenant_id",
+        provider="openai",
+        model_type=ModelType.LLM,
+        model="gpt-4",
+        load_balancing_configs=load_balancing_configs,
+    )
+
+    assert lb_model_manager._load_balancing_configs[0].credentials == {"openai_api_key": "managed_key"}
+    assert without_inherit.config_count == 1
+    assert len(load_balancing_configs) == 2
+    assert load_balancing_configs[0].credentials == {}
@@ -1,3 +1,10 @@
+import pytest
+
+from core import provider_manager as provider_manager_module
+from core.entities.provider_configuration import ProviderConfigurations
+from core.helper.lru_cache import LRUCache
+from core.provider_manager import ProviderManager
+
 # from core.entities.provider_entities import ModelSettings
 # from core.model_runtime.entities.model_entities import ModelType
 # from core.model_runtime.model_providers.model_provider_factory import ModelProviderFactory
@@ -188,3 +195,61 @@
 #     assert result[0].model_type == ModelType.LLM
 #     assert result[0].enabled is True
 #     assert len(result[0].load_balancing_configs) == 0
+
+
+@pytest.fixture
+def configurations_cache(mocker):
+    versions: dict[str, int] = {}
+    mocker.patch.object(provider_manager_module, "_configurations_cache", LRUCache(10))
+    mocker.patch(
+        "core.provider_manager.ProviderConfigurationsCache.get_version",
+        autospec=True,
+        side_effect=lambda cache: versions.get(cache.cache_key, 0),
+    )
+    build = mocker.patch.object(
+        ProviderManager,
+        "_get_configurations",
+        autospec=True,
+        side_effect=lambda self, tenant_id: ProviderConfigurations(tenant_id=tenant_id),
+    )
+    return versions, build
+
+
+def test_get_configurations_reuses_configurations_of_a_workspace(configurations_cache):
+    _, build = configurations_cache
+
+    first = ProviderManager().get_configurations("tenant_a")
+
+    assert ProviderManager().get_configurations("tenant_a") is first
+    assert ProviderManager().get_configurations("tenant_b") is not first
+    assert build.call_count == 2
+
+
+def test_get_configurations_rebuilds_after_invalidation(configurations_cache):
+    versions, build = configurations_cache
+    first = ProviderManager().get_configurations("tenant_a")
+
+    versions["provider_configurations_version:tenant_id:tenant_a"] = 1
+
+    assert ProviderManager().get_configurations("tenant_a") is not first
+    assert build.call_count == 2
+
+
+def test_get_configurations_rebuilds_after_ttl(configurations_cache, mocker):
+    _, build = configurations_cache
+    first = ProviderManager().get_configurations("tenant_a")
+
+    mocker.patch("core.provider_manager.time.monotonic", return_value=provider_manager_module.time.monotonic() + 3600)
+
+    assert ProviderManager().get_configurations("tenant_a") is not first
+    assert build.call_count == 2
+
+
+def test_get_configurations_without_cache(configurations_cache, mocker):
+    _, build = configurations_cache
+    mocker.patch.object(provider_manager_module.dify_config, "PROVIDER_CONFIGURATIONS_CACHE_TTL", 0)
+
+    ProviderManager().get_configurations("tenant_a")
+    ProviderManager().get_configurations("tenant_a")
+
+    assert build.call_count == 2
@@ -0,0 +1,182 @@
+import threading
+import time
+from unittest.mock import patch
+
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.workflow.entities.variable_pool import VariablePool
+from core.workflow.enums import SystemVariableKey
+from core.workflow.graph_engine.entities.event import (
+    GraphRunFailedEvent,
+    GraphRunSucceededEvent,
+    NodeRunSucceededEvent,
+    ParallelBranchRunFailedEvent,
+    ParallelBranchRunSucceededEvent,
+)
+from core.workflow.graph_engine.entities.graph import Graph
+from core.workflow.graph_engine.graph_engine import GraphEngine
+from core.workflow.nodes.variable_aggregator.variable_aggregator_node import VariableAggregatorNode
+from models.enums import UserFrom
+from models.workflow import WorkflowType
+
+BRANCH_COUNT = 6
+NESTED_BRANCH_COUNT = 6
+# workers of the thread pool of a run
+POOL_WORKERS = 10
+
+
+def _aggregator_node(node_id: str) -> dict:
+    return {
+        "data": {
+            "type": "variable-aggregator",
+            "title": node_id,
+            "output_type": "string",
+            "variables": [["start", "query"]],
+        },
+        "id": node_id,
+    }
+
+
+def _build_fan_out_fan_in_graph_config() -> dict:
+    """
+    start -> 6 branches, each branch fans out to 6 nested branches and joins again -> end (50 nodes)
+    """
+    nodes: list[dict] = [
+        {
+            "data": {
+                "type": "start",
+                "title": "start",
+                "variables": [
+                    {
+                        "label": "query",
+                        "max_length": 48,
+                        "options": [],
+                        "required": True,
+                        "type": "text-input",
+                        "variable": "query",
+                    }
+                ],
+            },
+            "id": "start",
+        }
+    ]
+    edges: list[dict] = []
+    end_outputs: list[dict] = []
+    for i in range(BRANCH_COUNT):
+        branch_id = f"branch_{i}"
+        join_id = f"join_{i}"
+        nodes.append(_aggregator_node(branch_id))
+        edges.append({"id": f"start-{branch_id}", "source": "start", "target": branch_id})
+        for j in range(NESTED_BRANCH_COUNT):
+            nested_id = f"nested_{i}_{j}"
+            nodes.append(_aggregator_node(nested_id))
+            edges.append({"id": f"{branch_id}-{nested_id}", "source": branch_id, "target": nested_id})
+            edges.append({"id": f"{nested_id}-{join_id}", "source": nested_id, "target": join_id})
+        nodes.append(_aggregator_node(join_id))
+        edges.append({"id": f"{join_id}-end", "source": join_id, "target": "end"})
+        end_outputs.append({"value_selector": [join_id, "output"], "variable": join_id})
+
+    nodes.append({"data": {"type": "end", "title": "end", "outputs": end_outputs}, "id": "end"})
+    return {"nodes": nodes, "edges": edges}
+
+
+def _run_graph(graph_config: dict, max_execution_steps: int = 500) -> list:
+    graph = Graph.init(graph_config=graph_config)
+    variable_pool = VariablePool(
+        system_variables={SystemVariableKey.FILES: [], SystemVariableKey.USER_ID: "aaa"}, user_inputs={"query": "hi"}
+    )
+    graph_engine = GraphEngine(
+        tenant_id="111",
+        app_id="222",
+        workflow_type=WorkflowType.WORKFLOW,
+        workflow_id="333",
+        graph_config=graph_config,
+        user_id="444",
+        user_from=UserFrom.ACCOUNT,
+        invoke_from=InvokeFrom.WEB_APP,
+        call_depth=0,
+        graph=graph,
+        variable_pool=variable_pool,
+        max_execution_steps=max_execution_steps,
+        max_execution_time=1200,
+    )
+    return list(graph_engine.run())
+
+
+@patch("extensions.ext_database.db.session.remove")
+@patch("extensions.ext_database.db.session.close")
+def test_nested_fan_out_fan_in_graph(mock_close, mock_remove, benchmark):
+    graph_config = _build_fan_out_fan_in_graph_config()
+    assert len(graph_config["nodes"]) == 50
+
+    items = benchmark.pedantic(_run_graph, args=(graph_config,), rounds=10, iterations=1)
+
+    assert isinstance(items[-1], GraphRunSucceededEvent)
+    assert items[-1].outputs == {f"join_{i}": "hi" for i in range(BRANCH_COUNT)}
+    assert len([item for item in items if isinstance(item, NodeRunSucceededEvent)]) == 50
+    # both the outer and the nested parallel branches report their completion to the consumer
+    assert len([item for item in items if isinstance(item, ParallelBranchRunSucceededEvent)]) == (
+        BRANCH_COUNT + BRANCH_COUNT * NESTED_BRANCH_COUNT
+    )
+
+
+class _WaitingNestedNodes:
+    """
+    Nested nodes waiting on I/O, like an LLM or HTTP node, recording how many of them run at once.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.running = 0
+        self.most_running = 0
+        self.lock = threading.Lock()
+        self.run = VariableAggregatorNode._run
+
+    def __call__(self, node: VariableAggregatorNode):
+        if not node.node_id.startswith("nested_"):
+            return self.run(node)
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+        return self.run(node)
+
+
+@patch("extensions.ext_database.db.session.remove")
+@patch("extensions.ext_database.db.session.close")
+def test_nested_fan_out_fan_in_graph_waiting_on_io(mock_close, mock_remove, benchmark):
+    graph_config = _build_fan_out_fan_in_graph_config()
+    nested_nodes = _WaitingNestedNodes(seconds=0.02)
+
+    with patch.object(VariableAggregatorNode, "_run", autospec=True, side_effect=nested_nodes):
+        items = benchmark.pedantic(_run_graph, args=(graph_config,), rounds=3, iterations=1)
+
+    assert isinstance(items[-1], GraphRunSucceededEvent)
+    # branches waiting for their nested branches give their worker back, so nested nodes get every worker
+    # instead of the ones left over by the outer branches
+    assert nested_nodes.most_running == POOL_WORKERS
+
+
+@patch("extensions.ext_database.db.session.remove")
+@patch("extensions.ext_database.db.session.close")
+def test_nested_branch_failure_fails_outer_branch_and_run(mock_close, mock_remove):
+    graph_config = _build_fan_out_fan_in_graph_config()
+
+    # the steps run out while the nested branches run
+    items = _run_graph(graph_config, max_execution_steps=20)
+
+    assert isinstance(items[-1], GraphRunFailedEvent)
+    assert items[-1].error == "Max steps 20 reached."
+    failed_branch = items[-2]
+    assert isinstance(failed_branch, ParallelBranchRunFailedEvent)
+    # reported by the outer branch the failed nested branch belongs to
+    assert failed_branch.parent_parallel_id is None
+    nested_failures = [
+        item
+        for item in items
+        if isinstance(item, ParallelBranchRunFailedEvent)
+        and item.parent_parallel_start_node_id == failed_branch.parallel_start_node_id
+    ]
+    assert nested_failures
+    assert not any(isinstance(item, NodeRunSucceededEvent) and item.node_id == "end" for item in items)
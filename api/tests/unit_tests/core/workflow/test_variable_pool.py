@@ -44,3 +44,61 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_fork_reads_through_to_parent(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent_value"))
+    overlay = pool.fork()
+
+    result = overlay.get(("node_1", "var"))
+    assert result is not None
+    assert result.value == "parent_value"
+
+    # Writes made to the parent after forking are visible to the overlay
+    pool.add(("node_2", "var"), StringSegment(value="late_value"))
+    result = overlay.get(("node_2", "var"))
+    assert result is not None
+    assert result.value == "late_value"
+
+
+def test_fork_keeps_writes_private(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent_value"))
+    overlay = pool.fork()
+
+    overlay.add(("node_1", "var"), StringSegment(value="overlay_value"))
+    overlay.add(("node_2", "var"), StringSegment(value="new_value"))
+
+    assert overlay.get(("node_1", "var")).value == "overlay_value"
+    assert pool.get(("node_1", "var")).value == "parent_value"
+    assert pool.get(("node_2", "var")) is None
+
+
+def test_fork_remove_masks_parent(pool):
+    pool.add(("node_1", "var_1"), StringSegment(value="value_1"))
+    pool.add(("node_1", "var_2"), StringSegment(value="value_2"))
+    pool.add(("node_2", "var"), StringSegment(value="value"))
+    overlay = pool.fork()
+
+    overlay.remove(("node_1", "var_1"))
+    assert overlay.get(("node_1", "var_1")) is None
+    assert overlay.get(("node_1", "var_2")) is not None
+
+    overlay.remove(("node_2",))
+    assert overlay.get(("node_2", "var")) is None
+
+    # Adding after removal makes the variable visible again
+    overlay.add(("node_1", "var_1"), StringSegment(value="again"))
+    assert overlay.get(("node_1", "var_1")).value == "again"
+
+    assert pool.get(("node_1", "var_1")).value == "value_1"
+    assert pool.get(("node_2", "var")).value == "value"
+
+
+def test_nested_fork(pool):
+    pool.add(("node_1", "var"), StringSegment(value="root"))
+    overlay = pool.fork()
+    overlay.add(("node_2", "var"), StringSegment(value="middle"))
+    nested = overlay.fork()
+
+    assert nested.get(("node_1", "var")).value == "root"
+    assert nested.get(("node_2", "var")).value == "middle"
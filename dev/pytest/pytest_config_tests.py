@@ -12,7 +12,6 @@ BASE_API_AND_DOCKER_CONFIG_SET_DIFF = {
     "HTTP_REQUEST_MAX_WRITE_TIMEOUT",
     "INNER_API_KEY",
     "INNER_API_KEY_FOR_PLUGIN",
-    "KEYWORD_DATA_SOURCE_TYPE",
     "LOGIN_LOCKOUT_DURATION",
     "LOG_FORMAT",
     "OCI_ACCESS_KEY",
@@ -48,7 +47,6 @@ BASE_API_AND_DOCKER_COMPOSE_CONFIG_SET_DIFF = {
     "HTTP_REQUEST_MAX_WRITE_TIMEOUT",
     "INNER_API_KEY",
     "INNER_API_KEY_FOR_PLUGIN",
-    "KEYWORD_DATA_SOURCE_TYPE",
     "LOGIN_LOCKOUT_DURATION",
     "LOG_FORMAT",
     "OPENDAL_FS_ROOT",